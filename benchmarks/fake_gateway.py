@@ -0,0 +1,403 @@
+"""
+Local stand-in for the remote gateway: serves kubectl commands and HTTP requests
+against a synthetic cluster, adding configurable network latency and jitter.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import shlex
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+from racetrack_client.utils.shell import CommandError
+from racetrack_commons.deploy.resource import job_resource_name
+
+BATCH_COMMAND_PATTERN = re.compile(
+    r"echo '(?P<marker>__racetrack_batch_\w+__) begin (?P<index>\d+)'\n\(\n(?P<cmd>.*?)\n\) 2>\"\$racetrack_stderr\"\n", re.DOTALL,
+)
+CONDITIONAL_GET_PATTERN = re.compile(
+    r"get (?P<ref>\S+) --ignore-not-found -o jsonpath=.*\nif \[ \"\$version\" = \"(?P<version>\d+)\" \]; "
+    r"then echo '(?P<marker>\w+)'; else (?P<cmd>.*); fi",
+)
+KIND_PLURALS = {
+    'pods': 'pod', 'services': 'service', 'secrets': 'secret',
+    'deployments': 'deployment', 'servicemonitors': 'servicemonitor',
+    'horizontalpodautoscalers': 'horizontalpodautoscaler', 'daemonsets': 'daemonset', 'events': 'event',
+    'poddisruptionbudgets': 'poddisruptionbudget',
+}
+
+
+@dataclass
+class LatencyModel:
+    latency_ms: float = 0
+    jitter_ms: float = 0
+
+    def sleep(self):
+        delay_ms = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+
+@dataclass
+class GatewayStats:
+    round_trips: int = 0
+    commands: int = 0
+    bytes_returned: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, commands: int, bytes_returned: int):
+        with self.lock:
+            self.round_trips += 1
+            self.commands += commands
+            self.bytes_returned += bytes_returned
+
+    def snapshot(self) -> dict[str, int]:
+        with self.lock:
+            return {'round_trips': self.round_trips, 'commands': self.commands, 'bytes_returned': self.bytes_returned}
+
+
+class FakeCluster:
+    """Synthetic namespace with N jobs by M replicas, each with a deployment, a service and a secret"""
+
+    def __init__(self, namespace: str, jobs: int, replicas: int, log_lines_per_second: float = 10, log_backlog: float = 60):
+        self.namespace = namespace
+        self.log_lines_per_second = log_lines_per_second
+        # pods pretend to have been logging for a while before the cluster was created
+        self.log_epoch = datetime.now(timezone.utc) - timedelta(seconds=log_backlog)
+        self.resources: dict[str, dict[str, Any]] = {}  # kind/name -> object
+        self.resource_version = 1
+        self.lock = threading.Lock()
+        for job_index in range(jobs):
+            self._generate_job(f'job-{job_index:05d}', '1.0.0', replicas)
+
+    def _generate_job(self, job_name: str, job_version: str, replicas: int):
+        resource_name = job_resource_name(job_name, job_version)
+        labels = {
+            'racetrack/job': resource_name,
+            'racetrack/job-name': job_name,
+            'racetrack/job-version': job_version,
+        }
+        for replica in range(replicas):
+            pod_index = len(self.resources)
+            self._store({
+                'apiVersion': 'v1', 'kind': 'Pod',
+                'metadata': {
+                    'name': f'{resource_name}-{replica}', 'namespace': self.namespace,
+                    'creationTimestamp': '2024-01-01T00:00:00Z', 'labels': labels,
+                    'annotations': {'racetrack-deployment-date': '1704067200'},
+                    'managedFields': [{'manager': 'kube-controller-manager', 'fieldsV1': {'f:status': {}}}] * 4,
+                },
+                'spec': {'containers': [{'name': resource_name, 'image': f'registry/job-entrypoint:{job_name}'}]},
+                'status': {
+                    'phase': 'Running',
+                    'podIP': f'10.{pod_index // 65536 % 256}.{pod_index // 256 % 256}.{pod_index % 256}',
+                    'conditions': [{'type': condition, 'status': 'True'} for condition in
+                                   ['Initialized', 'Ready', 'ContainersReady', 'PodScheduled']],
+                    'containerStatuses': [{'name': resource_name, 'ready': True, 'state': {'running': {}}}],
+                },
+            })
+        self._store({
+            'apiVersion': 'apps/v1', 'kind': 'Deployment',
+            'metadata': {'name': resource_name, 'namespace': self.namespace, 'labels': labels, 'generation': 1},
+            'spec': {'replicas': replicas},
+            'status': {
+                'observedGeneration': 1, 'replicas': replicas, 'updatedReplicas': replicas,
+                'availableReplicas': replicas, 'readyReplicas': replicas,
+                'conditions': [{'type': 'Progressing', 'status': 'True', 'reason': 'NewReplicaSetAvailable'}],
+            },
+        })
+        self._store({
+            'apiVersion': 'v1', 'kind': 'Service',
+            'metadata': {'name': resource_name, 'namespace': self.namespace, 'labels': labels},
+        })
+        self._store({
+            'apiVersion': 'v1', 'kind': 'Secret',
+            'metadata': {'name': resource_name, 'namespace': self.namespace, 'labels': labels},
+            'data': {'git_credentials': '', 'secret_build_env': 'e30=', 'secret_runtime_env': 'eyJLRVkiOiAidmFsdWUifQ=='},
+        })
+
+    def _store(self, obj: dict[str, Any]):
+        self.resource_version += 1
+        obj['metadata']['resourceVersion'] = str(self.resource_version)
+        self.resources[f"{obj['kind'].lower()}/{obj['metadata']['name']}"] = obj
+
+    def list_pods(self, label_selector: str | None = None) -> list[dict[str, Any]]:
+        return self.list('pod', label_selector)
+
+    def list(self, kind: str, label_selector: str | None = None) -> list[dict[str, Any]]:
+        with self.lock:
+            objs = [obj for ref, obj in self.resources.items() if ref.startswith(f'{kind}/')]
+        return [obj for obj in objs if _matches_selector(obj, label_selector)]
+
+    def get(self, ref: str) -> dict[str, Any] | None:
+        with self.lock:
+            return self.resources.get(ref)
+
+    def apply(self, obj: dict[str, Any]):
+        with self.lock:
+            self._store(obj)
+
+    def delete(self, ref: str) -> bool:
+        with self.lock:
+            return self.resources.pop(ref, None) is not None
+
+    def read_logs(self, label_selector: str | None, tail: int | None, since_time: str | None, timestamps: bool,
+                  pod_name: str | None = None) -> str:
+        """Generate log lines of the matching pods, written at a constant rate since the cluster was created"""
+        elapsed = (datetime.now(timezone.utc) - self.log_epoch).total_seconds()
+        total_lines = int(elapsed * self.log_lines_per_second)
+        since_line = 0
+        if since_time:
+            since_offset = (_parse_timestamp(since_time) - self.log_epoch).total_seconds()
+            since_line = max(0, math.ceil(since_offset * self.log_lines_per_second))
+        first_line = since_line if tail is None or tail < 0 else max(since_line, total_lines - tail)
+        lines = []
+        pod_names = [pod_name] if pod_name else [pod['metadata']['name'] for pod in self.list_pods(label_selector)]
+        for pod_name in pod_names:
+            for line_index in range(first_line, total_lines):
+                line = f'{pod_name} log line #{line_index}'
+                if timestamps:
+                    line_time = self.log_epoch + timedelta(seconds=line_index / self.log_lines_per_second)
+                    line = f"{line_time.strftime('%Y-%m-%dT%H:%M:%S.%f')}000Z {line}"
+                lines.append(line + '\n')
+        return ''.join(lines)
+
+
+class FakeKubectl:
+    """Answers the kubectl commands and batch scripts sent by the plugin through remote_shell"""
+
+    def __init__(self, cluster: FakeCluster, latency: LatencyModel, stats: GatewayStats):
+        self.cluster = cluster
+        self.latency = latency
+        self.stats = stats
+
+    def remote_shell(self, cmd: str, remote_gateway_url: str | None = None,
+                     remote_gateway_token: str | None = None, workdir: str | None = None) -> str:
+        self.latency.sleep()
+        batch_commands = list(BATCH_COMMAND_PATTERN.finditer(cmd))
+        if batch_commands:
+            outputs = []
+            for match in batch_commands:
+                try:
+                    output, stderr, returncode = self.run_command(match.group('cmd')), '', 0
+                except CommandError as e:
+                    output, stderr, returncode = '', e.stdout, e.returncode
+                marker, index = match.group('marker'), match.group('index')
+                outputs.append(f'{marker} begin {index}\n{output}\n{marker} stderr {index}\n{stderr}\n{marker} end {index} {returncode}\n')
+            output = ''.join(outputs)
+        else:
+            output = self.run_command(cmd)
+        self.stats.record(max(1, len(batch_commands)), len(output))
+        return output
+
+    def run_command(self, cmd: str) -> str:
+        conditional_get = CONDITIONAL_GET_PATTERN.search(cmd)
+        if conditional_get is not None:
+            obj = self.cluster.get(_singular_ref(conditional_get.group('ref')))
+            if obj is not None and obj['metadata']['resourceVersion'] == conditional_get.group('version'):
+                return conditional_get.group('marker') + '\n'
+            return self.run_command(conditional_get.group('cmd'))
+
+        first_line, _, stdin = cmd.partition('\n')
+        if '/opt/kubectl apply' in first_line:
+            for item in json.loads(stdin.rsplit('\n', 1)[0])['items']:
+                self.cluster.apply(item)
+            return 'applied\n'
+
+        args = shlex.split(first_line)
+        args = [arg for arg in args if arg != '/opt/kubectl']
+        options, positional = _parse_args(args)
+        verb = positional[0] if positional else ''
+        if verb == 'get' and 'raw' in options:
+            return self._get_raw(options['raw'])
+        if verb == 'get' and positional[1:] == ['pods']:
+            return self._get_pod_columns(options)
+        if verb == 'get':
+            items = [obj for ref in positional[1:] if (obj := self.cluster.get(_singular_ref(ref))) is not None]
+            if not items:
+                return ''
+            return json.dumps(items[0] if len(items) == 1 else {'kind': 'List', 'items': items})
+        if verb == 'delete':
+            ref = _singular_ref(positional[1])
+            return f'{ref} deleted\n' if self.cluster.delete(ref) else ''
+        if verb == 'logs':
+            tail = int(options['tail']) if 'tail' in options else None
+            return self.cluster.read_logs(options.get('selector'), tail, options.get('since-time'), 'timestamps' in options)
+        raise CommandError(cmd, f'unsupported fake command: {first_line}', 1)
+
+    def _get_raw(self, url: str) -> str:
+        parsed = urlparse(url)
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        if query.get('watch'):
+            time.sleep(float(query.get('timeoutSeconds', 1)))
+            return ''
+        kind = KIND_PLURALS[parsed.path.rstrip('/').split('/')[-1]]
+        items = self.cluster.list(kind, query.get('labelSelector'))
+        return json.dumps({'kind': 'List', 'metadata': {'resourceVersion': str(self.cluster.resource_version)}, 'items': items})
+
+    def _get_pod_columns(self, options: dict[str, str]) -> str:
+        rows = []
+        for pod in self.cluster.list_pods(options.get('selector')):
+            metadata, status, labels = pod['metadata'], pod['status'], pod['metadata']['labels']
+            rows.append(' '.join([
+                metadata['name'], labels['racetrack/job'], labels['racetrack/job-name'], labels['racetrack/job-version'],
+                metadata['creationTimestamp'], metadata.get('deletionTimestamp', '<none>'),
+                status['phase'], status.get('podIP', '<none>'),
+            ]))
+        return '\n'.join(rows) + '\n'
+
+
+class FakeGatewayServer:
+    """HTTP server serving the jobs forwarded by the remote gateway and the Kubernetes API"""
+
+    def __init__(self, cluster: FakeCluster, latency: LatencyModel, stats: GatewayStats, metrics_families: int = 50):
+        self.cluster = cluster
+        self.latency = latency
+        self.stats = stats
+        self.metrics_page = _generate_metrics_page(metrics_families)
+        handler = self._make_handler()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def shutdown(self):
+        self.server.shutdown()
+
+    def _make_handler(self):
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                gateway.latency.sleep()
+                parsed = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                if parsed.path.startswith('/remote/forward/'):
+                    if parsed.path.endswith('/metrics'):
+                        return self._send(200, gateway.metrics_page, 'text/plain; version=0.0.4')
+                    return self._send_json(200, {'live': True, 'ready': True, 'status': 'pass', 'deployment_timestamp': 1704067200})
+                path_parts = parsed.path.strip('/').split('/')
+                if path_parts[-1] == 'log':
+                    tail = int(query['tailLines']) if 'tailLines' in query else None
+                    logs = gateway.cluster.read_logs(None, tail, query.get('sinceTime'), query.get('timestamps') == 'true',
+                                                     pod_name=path_parts[-2])
+                    return self._send(200, logs.encode(), 'text/plain')
+                if path_parts[-1] in KIND_PLURALS:
+                    if query.get('watch'):
+                        time.sleep(min(float(query.get('timeoutSeconds', 1)), 5))
+                        return self._send(200, b'', 'application/json')
+                    items = gateway.cluster.list(KIND_PLURALS[path_parts[-1]], query.get('labelSelector'))
+                    return self._send_json(200, {'kind': 'List', 'metadata': {'resourceVersion': str(gateway.cluster.resource_version)}, 'items': items})
+                obj = gateway.cluster.get(self._ref(path_parts))
+                if obj is None:
+                    return self._send_json(404, {'message': 'not found'})
+                return self._send_json(200, obj)
+
+            def do_HEAD(self):
+                """Registry API resolving image tags to digests"""
+                gateway.latency.sleep()
+                parsed = urlparse(self.path)
+                if not (parsed.path.startswith('/v2/') and '/manifests/' in parsed.path):
+                    return self._send_json(404, {})
+                self.send_response(200)
+                self.send_header('Docker-Content-Digest', f'sha256:{hashlib.sha256(parsed.path.encode()).hexdigest()}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                gateway.stats.record(1, 0)
+
+            def do_PATCH(self):
+                gateway.latency.sleep()
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                obj = json.loads(body)
+                gateway.cluster.apply(obj)
+                return self._send_json(200, obj)
+
+            def do_DELETE(self):
+                gateway.latency.sleep()
+                parsed = urlparse(self.path)
+                deleted = gateway.cluster.delete(self._ref(parsed.path.strip('/').split('/')))
+                return self._send_json(200 if deleted else 404, {})
+
+            def _ref(self, path_parts: list[str]) -> str:
+                return f'{KIND_PLURALS.get(path_parts[-2], path_parts[-2])}/{path_parts[-1]}'
+
+            def _send_json(self, status: int, obj: Any):
+                self._send(status, json.dumps(obj).encode(), 'application/json')
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                gateway.stats.record(1, len(body))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def _generate_metrics_page(families: int) -> bytes:
+    lines = []
+    for family in range(families):
+        lines.append(f'# HELP job_request_duration_{family} Synthetic histogram\n')
+        lines.append(f'# TYPE job_request_duration_{family} histogram\n')
+        for bucket in ['0.005', '0.01', '0.05', '0.1', '0.5', '1.0', '5.0', '+Inf']:
+            lines.append(f'job_request_duration_{family}_bucket{{endpoint="/api/v1/perform",le="{bucket}"}} 42.0\n')
+    lines.append('# HELP job_last_call_timestamp Timestamp of the last call\n')
+    lines.append('# TYPE job_last_call_timestamp gauge\n')
+    lines.append('job_last_call_timestamp 1.7040672e+09\n')
+    return ''.join(lines).encode()
+
+
+def _parse_timestamp(timestamp: str) -> datetime:
+    """Parse RFC 3339 timestamp, truncating nanoseconds to what datetime can hold"""
+    match = re.fullmatch(r'(?P<seconds>[^.Z]+)(\.(?P<fraction>\d+))?Z', timestamp)
+    fraction = (match.group('fraction') or '')[:6].ljust(6, '0')
+    return datetime.fromisoformat(f"{match.group('seconds')}.{fraction}+00:00")
+
+
+def _parse_args(args: list[str]) -> tuple[dict[str, str], list[str]]:
+    options: dict[str, str] = {}
+    positional: list[str] = []
+    iterator = iter(args)
+    for arg in iterator:
+        if arg.startswith('--'):
+            name, has_value, value = arg[2:].partition('=')
+            options[name] = value if has_value else 'true'
+            if name == 'raw' and not has_value:
+                options[name] = next(iterator)
+        elif arg in {'-n', '-o'}:
+            options[arg] = next(iterator)
+        else:
+            positional.append(arg)
+    return options, positional
+
+
+def _singular_ref(ref: str) -> str:
+    kind, _, name = ref.partition('/')
+    return f'{KIND_PLURALS.get(kind, kind)}/{name}'
+
+
+def _matches_selector(obj: dict[str, Any], label_selector: str | None) -> bool:
+    if not label_selector:
+        return True
+    labels = obj['metadata'].get('labels') or {}
+    for requirement in label_selector.split(','):
+        key, has_value, value = requirement.partition('=')
+        if key not in labels or (has_value and labels[key] != value):
+            return False
+    return True
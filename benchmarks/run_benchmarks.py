@@ -0,0 +1,232 @@
+"""
+Benchmarks of the plugin running against a synthetic cluster behind a latency-injecting fake remote gateway.
+Run it from the repository root, in an environment where Racetrack's lifecycle is installed:
+
+    python benchmarks/run_benchmarks.py --jobs 10,100,1000,10000 --latency-ms 30 --output results.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable
+
+import yaml
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+SRC_DIR = REPO_DIR / 'src'
+sys.path.insert(0, str(SRC_DIR))
+
+from lifecycle.config import Config
+from racetrack_client.manifest import Manifest
+from racetrack_client.utils.datamodel import parse_dict_datamodel
+
+import deployer as deployer_module
+import remote_executor
+from deployer import KubernetesJobDeployer
+from logs_streamer import KubernetesLogsStreamer
+from monitor import KubernetesMonitor
+from plugin_config import InfrastructureConfig, PluginConfig
+from target_context import TargetContext
+from utils import list_job_deployments
+
+from fake_gateway import FakeCluster, FakeGatewayServer, FakeKubectl, GatewayStats, LatencyModel
+
+NAMESPACE = 'racetrack'
+
+
+@dataclass
+class BenchmarkContext:
+    jobs: int
+    replicas: int
+    cluster: FakeCluster
+    stats: GatewayStats
+    infra_config: InfrastructureConfig
+    infrastructure_name: str
+
+    def target_context(self, **overrides) -> TargetContext:
+        """Create fresh state of the infrastructure target, as the plugin does once per target"""
+        return TargetContext(self.infrastructure_name, InfrastructureConfig(**{**dict(self.infra_config), **overrides}))
+
+
+def measure(name: str, context: BenchmarkContext, runs: int, action: Callable[[], Any]) -> dict[str, Any]:
+    """Time a number of runs of an action, along with the traffic it caused on the gateway"""
+    durations = []
+    stats_before = context.stats.snapshot()
+    for _ in range(runs):
+        start = time.perf_counter()
+        action()
+        durations.append(time.perf_counter() - start)
+    stats_after = context.stats.snapshot()
+    durations.sort()
+    result = {
+        'benchmark': name,
+        'jobs': context.jobs,
+        'replicas': context.replicas,
+        'transport': context.infra_config.kube_api_transport,
+        'runs': runs,
+        'mean_s': statistics.fmean(durations),
+        'median_s': statistics.median(durations),
+        'p95_s': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+        'min_s': durations[0],
+        'max_s': durations[-1],
+    }
+    for key, value in stats_after.items():
+        result[f'{key}_per_run'] = (value - stats_before[key]) / runs
+    print(f"{name:<32} jobs={context.jobs:<6} median={result['median_s'] * 1000:9.1f} ms"
+          f"  round trips/run={result['round_trips_per_run']:.1f}", file=sys.stderr)
+    return result
+
+
+def bench_list_job_deployments(context: BenchmarkContext, runs: int) -> list[dict[str, Any]]:
+    kube = context.target_context().kube
+    return [measure('list_job_deployments', context, runs,
+                    lambda: list_job_deployments(kube, context.infra_config.pod_list_chunk_size))]
+
+
+def bench_monitor_list_jobs(context: BenchmarkContext, runs: int) -> list[dict[str, Any]]:
+    config = Config()
+    results = []
+    monitor = KubernetesMonitor(context.target_context())
+    results.append(measure('monitor_list_jobs', context, runs, lambda: list(monitor.list_jobs(config))))
+
+    monitor = KubernetesMonitor(context.target_context(pod_watch_enabled=True))
+    list(monitor.list_jobs(config))  # warm up the pod index
+    results.append(measure('monitor_list_jobs_indexed', context, runs, lambda: list(monitor.list_jobs(config))))
+    return results
+
+
+def bench_deploy_delete(context: BenchmarkContext, runs: int) -> list[dict[str, Any]]:
+    # the family model and its auth token come from the lifecycle's database, which isn't available here
+    deployer_module.read_job_family_model = lambda family_name: SimpleNamespace(name=family_name)
+    deployer_module.get_auth_subject_by_job_family = lambda family_model: SimpleNamespace(token='benchmark-token')
+    job_deployer = KubernetesJobDeployer(SRC_DIR, context.target_context(), PluginConfig())
+    config = Config()
+    plugin_engine = SimpleNamespace(invoke_plugin_hook=lambda hook: [])
+    manifests = [
+        parse_dict_datamodel({
+            'name': f'bench-{run}',
+            'owner_email': 'benchmark@example.com',
+            'jobtype': 'python3:latest',
+            'git': {'remote': 'https://github.com/TheRacetrack/racetrack'},
+        }, Manifest)
+        for run in range(runs)
+    ]
+    run_index = iter(range(runs))
+    deploy = lambda: job_deployer.deploy_job(
+        manifests[next(run_index)], config, plugin_engine, 'latest', {'ENV_VAR': 'value'}, SimpleNamespace(name='bench'),
+    )
+    results = [measure('deploy_job', context, runs, deploy)]
+    run_index = iter(range(runs))
+    delete = lambda: job_deployer.delete_job(manifests[next(run_index)].name, manifests[0].version)
+    results.append(measure('delete_job', context, runs, delete))
+    return results
+
+
+def bench_get_job_secrets(context: BenchmarkContext, runs: int) -> list[dict[str, Any]]:
+    job_deployer = KubernetesJobDeployer(SRC_DIR, context.target_context(), PluginConfig())
+    return [measure('get_job_secrets', context, runs, lambda: job_deployer.get_job_secrets('job-00000', '1.0.0'))]
+
+
+def bench_logs_streaming(context: BenchmarkContext, sessions: int, duration: float) -> list[dict[str, Any]]:
+    """Measure how many log lines per second reach the clients following the logs of many jobs at once"""
+    streamer = KubernetesLogsStreamer(context.target_context())
+    delivered_lines = 0
+    lock = threading.Lock()
+
+    def on_next_line(session_id: str, line: str):
+        nonlocal delivered_lines
+        with lock:
+            delivered_lines += 1
+
+    stats_before = context.stats.snapshot()
+    start = time.perf_counter()
+    for session_index in range(sessions):
+        job_name = f'job-{session_index % context.jobs:05d}'
+        streamer.create_session(f'session-{session_index}', {'job_name': job_name, 'job_version': '1.0.0', 'tail': '20'}, on_next_line)
+    time.sleep(duration)
+    for session_index in range(sessions):
+        streamer.close_session(f'session-{session_index}')
+    elapsed = time.perf_counter() - start
+    stats_after = context.stats.snapshot()
+    print(f"{'logs_streaming':<32} jobs={context.jobs:<6} lines/s={delivered_lines / elapsed:9.1f}", file=sys.stderr)
+    return [{
+        'benchmark': 'logs_streaming',
+        'jobs': context.jobs,
+        'replicas': context.replicas,
+        'transport': context.infra_config.kube_api_transport,
+        'sessions': sessions,
+        'duration_s': elapsed,
+        'delivered_lines': delivered_lines,
+        'lines_per_s': delivered_lines / elapsed,
+        **{f'{key}_per_s': (value - stats_before[key]) / elapsed for key, value in stats_after.items()},
+    }]
+
+
+def run_scale(args: argparse.Namespace, jobs: int) -> list[dict[str, Any]]:
+    latency = LatencyModel(args.latency_ms, args.jitter_ms)
+    stats = GatewayStats()
+    cluster = FakeCluster(NAMESPACE, jobs, args.replicas, log_lines_per_second=args.log_rate)
+    server = FakeGatewayServer(cluster, latency, stats)
+    remote_executor.remote_shell = FakeKubectl(cluster, latency, stats).remote_shell
+    infra_config = InfrastructureConfig(
+        remote_gateway_url=server.url,
+        remote_gateway_token='benchmark',
+        job_k8s_namespace=NAMESPACE,
+        kube_api_transport=args.transport,
+        kube_api_url=server.url if args.transport == 'http' else None,
+        image_registry_url=server.url,
+    )
+    context = BenchmarkContext(jobs, args.replicas, cluster, stats, infra_config, f'benchmark-{jobs}')
+    try:
+        results = []
+        results += bench_list_job_deployments(context, args.runs)
+        results += bench_monitor_list_jobs(context, args.runs)
+        results += bench_deploy_delete(context, args.runs)
+        results += bench_get_job_secrets(context, args.runs)
+        results += bench_logs_streaming(context, min(args.log_sessions, jobs), args.log_duration)
+        return results
+    finally:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the plugin against a synthetic cluster')
+    parser.add_argument('--jobs', default='10,100,1000', help='comma-separated numbers of jobs to scale through')
+    parser.add_argument('--replicas', type=int, default=2, help='replicas of each job')
+    parser.add_argument('--latency-ms', type=float, default=20, help='latency added to every gateway round trip')
+    parser.add_argument('--jitter-ms', type=float, default=5, help='maximum random deviation from the latency')
+    parser.add_argument('--transport', choices=['kubectl', 'http'], default='kubectl', help='kube_api_transport to benchmark')
+    parser.add_argument('--runs', type=int, default=5, help='repetitions of each timed operation')
+    parser.add_argument('--log-sessions', type=int, default=50, help='concurrent log streaming sessions')
+    parser.add_argument('--log-duration', type=float, default=10, help='seconds of log streaming')
+    parser.add_argument('--log-rate', type=float, default=10, help='log lines per second written by each pod')
+    parser.add_argument('--output', help='path of the JSON results file, printed to stdout if not given')
+    args = parser.parse_args()
+
+    results = []
+    for jobs in [int(jobs) for jobs in args.jobs.split(',')]:
+        results += run_scale(args, jobs)
+
+    plugin_manifest = yaml.safe_load((SRC_DIR / 'plugin-manifest.yaml').read_text())
+    report = {
+        'plugin_version': plugin_manifest.get('version'),
+        'python_version': platform.python_version(),
+        'timestamp': int(time.time()),
+        'parameters': {key: value for key, value in vars(args).items() if key != 'output'},
+        'results': results,
+    }
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(report_json + '\n')
+    else:
+        print(report_json)
+
+
+if __name__ == '__main__':
+    main()
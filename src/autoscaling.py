@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Any
+
+from racetrack_client.log.logs import get_logger
+from racetrack_client.utils.datamodel import parse_dict_datamodel
+
+from instrumentation import Instrumentation
+from kube_client import KubeClient
+from plugin_config import AutoscalingConfig
+from utils import K8S_JOB_NAME_LABEL, K8S_JOB_RESOURCE_LABEL, K8S_JOB_VERSION_LABEL
+
+logger = get_logger(__name__)
+
+# prefix of the manifest labels overriding the autoscaling settings of a job, e.g. "autoscaling_max_replicas: 8"
+AUTOSCALING_LABEL_PREFIX = 'autoscaling_'
+
+
+def resolve_autoscaling(
+    defaults: AutoscalingConfig,
+    manifest_labels: dict[str, Any] | None,
+    manifest_replicas: int,
+) -> AutoscalingConfig | None:
+    """Merge the job's manifest labels into the target's autoscaling settings. Return None if the job isn't autoscaled."""
+    overrides = {
+        key[len(AUTOSCALING_LABEL_PREFIX):]: value
+        for key, value in (manifest_labels or {}).items()
+        if key.startswith(AUTOSCALING_LABEL_PREFIX)
+    }
+    autoscaling: AutoscalingConfig = parse_dict_datamodel({**dict(defaults), **overrides}, AutoscalingConfig)
+    if not autoscaling.enabled:
+        return None
+    if autoscaling.min_replicas is None:
+        autoscaling.min_replicas = manifest_replicas
+
+    assert autoscaling.min_replicas >= 1, 'autoscaling min_replicas must be at least 1'
+    assert autoscaling.max_replicas >= autoscaling.min_replicas, 'autoscaling max_replicas must not be less than min_replicas'
+    assert autoscaling.cpu_utilization or autoscaling.memory_utilization or autoscaling.requests_per_second, \
+        'autoscaling needs at least one target: cpu_utilization, memory_utilization or requests_per_second'
+    return autoscaling
+
+
+class ReplicasReporter:
+    """
+    Reports current and desired replicas of the autoscaled jobs, as seen by their HorizontalPodAutoscalers.
+    They are listed at most once per interval, so that monitoring passes served from the pod index stay free of calls.
+    """
+
+    def __init__(self, kube: KubeClient, instrumentation: Instrumentation, interval: float):
+        self.kube = kube
+        self.instrumentation = instrumentation
+        self.interval = interval
+        self._reported_at: float | None = None
+        self._reported: set[tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    def report_if_due(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._reported_at is not None and now - self._reported_at < self.interval:
+                return
+            self._reported_at = now
+
+        autoscalers = self.kube.list_resources('horizontalpodautoscaler', K8S_JOB_RESOURCE_LABEL)
+        reported = set()
+        for autoscaler in autoscalers:
+            labels = autoscaler['metadata'].get('labels') or {}
+            job_key = (labels.get(K8S_JOB_NAME_LABEL), labels.get(K8S_JOB_VERSION_LABEL))
+            if not all(job_key):
+                continue
+            status = autoscaler.get('status') or {}
+            self.instrumentation.report_job_replicas(
+                job_key[0], job_key[1], status.get('currentReplicas', 0), status.get('desiredReplicas', 0),
+            )
+            reported.add(job_key)
+
+        with self._lock:
+            removed, self._reported = self._reported - reported, reported
+        for job_name, job_version in removed:
+            self.instrumentation.forget_job_replicas(job_name, job_version)
@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from racetrack_client.manifest import Manifest
+from racetrack_commons.entities.dto import JobDto, JobFamilyDto
+
+from templating import RenderedResource
+
+T = TypeVar('T')
+
+
+@dataclass
+class JobDeploymentRequest:
+    """Arguments of deploy_job for a single job of a bulk deployment"""
+    manifest: Manifest
+    tag: str
+    runtime_env_vars: dict[str, str]
+    family: JobFamilyDto
+    containers_num: int = 1
+    runtime_secret_vars: dict[str, str] | None = None
+
+
+@dataclass
+class BulkJobResult:
+    job_name: str
+    job_version: str
+    job: JobDto | None = None  # deployed job, set by a successful bulk deployment
+    error: str | None = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class RenderedJob:
+    """Resources of a job ready to be applied"""
+    resource_name: str
+    resources: list[RenderedResource]
+    job: JobDto
+    optional_resources: list[str]  # kinds of the optional resources rendered for the job, e.g. horizontalpodautoscaler
+    prepull_daemon_set: dict[str, Any] | None = None  # DaemonSet pulling the job images on all nodes before the rollout
+
+
+def chunked(items: list[T], size: int) -> list[list[T]]:
+    size = max(1, size)
+    return [items[start:start + size] for start in range(0, len(items), size)]
@@ -1,20 +1,20 @@
+import copy
 import json
-import os
-import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 from base64 import b64decode, b64encode
 
-from jinja2 import Template
-
+import yaml
 from lifecycle.auth.subject import get_auth_subject_by_job_family
 from lifecycle.config import Config
 from lifecycle.deployer.base import JobDeployer
 from lifecycle.deployer.secrets import JobSecrets
-from lifecycle.infrastructure.infra_target import remote_shell
 from lifecycle.job.models_registry import read_job_family_model
 from racetrack_client.client.env import merge_env_vars
 from racetrack_client.client_config.client_config import Credentials
+from racetrack_client.log.exception import short_exception_details
 from racetrack_client.log.logs import get_logger
 from racetrack_client.manifest import Manifest
 from racetrack_client.manifest.manifest import ResourcesManifest
@@ -22,25 +22,42 @@ from racetrack_client.utils.datamodel import convert_to_json, parse_dict_datamod
 from racetrack_client.utils.time import datetime_to_timestamp, now
 from racetrack_commons.plugin.core import PluginCore
 from racetrack_commons.plugin.engine import PluginEngine
-from racetrack_commons.api.debug import debug_mode_enabled
 from racetrack_commons.api.tracing import get_tracing_header_name
 from racetrack_commons.deploy.image import get_job_image
 from racetrack_commons.deploy.resource import job_resource_name
 from racetrack_commons.entities.dto import JobDto, JobStatus, JobFamilyDto
 
-from plugin_config import InfrastructureConfig, PluginConfig
+from autoscaling import resolve_autoscaling
+from bulk import BulkJobResult, JobDeploymentRequest, RenderedJob, chunked
+from images import ImageDigestResolver, wait_for_prepull
+from plugin_config import PluginConfig
+from rollout import resolve_rollout, startup_failure_threshold
+from secrets_cache import CachedSecrets
+from target_context import TargetContext
+from templating import RenderedResource, fingerprint_resources, read_content_hashes, template_resource
 
 logger = get_logger(__name__)
 
+# kinds of the optional resources rendered along with a job's Deployment, recorded in its annotation
+OPTIONAL_RESOURCES_ANNOTATION = 'racetrack/optional-resources'
+
 
 class KubernetesJobDeployer(JobDeployer):
 
-    def __init__(self, src_dir: Path, infrastructure_name: str, infra_config: InfrastructureConfig, plugin_config: PluginConfig) -> None:
+    def __init__(self, src_dir: Path, context: TargetContext, plugin_config: PluginConfig) -> None:
         self.src_dir = src_dir
         self.plugin_config = plugin_config
-        self.infra_config = infra_config
-        self.infrastructure_name = infrastructure_name
-        self.k8s_namespace = infra_config.job_k8s_namespace
+        self.context = context
+        self.infra_config = context.infra_config
+        self.infrastructure_name = context.infrastructure_name
+        self.k8s_namespace = context.k8s_namespace
+        self.kube = context.kube
+        self.secrets_cache = context.secrets_cache
+        self.digest_resolver: ImageDigestResolver | None = None
+        if self.infra_config.image_pinning_enabled:
+            self.digest_resolver = ImageDigestResolver(
+                plugin_config.docker, self.infra_config.image_registry_url, self.infra_config.image_registry_timeout,
+            )
 
     def deploy_job(
         self,
@@ -54,6 +71,79 @@ class KubernetesJobDeployer(JobDeployer):
         runtime_secret_vars: dict[str, str] | None = None,
     ) -> JobDto:
         """Deploy Job on Kubernetes and expose Service accessible by Job name"""
+        rendered_job = self._render_job(
+            manifest, config, plugin_engine, tag, runtime_env_vars, family, containers_num, runtime_secret_vars,
+        )
+        self._prepull_images([rendered_job])
+        live_resources = self._apply_resources(rendered_job.resources, 'job_template.yaml')
+        self._delete_stale_resources([rendered_job], live_resources)
+        return rendered_job.job
+
+    def deploy_jobs(self, requests: list[JobDeploymentRequest], config: Config, plugin_engine: PluginEngine) -> list[BulkJobResult]:
+        """
+        Deploy many jobs in one operation, e.g. to redeploy all of them after a change of the base image.
+        Jobs are rendered concurrently and applied in multi-document batches, a limited number of batches at a time.
+        Images of a batch are pre-pulled (if enabled) right before applying it.
+        A failing job doesn't abort the others, as a result is reported for each of them, in order of the requests.
+        """
+        results = [BulkJobResult(request.manifest.name, request.manifest.version) for request in requests]
+
+        def render(index: int) -> RenderedJob | None:
+            request = requests[index]
+            try:
+                return self._render_job(
+                    request.manifest, config, plugin_engine, request.tag, request.runtime_env_vars,
+                    request.family, request.containers_num, request.runtime_secret_vars,
+                )
+            except Exception as e:
+                results[index].error = short_exception_details(e)
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, self.infra_config.bulk_workers), thread_name_prefix='k8s-bulk') as executor:
+            rendered_jobs = list(executor.map(render, range(len(requests))))
+            batches = chunked([
+                (index, rendered_job) for index, rendered_job in enumerate(rendered_jobs) if rendered_job is not None
+            ], self.infra_config.bulk_batch_size)
+
+            def deploy_batch(batch: list[tuple[int, RenderedJob]]):
+                self._prepull_images([rendered_job for _, rendered_job in batch])
+                self._deploy_batch(batch, results)
+
+            list(executor.map(deploy_batch, batches))
+
+        failed = sum(not result.succeeded for result in results)
+        logger.info(f'deployed {len(results) - failed} jobs in bulk, {failed} failed')
+        return results
+
+    def _deploy_batch(self, batch: list[tuple[int, RenderedJob]], results: list[BulkJobResult]):
+        """Apply resources of a batch of jobs in a single call, falling back to applying them one by one if it fails"""
+        try:
+            live_resources = self._apply_resources(
+                [resource for _, rendered_job in batch for resource in rendered_job.resources], f'a batch of {len(batch)} jobs',
+            )
+            self._delete_stale_resources([rendered_job for _, rendered_job in batch], live_resources)
+        except Exception as e:
+            if len(batch) == 1:
+                results[batch[0][0]].error = short_exception_details(e)
+                return
+            logger.warning(f'failed to apply a batch of {len(batch)} jobs, applying them one by one: {e}')
+            for item in batch:
+                self._deploy_batch([item], results)
+            return
+        for index, rendered_job in batch:
+            results[index].job = rendered_job.job
+
+    def _render_job(
+        self,
+        manifest: Manifest,
+        config: Config,
+        plugin_engine: PluginEngine,
+        tag: str,
+        runtime_env_vars: dict[str, str],
+        family: JobFamilyDto,
+        containers_num: int,
+        runtime_secret_vars: dict[str, str] | None,
+    ) -> RenderedJob:
         resource_name = job_resource_name(manifest.name, manifest.version)
         deployment_timestamp = datetime_to_timestamp(now())
         family_model = read_job_family_model(family.name)
@@ -92,6 +182,10 @@ class KubernetesJobDeployer(JobDeployer):
         if memory_min.plain_number * 4 < memory_max.plain_number:
             memory_min = memory_max / 4
             logger.info(f'minimum memory increased to memory_max/4: {memory_min}')
+        if self.context.rightsizer is not None:
+            cpu_min, memory_min = self.context.rightsizer.adjust(
+                manifest.name, resources, cpu_min, cpu_max, memory_min, memory_max,
+            )
 
         assert memory_max <= config.max_job_memory_limit, \
             f'given memory limit {memory_max} is greater than max allowed {config.max_job_memory_limit}'
@@ -111,7 +205,16 @@ class KubernetesJobDeployer(JobDeployer):
             'cpu_max': cpu_max,
             'job_k8s_namespace': self.k8s_namespace,
             'runtime_secret_vars': runtime_secret_vars or {},
+            'autoscaling': resolve_autoscaling(self.infra_config.autoscaling, manifest.labels, manifest.replicas),
+            'rollout': resolve_rollout(self.infra_config.rollout, manifest.labels),
         }
+        render_vars['startup_failure_threshold'] = startup_failure_threshold(render_vars['rollout'])
+        optional_resources = []
+        if render_vars['autoscaling'] is not None:
+            optional_resources.append('horizontalpodautoscaler')
+        if render_vars['rollout'].disruption_budget_enabled:
+            optional_resources.append('poddisruptionbudget')
+        render_vars['optional_resources'] = optional_resources
         
         container_vars = []  # list of container tuples: (container_name, image_name, container_port)
         for container_index in range(containers_num):
@@ -119,12 +222,30 @@ class KubernetesJobDeployer(JobDeployer):
             image_name = get_job_image(config.docker_registry, config.docker_registry_namespace, manifest.name, tag, container_index)
             container_port = 7000 + container_index
             container_vars.append((container_name, image_name, container_port))
-        render_vars['containers'] = container_vars
-
-        self._apply_templated_resource('job_template.yaml', render_vars, self.src_dir)
 
+        image_pull_policy = 'Always'
+        if self.digest_resolver is not None:
+            pinned_images = self.digest_resolver.pin_images([image_name for _, image_name, _ in container_vars])
+            if pinned_images is not None:
+                container_vars = [
+                    (container_name, pinned_image, container_port)
+                    for (container_name, _, container_port), pinned_image in zip(container_vars, pinned_images)
+                ]
+                image_pull_policy = 'IfNotPresent'
+        render_vars['containers'] = container_vars
+        render_vars['image_pull_policy'] = image_pull_policy
+        prepull_daemon_set = None
+        if self.infra_config.image_prepull_enabled:
+            prepull_yaml = template_resource('prepull_template.yaml', {
+                **render_vars,
+                'daemon_set_name': f'{resource_name}-prepull',
+                'prepull_helper_image': self.infra_config.image_prepull_helper_image,
+            }, self.src_dir)
+            prepull_daemon_set = next(body for body in yaml.safe_load_all(prepull_yaml) if body)
+
+        resources = fingerprint_resources(template_resource('job_template.yaml', render_vars, self.src_dir))
         internal_name = f'{resource_name}.{self.k8s_namespace}.svc:7000'
-        return JobDto(
+        job = JobDto(
             name=manifest.name,
             version=manifest.version,
             status=JobStatus.RUNNING.value,
@@ -135,27 +256,74 @@ class KubernetesJobDeployer(JobDeployer):
             image_tag=tag,
             infrastructure_target=self.infrastructure_name,
         )
+        return RenderedJob(
+            resource_name, resources, job, optional_resources,
+            prepull_daemon_set=prepull_daemon_set,
+        )
+
+    def _delete_stale_resources(self, rendered_jobs: list[RenderedJob], live_resources: dict[str, dict[str, Any]]):
+        """
+        Remove optional resources of the jobs that have been turned off since the previous deployment,
+        as recorded in the annotation of their live Services. A failure is logged, as the jobs are deployed anyway.
+        """
+        refs = []
+        for rendered_job in rendered_jobs:
+            live_service = live_resources.get(f'service/{rendered_job.resource_name}')
+            if live_service is None:
+                continue
+            previous_resources = set(_read_optional_resources(live_service))
+            for kind in sorted(previous_resources - set(rendered_job.optional_resources)):
+                refs.append(f'{kind}/{rendered_job.resource_name}')
+        if not refs:
+            return
+        try:
+            self.kube.delete_resources(refs, optional_refs=refs)
+        except Exception as e:
+            logger.warning(f'failed to delete stale resources {", ".join(refs)}: {e}')
 
     def delete_job(self, job_name: str, job_version: str):
         resource_name = job_resource_name(job_name, job_version)
-
-        self.remote_shell(f'/opt/kubectl delete deployment/{resource_name} -n {self.k8s_namespace}')
-        logger.info(f'deleted k8s deployment: {resource_name}')
-
-        self.remote_shell(f'/opt/kubectl delete service/{resource_name} -n {self.k8s_namespace}')
-        logger.info(f'deleted k8s service: {resource_name}')
-
-        if self._resource_exists(f'secret/{resource_name}'):
-            self.remote_shell(f'/opt/kubectl delete secret/{resource_name} -n {self.k8s_namespace}')
-            logger.info(f'deleted k8s secret: {resource_name}')
-        else:
-            logger.warning(f'k8s secret "{resource_name}" was not found')
-
-        if self._resource_exists(f'servicemonitors/{resource_name}'):
-            self.remote_shell(f'/opt/kubectl delete servicemonitors/{resource_name} -n {self.k8s_namespace}')
-            logger.info(f'deleted k8s servicemonitor: {resource_name}')
-        else:
-            logger.warning(f'k8s servicemonitor "{resource_name}" was not found')
+        self.secrets_cache.forget(resource_name)
+        refs, optional_refs = self._job_resource_refs([resource_name])
+        existed = self.kube.delete_resources(refs, optional_refs)
+        _check_deleted_resources(resource_name, existed)
+
+    def delete_jobs(self, jobs: list[tuple[str, str]]) -> list[BulkJobResult]:
+        """
+        Delete many jobs, given as (name, version) pairs, in one operation.
+        Resources of a batch of jobs are deleted in a single call, a limited number of batches at a time.
+        A result is reported for each job, in order of the given pairs.
+        """
+        results = [BulkJobResult(job_name, job_version) for job_name, job_version in jobs]
+        batches = chunked(list(enumerate(jobs)), self.infra_config.bulk_batch_size)
+        with ThreadPoolExecutor(max_workers=max(1, self.infra_config.bulk_workers), thread_name_prefix='k8s-bulk') as executor:
+            list(executor.map(lambda batch: self._delete_batch(batch, results), batches))
+
+        failed = sum(not result.succeeded for result in results)
+        logger.info(f'deleted {len(results) - failed} jobs in bulk, {failed} failed')
+        return results
+
+    def _delete_batch(self, batch: list[tuple[int, tuple[str, str]]], results: list[BulkJobResult]):
+        """Delete resources of a batch of jobs in a single call, falling back to deleting them one by one if it fails"""
+        resource_names = {index: job_resource_name(job_name, job_version) for index, (job_name, job_version) in batch}
+        for resource_name in resource_names.values():
+            self.secrets_cache.forget(resource_name)
+        try:
+            refs, optional_refs = self._job_resource_refs(list(resource_names.values()))
+            existed = self.kube.delete_resources(refs, optional_refs)
+        except Exception as e:
+            if len(batch) == 1:
+                results[batch[0][0]].error = short_exception_details(e)
+                return
+            logger.warning(f'failed to delete a batch of {len(batch)} jobs, deleting them one by one: {e}')
+            for item in batch:
+                self._delete_batch([item], results)
+            return
+        for index, resource_name in resource_names.items():
+            try:
+                _check_deleted_resources(resource_name, existed)
+            except Exception as e:
+                results[index].error = short_exception_details(e)
 
     def job_exists(self, job_name: str, job_version: str) -> bool:
         resource_name = job_resource_name(job_name, job_version)
@@ -167,7 +335,7 @@ class KubernetesJobDeployer(JobDeployer):
         job_version: str,
         job_secrets: JobSecrets,
     ):
-        """Create or update secrets needed to build and deploy a job"""
+        """Create or update secrets needed to build and deploy a job, unless they're unchanged since the last apply"""
         resource_name = job_resource_name(job_name, job_version)
         encoded_runtime_vars = {}
         for var_name, var_value in job_secrets.secret_runtime_env.items():
@@ -182,21 +350,30 @@ class KubernetesJobDeployer(JobDeployer):
             'job_k8s_namespace': self.k8s_namespace,
             'encoded_runtime_vars': encoded_runtime_vars,
         }
-        self._apply_templated_resource('secret_template.yaml', render_vars, self.src_dir)
+        resources = fingerprint_resources(template_resource('secret_template.yaml', render_vars, self.src_dir))
+        self._apply_resources(resources, 'secret_template.yaml')
+        cached = self.secrets_cache.get(resource_name)
+        if len(resources) == 1 and (cached is None or cached.content_hash != resources[0].content_hash):
+            # resourceVersion of the written Secret is unknown, so it will be read back in full
+            self.secrets_cache.put(resource_name, CachedSecrets(None, resources[0].content_hash, copy.deepcopy(job_secrets)))
 
     def get_job_secrets(
         self,
         job_name: str,
         job_version: str,
     ) -> JobSecrets:
-        """Retrieve secrets for building and deploying a job"""
+        """Retrieve secrets for building and deploying a job, decoding them only if they have changed since cached"""
         resource_name = job_resource_name(job_name, job_version)
-        if not self._resource_exists(f'secret/{resource_name}'):
+        cached = self.secrets_cache.get(resource_name)
+        changed, result = self.kube.get_changed_resource(
+            f'secret/{resource_name}', cached.resource_version if cached is not None else None,
+        )
+        if not changed:
+            return copy.deepcopy(cached.secrets)
+        if result is None:
+            self.secrets_cache.forget(resource_name)
             raise RuntimeError(f"Can't find secrets associated with job {job_name} v{job_version}")
 
-        output_str = self.remote_shell(f"/opt/kubectl -n {self.k8s_namespace} get secret/{resource_name} -o json")
-        result = json.loads(output_str.strip())
-
         secret_data: dict[str, str] = result['data']
 
         secret_build_env = _decode_secret_key(secret_data, 'secret_build_env') or {}
@@ -204,45 +381,125 @@ class KubernetesJobDeployer(JobDeployer):
         git_credentials_dict = _decode_secret_key(secret_data, 'git_credentials')
         git_credentials = parse_dict_datamodel(git_credentials_dict, Credentials) if git_credentials_dict else None
 
-        return JobSecrets(
+        job_secrets = JobSecrets(
             git_credentials=git_credentials,
             secret_build_env=secret_build_env,
             secret_runtime_env=secret_runtime_env,
         )
-
-    def _apply_templated_resource(self, template_filename: str, render_vars: dict[str, Any], src_dir: Path):
-        """Create resource from YAML template and apply it to kubernetes using kubectl apply"""
-        fd, path = tempfile.mkstemp(prefix=template_filename, suffix='.yaml')
+        content_hash = read_content_hashes([result]).get(f'secret/{resource_name}')
+        self.secrets_cache.put(resource_name, CachedSecrets(
+            result['metadata'].get('resourceVersion'), content_hash, copy.deepcopy(job_secrets),
+        ))
+        return job_secrets
+
+    def _prepull_images(self, rendered_jobs: list[RenderedJob]):
+        """Pull the images of the jobs on all nodes with short-lived DaemonSets, so that the new pods don't wait for them"""
+        daemon_sets = [rendered_job.prepull_daemon_set for rendered_job in rendered_jobs
+                       if rendered_job.prepull_daemon_set is not None]
+        if not daemon_sets:
+            return
+        daemon_set_names = [daemon_set['metadata']['name'] for daemon_set in daemon_sets]
+        start = time.monotonic()
         try:
-            resource_yaml = _template_resource(template_filename, render_vars, src_dir)
-            self.remote_shell(f'''
-cat <<EOF | /opt/kubectl apply -f -
-{resource_yaml}
-EOF
-'''.strip())
-        finally:
-            if not debug_mode_enabled():
-                os.remove(path)
+            self.kube.apply_resources(daemon_sets)
+            try:
+                deadline = start + self.infra_config.image_prepull_timeout
+                for daemon_set_name in daemon_set_names:  # images are pulled by all DaemonSets at once
+                    if wait_for_prepull(self.kube, daemon_set_name, max(0.0, deadline - time.monotonic()),
+                                        self.infra_config.rollout_poll_interval):
+                        logger.info(f'images of {daemon_set_name} have been pre-pulled in {time.monotonic() - start:.1f}s')
+            finally:
+                self.kube.delete_resources([f'daemonset/{daemon_set_name}' for daemon_set_name in daemon_set_names])
+        except Exception as e:
+            logger.warning(f'failed to pre-pull images by {", ".join(daemon_set_names)}: {e}')
+
+    def _apply_resources(self, resources: list[RenderedResource], description: str) -> dict[str, dict[str, Any]]:
+        """
+        Apply resources in a single call, skipping the rendered resources that are unchanged since the last apply,
+        i.e. whose content hash matches the one annotated on the live resource.
+        Deployments are rendered with a new timestamp every time, so they're applied without comparing them,
+        and they're read only if their live replicas have to be kept.
+        Return the live objects that have been read before the apply, by their refs.
+        """
+        refs = [resource.ref for resource in resources if resource.kind != 'Deployment' or _is_autoscaled(resource.body)]
+        live_resources = {
+            f"{item['kind'].lower()}/{item['metadata']['name']}": item
+            for item in (self.kube.get_resources(refs) if refs else [])
+        }
+        live_hashes = read_content_hashes(list(live_resources.values()))
+        changed_resources = [
+            resource for resource in resources
+            if resource.kind == 'Deployment' or live_hashes.get(resource.ref) != resource.content_hash
+        ]
+        if not changed_resources:
+            logger.info(f'resources from {description} are up to date, skipping apply')
+            return live_resources
+
+        self.kube.apply_resources([
+            _keep_live_replicas(resource.body, live_resources.get(resource.ref)) for resource in changed_resources
+        ])
+        return live_resources
 
     def _resource_exists(self, resource_name: str) -> bool:
-        output = self.remote_shell(f"/opt/kubectl -n {self.k8s_namespace} get {resource_name} --ignore-not-found -o name")
-        return bool(output.strip())
-
-    def remote_shell(self, cmd: str, workdir: str | None = None) -> str:
-        return remote_shell(cmd, self.infra_config.remote_gateway_url, self.infra_config.remote_gateway_token, workdir)
-
-
-def _template_resource(template_filename: str, render_vars: dict[str, Any], src_dir: Path) -> str:
-    """Load template from YAML, render templated vars and return as a string"""
-    template_path = src_dir / 'templates' / template_filename
-    override_template_path = Path('/mnt/templates/remote-kubernetes') / template_filename
-    if override_template_path.is_file():
-        template_path = override_template_path
-
-    template_content = template_path.read_text()
-    template = Template(template_content)
-    templated = template.render(**render_vars)
-    return templated
+        return bool(self.kube.get_resources([resource_name]))
+
+    def _job_resource_refs(self, resource_names: list[str]) -> tuple[list[str], list[str]]:
+        """
+        Return refs of all resources of the jobs, and which of them are optional.
+        Optional resources are included only if they're recorded in the annotation of the job's live Deployment.
+        """
+        live_deployments = self.kube.get_resources([f'deployment/{resource_name}' for resource_name in resource_names])
+        optional_resources = {
+            deployment['metadata']['name']: _read_optional_resources(deployment) for deployment in live_deployments
+        }
+        refs, optional_refs = [], []
+        for resource_name in resource_names:
+            refs.extend(f'{kind}/{resource_name}' for kind in ['deployment', 'service', 'secret', 'servicemonitor'])
+            for kind in optional_resources.get(resource_name, []):
+                refs.append(f'{kind}/{resource_name}')
+                optional_refs.append(f'{kind}/{resource_name}')
+        return refs, optional_refs
+
+
+def _keep_live_replicas(body: dict[str, Any], live_item: dict[str, Any] | None) -> dict[str, Any]:
+    """
+    Carry the current replicas of a live Deployment over to the one rendered without replicas, i.e. an autoscaled one.
+    Applying it without replicas would reset them to 1, e.g. on the deployment turning on the autoscaling.
+    """
+    if body['kind'] != 'Deployment' or not _is_autoscaled(body) or live_item is None:
+        return body
+    live_replicas = live_item.get('spec', {}).get('replicas')
+    if live_replicas is None:
+        return body
+    return {**body, 'spec': {**body['spec'], 'replicas': live_replicas}}
+
+
+def _is_autoscaled(deployment: dict[str, Any]) -> bool:
+    """Tell whether a rendered Deployment leaves its replicas to the autoscaler"""
+    return 'replicas' not in deployment.get('spec', {})
+
+
+def _read_optional_resources(live_item: dict[str, Any]) -> list[str]:
+    """Return kinds of the optional resources recorded in the annotation of a live Deployment or Service"""
+    annotations = live_item['metadata'].get('annotations') or {}
+    return list(filter(None, (annotations.get(OPTIONAL_RESOURCES_ANNOTATION) or '').split(',')))
+
+
+def _check_deleted_resources(resource_name: str, existed: dict[str, bool]):
+    """Log the deleted resources of a job, raising an error if its Deployment or Service was missing"""
+    for kind in ['deployment', 'service']:
+        if not existed[f'{kind}/{resource_name}']:
+            raise RuntimeError(f'k8s {kind} "{resource_name}" was not found')
+        logger.info(f'deleted k8s {kind}: {resource_name}')
+
+    for kind in ['secret', 'servicemonitor']:
+        if existed[f'{kind}/{resource_name}']:
+            logger.info(f'deleted k8s {kind}: {resource_name}')
+        else:
+            logger.warning(f'k8s {kind} "{resource_name}" was not found')
+    for kind in ['horizontalpodautoscaler', 'poddisruptionbudget']:
+        if existed.get(f'{kind}/{resource_name}'):
+            logger.info(f'deleted k8s {kind}: {resource_name}')
 
 
 def _encode_secret_key(obj: Any) -> str:
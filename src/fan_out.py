@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from dataclasses import dataclass
+from typing import Callable
+
+from lifecycle.config import Config
+from racetrack_client.log.logs import get_logger
+from racetrack_commons.entities.dto import JobDto
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _Listing:
+    future: Future
+    started: float
+    consumed: bool = False
+
+
+class ListingFanOut:
+    """
+    Lists jobs of all infrastructure targets concurrently.
+    Lifecycle asks the monitors of the targets one after another, so the first request starts listing all targets at once
+    and the following ones pick up their results. Each target is waited for no longer than the timeout,
+    so an unreachable cluster doesn't hold up the others. Listing of a target that hasn't finished yet is never started twice.
+    """
+
+    def __init__(self, workers: int, timeout: float):
+        self.timeout = timeout
+        self._listers: dict[str, Callable[[Config], list[JobDto]]] = {}
+        self._listings: dict[str, _Listing] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='list-jobs')
+        self._lock = threading.Lock()
+
+    def register(self, infrastructure_name: str, lister: Callable[[Config], list[JobDto]]):
+        with self._lock:
+            self._listers[infrastructure_name] = lister
+
+    def list_jobs(self, infrastructure_name: str, config: Config) -> list[JobDto]:
+        with self._lock:
+            listing = self._listings.get(infrastructure_name)
+            if listing is None or listing.consumed or self._is_outdated(listing):
+                self._start_round(config)
+                listing = self._listings[infrastructure_name]
+            listing.consumed = True
+
+        remaining = listing.started + self.timeout - time.monotonic()
+        try:
+            return listing.future.result(timeout=max(0.0, remaining))
+        except FuturesTimeoutError:
+            raise TimeoutError(f'listing jobs of infrastructure {infrastructure_name} '
+                               f'has not finished within {self.timeout}s')
+
+    def _start_round(self, config: Config):
+        """Start listing every target, except the ones whose listing is in progress or still waiting to be picked up"""
+        now = time.monotonic()
+        for infrastructure_name, lister in self._listers.items():
+            listing = self._listings.get(infrastructure_name)
+            if listing is not None and not listing.future.done():
+                logger.debug(f'listing jobs of infrastructure {infrastructure_name} is still in progress')
+                continue
+            if listing is not None and not listing.consumed and not self._is_outdated(listing):
+                continue
+            self._listings[infrastructure_name] = _Listing(future=self._executor.submit(lister, config), started=now)
+
+    def _is_outdated(self, listing: _Listing) -> bool:
+        return listing.future.done() and time.monotonic() - listing.started > self.timeout
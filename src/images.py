@@ -0,0 +1,171 @@
+import re
+import threading
+import time
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import requests
+from racetrack_client.log.logs import get_logger
+
+from instrumentation import Instrumentation
+from kube_client import KubeClient
+from plugin_config import DockerConfig
+
+logger = get_logger(__name__)
+
+MANIFEST_MEDIA_TYPES = ', '.join([
+    'application/vnd.oci.image.index.v1+json',
+    'application/vnd.docker.distribution.manifest.list.v2+json',
+    'application/vnd.oci.image.manifest.v1+json',
+    'application/vnd.docker.distribution.manifest.v2+json',
+])
+PREPULL_LABEL = 'racetrack/prepull'
+# waiting reasons of a container whose image is still being pulled
+PULLING_WAITING_REASONS = {'ContainerCreating', 'PodInitializing'}
+PULL_FAILED_WAITING_REASONS = {'ErrImagePull', 'ImagePullBackOff', 'InvalidImageName'}
+PULLED_MESSAGE_PATTERN = re.compile(r'Successfully pulled image "[^"]+" in (?P<duration>[0-9.a-zµ]+)')
+GO_DURATION_PATTERN = re.compile(r'(?P<value>\d+(?:\.\d+)?)(?P<unit>ns|us|µs|ms|s|m|h)')
+GO_DURATION_UNITS = {'ns': 1e-9, 'us': 1e-6, 'µs': 1e-6, 'ms': 1e-3, 's': 1, 'm': 60, 'h': 3600}
+
+
+class ImageDigestResolver:
+    """
+    Resolves image tags to the digests of their manifests with the Docker Registry HTTP API,
+    so that jobs can be deployed with pinned images, which are pulled only if missing on a node.
+    """
+
+    def __init__(self, docker_config: DockerConfig | None, registry_url: str | None, timeout: float):
+        self.docker_config = docker_config
+        self.registry_url = registry_url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def pin_images(self, image_names: list[str]) -> list[str] | None:
+        """Return the images referred by digests, or None if any of them can't be resolved"""
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, len(image_names))) as executor:
+                digests = list(executor.map(self.resolve_digest, image_names))
+        except Exception as e:
+            logger.warning(f'failed to resolve digests of the job images, falling back to tags: {e}')
+            return None
+        return [f'{image_name}@{digest}' for image_name, digest in zip(image_names, digests)]
+
+    def resolve_digest(self, image_name: str) -> str:
+        registry, repository, tag = parse_image_name(image_name)
+        registry_url = (self.registry_url or f'https://{registry}').rstrip('/')
+        url = f'{registry_url}/v2/{repository}/manifests/{tag}'
+        headers = {'Accept': MANIFEST_MEDIA_TYPES}
+        response = self.session.head(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 401:
+            headers['Authorization'] = self._authorize(response.headers.get('WWW-Authenticate', ''))
+            response = self.session.head(url, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        digest = response.headers.get('Docker-Content-Digest')
+        if not digest:
+            raise RuntimeError(f'registry returned no digest of image {image_name}')
+        return digest
+
+    def _authorize(self, challenge: str) -> str:
+        """Return Authorization header answering the registry's challenge"""
+        credentials = None
+        if self.docker_config and self.docker_config.username:
+            credentials = (self.docker_config.username, self.docker_config.password or '')
+        scheme, _, params = challenge.partition(' ')
+        if scheme.lower() == 'basic':
+            if credentials is None:
+                raise RuntimeError('registry requires credentials, but none are configured')
+            return f"Basic {b64encode(':'.join(credentials).encode()).decode()}"
+        if scheme.lower() != 'bearer':
+            raise RuntimeError(f'unsupported registry authentication: {challenge}')
+
+        challenge_params = dict(re.findall(r'(\w+)="([^"]*)"', params))
+        realm = challenge_params.pop('realm')
+        response = self.session.get(realm, params=challenge_params, auth=credentials, timeout=self.timeout)
+        response.raise_for_status()
+        token_response = response.json()
+        return f"Bearer {token_response.get('token') or token_response['access_token']}"
+
+
+def parse_image_name(image_name: str) -> tuple[str, str, str]:
+    """Split image name into registry, repository and tag"""
+    registry, _, rest = image_name.partition('/')
+    repository, _, tag = rest.rpartition(':')
+    if not repository or '/' in tag:
+        repository, tag = rest, 'latest'
+    return registry, repository, tag
+
+
+def wait_for_prepull(kube: KubeClient, daemon_set_name: str, timeout: float, poll_interval: float) -> bool:
+    """Wait until images of the pre-pulling DaemonSet are present on all its nodes. Return whether it has succeeded."""
+    deadline = time.monotonic() + timeout
+    while True:
+        daemon_set, pods = kube.get_resource_with_pods(f'daemonset/{daemon_set_name}', f'{PREPULL_LABEL}={daemon_set_name}')
+        if daemon_set is None:
+            return False
+        desired_pods = (daemon_set.get('status') or {}).get('desiredNumberScheduled')
+        statuses = [status for pod in pods for status in (pod.get('status') or {}).get('containerStatuses') or []]
+        init_statuses = [status for pod in pods for status in (pod.get('status') or {}).get('initContainerStatuses') or []]
+        failed = [status for status in statuses + init_statuses if _waiting_reason(status) in PULL_FAILED_WAITING_REASONS]
+        if failed:
+            logger.warning(f'pre-pulling images by {daemon_set_name} failed: {_waiting_reason(failed[0])}')
+            return False
+        pulling = [status for status in statuses
+                   if not status.get('imageID') and _waiting_reason(status) in PULLING_WAITING_REASONS]
+        containers_num = sum(len(pod['spec']['containers']) for pod in pods)
+        if desired_pods is not None and len(pods) >= desired_pods and len(statuses) == containers_num and not pulling:
+            return True
+        if time.monotonic() >= deadline:
+            logger.warning(f'pre-pulling images by {daemon_set_name} timed out after {timeout:.1f}s')
+            return False
+        time.sleep(poll_interval)
+
+
+def _waiting_reason(container_status: dict[str, Any]) -> str | None:
+    return ((container_status.get('state') or {}).get('waiting') or {}).get('reason')
+
+
+class PullDurationsReporter:
+    """
+    Reports how long the images of the jobs take to be pulled, reading the "Pulled" events of the kubelets.
+    Events are listed at most once per interval, and each of them is reported once.
+    """
+
+    def __init__(self, kube: KubeClient, instrumentation: Instrumentation, interval: float):
+        self.kube = kube
+        self.instrumentation = instrumentation
+        self.interval = interval
+        self._reported_at: float | None = None
+        self._seen_events: set[tuple[str, int]] = set()
+        self._lock = threading.Lock()
+
+    def report_if_due(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._reported_at is not None and now - self._reported_at < self.interval:
+                return
+            self._reported_at = now
+
+        events = self.kube.list_resources('event', '', field_selector='reason=Pulled,involvedObject.kind=Pod')
+        current_events = set()
+        for event in events:
+            event_key = (event['metadata'].get('uid', ''), event.get('count') or 1)
+            current_events.add(event_key)
+            if event_key in self._seen_events:
+                continue
+            message = event.get('message') or ''
+            match = PULLED_MESSAGE_PATTERN.search(message)
+            if match is not None:
+                self.instrumentation.report_image_pull(parse_go_duration(match.group('duration')))
+            elif 'already present' in message:
+                self.instrumentation.report_image_pull(None)
+        with self._lock:
+            self._seen_events = current_events
+
+
+def parse_go_duration(duration: str) -> float:
+    """Convert duration formatted by Go (e.g. "1m2.5s" or "850ms") to seconds"""
+    return sum(
+        float(match.group('value')) * GO_DURATION_UNITS[match.group('unit')]
+        for match in GO_DURATION_PATTERN.finditer(duration)
+    )
@@ -0,0 +1,211 @@
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+from racetrack_client.log.logs import get_logger
+
+try:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer(__name__)
+except ImportError:
+    _tracer = None
+
+logger = get_logger(__name__)
+
+# operations that keep the connection open on purpose, so they are never reported as slow
+LONG_POLLING_OPERATIONS = {'watch_pods'}
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+PULL_DURATION_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+PARSE_DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+def _create_metric(metric_class, name: str, documentation: str, labelnames: list[str], **kwargs):
+    """
+    Create and register a metric. Modules of the plugin are imported once per process, so are the metrics,
+    but if this module gets executed again, the duplicated metric is kept unregistered instead of failing the plugin.
+    """
+    try:
+        return metric_class(name, documentation, labelnames, **kwargs)
+    except ValueError as e:  # duplicated timeseries in the registry
+        logger.warning(f'metric {name} is already registered, the new one won\'t be exported: {e}')
+        return metric_class(name, documentation, labelnames, registry=None, **kwargs)
+
+
+metric_remote_calls = _create_metric(
+    Counter, 'remote_kubernetes_calls', 'Number of calls to the remote Kubernetes cluster',
+    ['infrastructure', 'operation'],
+)
+metric_remote_call_errors = _create_metric(
+    Counter, 'remote_kubernetes_call_errors', 'Number of failed calls to the remote Kubernetes cluster',
+    ['infrastructure', 'operation'],
+)
+metric_remote_call_bytes = _create_metric(
+    Counter, 'remote_kubernetes_call_response_bytes', 'Size of the responses received from the remote Kubernetes cluster',
+    ['infrastructure', 'operation'],
+)
+metric_remote_call_duration = _create_metric(
+    Histogram, 'remote_kubernetes_call_duration_seconds', 'Duration of the calls to the remote Kubernetes cluster',
+    ['infrastructure', 'operation'], buckets=DURATION_BUCKETS,
+)
+metric_parse_duration = _create_metric(
+    Histogram, 'remote_kubernetes_parse_duration_seconds', 'Time spent on parsing the responses of the remote Kubernetes cluster',
+    ['infrastructure', 'operation'], buckets=PARSE_DURATION_BUCKETS,
+)
+metric_probe_duration = _create_metric(
+    Histogram, 'remote_kubernetes_probe_duration_seconds', 'Duration of the health and metrics probes of a job',
+    ['infrastructure'], buckets=DURATION_BUCKETS,
+)
+metric_probe_errors = _create_metric(
+    Counter, 'remote_kubernetes_probe_errors', 'Number of failed probes of a job',
+    ['infrastructure'],
+)
+
+metric_replica_up = _create_metric(
+    Gauge, 'remote_kubernetes_replica_up', 'Whether the last health check of a job replica has passed',
+    ['infrastructure', 'job_name', 'job_version', 'replica'],
+)
+metric_replica_probe_duration = _create_metric(
+    Gauge, 'remote_kubernetes_replica_probe_duration_seconds', 'Duration of the last health check of a job replica',
+    ['infrastructure', 'job_name', 'job_version', 'replica'],
+)
+
+metric_job_replicas = _create_metric(
+    Gauge, 'remote_kubernetes_job_replicas', 'Current number of replicas of an autoscaled job',
+    ['infrastructure', 'job_name', 'job_version'],
+)
+metric_job_desired_replicas = _create_metric(
+    Gauge, 'remote_kubernetes_job_desired_replicas', 'Number of replicas of an autoscaled job desired by its autoscaler',
+    ['infrastructure', 'job_name', 'job_version'],
+)
+
+metric_image_pull_duration = _create_metric(
+    Histogram, 'remote_kubernetes_image_pull_duration_seconds', 'Time taken by kubelets to pull the job images',
+    ['infrastructure'], buckets=PULL_DURATION_BUCKETS,
+)
+metric_image_pulls = _create_metric(
+    Counter, 'remote_kubernetes_image_pulls', 'Number of job images needed by the starting containers, pulled or already present',
+    ['infrastructure', 'cached'],
+)
+
+metric_recommended_cpu = _create_metric(
+    Gauge, 'remote_kubernetes_job_recommended_cpu_cores', 'CPU request of a job container recommended from its usage',
+    ['infrastructure', 'job_name'],
+)
+metric_recommended_memory = _create_metric(
+    Gauge, 'remote_kubernetes_job_recommended_memory_bytes', 'Memory request of a job container recommended from its usage',
+    ['infrastructure', 'job_name'],
+)
+
+
+@dataclass
+class CallRecord:
+    response_bytes: int = 0
+
+
+class Instrumentation:
+    """Records metrics and tracing spans of the operations performed on one infrastructure target"""
+
+    def __init__(self, infrastructure_name: str, slow_call_threshold: float | None = None):
+        self.infrastructure_name = infrastructure_name
+        self.slow_call_threshold = slow_call_threshold
+
+    @contextmanager
+    def call(self, operation: str) -> Iterator[CallRecord]:
+        """Measure a call to the remote cluster. The size of the response should be set on the yielded record."""
+        record = CallRecord()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            # not made current, as the call may be suspended while a streamed response is being consumed
+            span = self._start_span(stack, f'remote_kubernetes.{operation}', operation, current=False)
+            try:
+                yield record
+            except GeneratorExit:  # consumer of a streamed response stopped reading
+                raise
+            except BaseException:
+                metric_remote_call_errors.labels(self.infrastructure_name, operation).inc()
+                raise
+            finally:
+                duration = time.perf_counter() - start
+                metric_remote_calls.labels(self.infrastructure_name, operation).inc()
+                metric_remote_call_duration.labels(self.infrastructure_name, operation).observe(duration)
+                metric_remote_call_bytes.labels(self.infrastructure_name, operation).inc(record.response_bytes)
+                if span is not None:
+                    span.set_attribute('response_bytes', record.response_bytes)
+                if self.slow_call_threshold is not None and duration > self.slow_call_threshold \
+                        and operation not in LONG_POLLING_OPERATIONS:
+                    logger.warning(f'slow call to infrastructure {self.infrastructure_name}: {operation} took {duration:.3f}s, '
+                                   f'returning {record.response_bytes} bytes')
+
+    @contextmanager
+    def parsing(self, operation: str) -> Iterator[None]:
+        """Measure the time spent on processing a response on the plugin's side"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            metric_parse_duration.labels(self.infrastructure_name, operation).observe(time.perf_counter() - start)
+
+    @contextmanager
+    def probe(self, job_name: str) -> Iterator[None]:
+        """Measure a probe checking the condition of a job"""
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            span = self._start_span(stack, 'remote_kubernetes.probe_job', 'probe_job', current=True)
+            if span is not None:
+                span.set_attribute('job_name', job_name)
+            try:
+                yield
+            except BaseException:
+                metric_probe_errors.labels(self.infrastructure_name).inc()
+                raise
+            finally:
+                metric_probe_duration.labels(self.infrastructure_name).observe(time.perf_counter() - start)
+
+    def report_replica(self, job_name: str, job_version: str, replica: str, healthy: bool, duration: float):
+        metric_replica_up.labels(self.infrastructure_name, job_name, job_version, replica).set(1 if healthy else 0)
+        metric_replica_probe_duration.labels(self.infrastructure_name, job_name, job_version, replica).set(duration)
+
+    def forget_replica(self, job_name: str, job_version: str, replica: str):
+        for metric in [metric_replica_up, metric_replica_probe_duration]:
+            try:
+                metric.remove(self.infrastructure_name, job_name, job_version, replica)
+            except KeyError:
+                pass
+
+    def report_job_replicas(self, job_name: str, job_version: str, current: int, desired: int):
+        metric_job_replicas.labels(self.infrastructure_name, job_name, job_version).set(current)
+        metric_job_desired_replicas.labels(self.infrastructure_name, job_name, job_version).set(desired)
+
+    def forget_job_replicas(self, job_name: str, job_version: str):
+        for metric in [metric_job_replicas, metric_job_desired_replicas]:
+            try:
+                metric.remove(self.infrastructure_name, job_name, job_version)
+            except KeyError:
+                pass
+
+    def report_image_pull(self, duration: float | None):
+        """Record an image pulled in a given time, or already present on the node if the duration is None"""
+        metric_image_pulls.labels(self.infrastructure_name, 'true' if duration is None else 'false').inc()
+        if duration is not None:
+            metric_image_pull_duration.labels(self.infrastructure_name).observe(duration)
+
+    def report_recommendation(self, job_name: str, cpu_cores: float, memory_bytes: float):
+        metric_recommended_cpu.labels(self.infrastructure_name, job_name).set(cpu_cores)
+        metric_recommended_memory.labels(self.infrastructure_name, job_name).set(memory_bytes)
+
+    def forget_recommendation(self, job_name: str):
+        for metric in [metric_recommended_cpu, metric_recommended_memory]:
+            try:
+                metric.remove(self.infrastructure_name, job_name)
+            except KeyError:
+                pass
+
+    def _start_span(self, stack: ExitStack, span_name: str, operation: str, current: bool):
+        if _tracer is None:
+            return None
+        attributes = {'infrastructure': self.infrastructure_name, 'operation': operation}
+        if current:
+            return stack.enter_context(_tracer.start_as_current_span(span_name, attributes=attributes))
+        return stack.enter_context(_tracer.start_span(span_name, attributes=attributes))
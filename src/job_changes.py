@@ -0,0 +1,77 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Hashable, Iterable
+
+from racetrack_commons.entities.dto import JobDto
+
+JobKey = tuple[str, str]
+
+
+@dataclass
+class JobChanges:
+    """
+    Jobs that have changed since the previous pass of the monitor.
+    In a full resync, all current jobs are reported as added, and the previous state of the consumer should be replaced.
+    """
+    added: list[JobDto] = field(default_factory=list)
+    changed: list[JobDto] = field(default_factory=list)
+    removed: list[JobDto] = field(default_factory=list)  # last known state of the jobs that are gone
+    full_resync: bool = False
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+
+def job_state_fingerprint(job: JobDto) -> Hashable:
+    """Fields of a listed job whose change is reported: status, replicas and last call time (along with the error)"""
+    return job.status, job.error, tuple(job.replica_internal_names or ()), job.last_call_time
+
+
+class JobChangeTracker:
+    """
+    Keeps the snapshot of jobs reported by the previous pass and compares the next ones against it.
+    A full snapshot is sent on the first pass, when requested, and once per resync interval,
+    so that a consumer that has missed a pass or lost its state catches up.
+    """
+
+    def __init__(self, resync_interval: float | None):
+        self.resync_interval = resync_interval
+        self._snapshot: dict[JobKey, tuple[Hashable, JobDto]] | None = None
+        self._synced_at: float = 0
+        self._resync_requested = False
+        self._lock = threading.Lock()
+
+    def request_resync(self):
+        """Send a full snapshot of jobs on the next pass"""
+        with self._lock:
+            self._resync_requested = True
+
+    def update(self, jobs: Iterable[JobDto]) -> JobChanges:
+        """Replace the snapshot with the jobs of the current pass and return the differences"""
+        current: dict[JobKey, tuple[Hashable, JobDto]] = {
+            (job.name, job.version): (job_state_fingerprint(job), job) for job in jobs
+        }
+        now = time.monotonic()
+        with self._lock:
+            previous = self._snapshot
+            full_resync = previous is None or self._resync_requested \
+                or (self.resync_interval is not None and now - self._synced_at >= self.resync_interval)
+            self._snapshot = current
+            if full_resync:
+                self._resync_requested = False
+                self._synced_at = now
+
+        previous = previous or {}
+        changes = JobChanges(full_resync=full_resync)
+        for job_key, (fingerprint, job) in current.items():
+            previous_entry = previous.get(job_key)
+            if full_resync or previous_entry is None:
+                changes.added.append(job)
+            elif previous_entry[0] != fingerprint:
+                changes.changed.append(job)
+        for job_key, (_, job) in previous.items():
+            if job_key not in current:
+                changes.removed.append(job)
+        return changes
@@ -0,0 +1,480 @@
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Collection, Iterable, Iterator
+from urllib.parse import quote
+from uuid import uuid4
+
+import requests
+from requests.adapters import HTTPAdapter
+from racetrack_client.log.logs import get_logger
+
+from instrumentation import Instrumentation
+from plugin_config import InfrastructureConfig
+from remote_executor import CommandResult, RemoteExecutor
+from utils import JOB_POD_COLUMNS, JobPod, parse_job_pod, parse_job_pod_columns
+
+logger = get_logger(__name__)
+
+FIELD_MANAGER = 'racetrack-remote-kubernetes'
+# printed by the remote side instead of a resource that hasn't changed since the given resourceVersion
+UNCHANGED_MARKER = '__racetrack_unchanged__'
+
+# kind of resource -> (API group path, plural name)
+RESOURCE_APIS: dict[str, tuple[str, str]] = {
+    'pod': ('/api/v1', 'pods'),
+    'service': ('/api/v1', 'services'),
+    'secret': ('/api/v1', 'secrets'),
+    'deployment': ('/apis/apps/v1', 'deployments'),
+    'servicemonitor': ('/apis/monitoring.coreos.com/v1', 'servicemonitors'),
+    'horizontalpodautoscaler': ('/apis/autoscaling/v2', 'horizontalpodautoscalers'),
+    'poddisruptionbudget': ('/apis/policy/v1', 'poddisruptionbudgets'),
+    'daemonset': ('/apis/apps/v1', 'daemonsets'),
+    'event': ('/api/v1', 'events'),
+    'podmetrics': ('/apis/metrics.k8s.io/v1beta1', 'pods'),
+}
+
+
+@dataclass
+class LogsRequest:
+    label_selector: str
+    tail: int | None = None
+    since_time: str | None = None
+    container: str | None = None
+    all_containers: bool = False
+    timestamps: bool = False
+
+
+class KubeClient(ABC):
+    """Operations on the Kubernetes resources of a namespace, used by the plugin"""
+
+    def __init__(self, k8s_namespace: str, instrumentation: Instrumentation):
+        self.k8s_namespace = k8s_namespace
+        self.instrumentation = instrumentation
+
+    @abstractmethod
+    def list_pods(self, label_selector: str, field_selector: str | None = None) -> dict[str, Any]:
+        """Return PodList object, containing items and the resource version of the list"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def list_job_pods(self, label_selector: str, field_selector: str, chunk_size: int) -> list[JobPod]:
+        """Return lean records of the job pods, fetching the list in chunks and only the fields that are needed"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def watch_pods(self, label_selector: str, resource_version: str, timeout: int) -> Iterator[dict[str, Any]]:
+        """Yield pod watch events occurring after the resource version, until the server ends the watch"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_resources(self, refs: list[str]) -> list[dict[str, Any]]:
+        """Return objects of the existing resources referred as "kind/name". Missing ones are omitted."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_changed_resource(self, ref: str, resource_version: str | None) -> tuple[bool, dict[str, Any] | None]:
+        """
+        Return whether a resource has changed since the given resourceVersion, along with its object if it has
+        (or None if it's missing). The object isn't transferred if the resource hasn't changed.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def list_resources(self, kind: str, label_selector: str, field_selector: str | None = None) -> list[dict[str, Any]]:
+        """Return objects of all resources of a kind matching the label selector (and the field selector)"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_resource_with_pods(self, ref: str, label_selector: str) -> tuple[dict[str, Any] | None, list[dict[str, Any]]]:
+        """Return the object of a resource (or None if it's missing) along with the pods matching the selector"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def apply_resources(self, items: list[dict[str, Any]]):
+        """Create or update resources"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def delete_resources(self, refs: list[str], optional_refs: Collection[str] = ()) -> dict[str, bool]:
+        """
+        Delete resources referred as "kind/name". Return whether each of them has existed.
+        Optional ones that the plugin isn't allowed to delete, e.g. by RBAC rules of the namespace,
+        are skipped with a warning, as if they were missing.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def read_logs_many(self, logs_requests: list[LogsRequest]) -> list[str | Exception]:
+        """Read logs for several requests at once, returning the output or the error of each of them"""
+        raise NotImplementedError()
+
+    def read_logs(self, logs_request: LogsRequest) -> str:
+        result = self.read_logs_many([logs_request])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    # whether the logs can be followed over a long-lived stream, instead of being polled
+    streams_logs: bool = False
+
+    def follow_logs(self, pod_name: str, container: str, since_time: str | None, idle_timeout: float) -> Iterator[str]:
+        """
+        Yield timestamped log lines of a container as they are written, starting from since_time (or from the beginning),
+        until the container stops or no line arrives within the idle timeout
+        """
+        raise NotImplementedError()
+
+
+class KubectlClient(KubeClient):
+    """Kubernetes client running kubectl commands on the remote gateway"""
+
+    def __init__(self, k8s_namespace: str, executor: RemoteExecutor, instrumentation: Instrumentation):
+        super().__init__(k8s_namespace, instrumentation)
+        self.executor = executor
+
+    def list_pods(self, label_selector: str, field_selector: str | None = None) -> dict[str, Any]:
+        url = self._pods_url(label_selector, field_selector)
+        output = self._remote_shell('list_pods', f"/opt/kubectl get --raw '{url}'")
+        with self.instrumentation.parsing('list_pods'):
+            return json.loads(output.strip())
+
+    def list_job_pods(self, label_selector: str, field_selector: str, chunk_size: int) -> list[JobPod]:
+        # kubectl fetches the pages of the list, but prints them all at once through the remote gateway
+        columns = ','.join(f'{name}:{path}' for name, path in JOB_POD_COLUMNS)
+        output = self._remote_shell(
+            'list_job_pods',
+            f"/opt/kubectl -n {self.k8s_namespace} get pods --selector='{label_selector}'"
+            f" --field-selector='{field_selector}' --chunk-size={chunk_size} --no-headers -o custom-columns='{columns}'"
+        )
+        job_pods: list[JobPod] = []
+        with self.instrumentation.parsing('list_job_pods'):
+            for line in output.splitlines():
+                columns = line.split()
+                if len(columns) == len(JOB_POD_COLUMNS):
+                    job_pod = parse_job_pod_columns(columns)
+                    if job_pod is not None:
+                        job_pods.append(job_pod)
+        return job_pods
+
+    def watch_pods(self, label_selector: str, resource_version: str, timeout: int) -> Iterator[dict[str, Any]]:
+        url = f'{self._pods_url(label_selector)}&watch=1&allowWatchBookmarks=true' \
+              f'&resourceVersion={resource_version}&timeoutSeconds={timeout}'
+        output = self._remote_shell('watch_pods', f"/opt/kubectl get --raw '{url}' --request-timeout=0")
+        with self.instrumentation.parsing('watch_pods'):
+            events = [json.loads(line) for line in output.splitlines() if line.strip()]
+        yield from events
+
+    def get_resources(self, refs: list[str]) -> list[dict[str, Any]]:
+        if not refs:
+            return []
+        operation = _get_operation(refs)
+        output = self._remote_shell(
+            operation, f'/opt/kubectl -n {self.k8s_namespace} get {" ".join(refs)} --ignore-not-found -o json'
+        ).strip()
+        if not output:
+            return []
+        with self.instrumentation.parsing(operation):
+            result = json.loads(output)
+        return result.get('items', []) if result.get('kind') == 'List' else [result]
+
+    def get_changed_resource(self, ref: str, resource_version: str | None) -> tuple[bool, dict[str, Any] | None]:
+        operation = _get_operation([ref])
+        get_cmd = f'/opt/kubectl -n {self.k8s_namespace} get {ref} --ignore-not-found -o json'
+        if resource_version is None:
+            output = self._remote_shell(operation, get_cmd).strip()
+        else:  # compare the versions on the remote side, so that an unchanged object doesn't travel back
+            output = self._remote_shell(operation, f'''
+version=$(/opt/kubectl -n {self.k8s_namespace} get {ref} --ignore-not-found -o jsonpath='{{.metadata.resourceVersion}}')
+if [ "$version" = "{resource_version}" ]; then echo '{UNCHANGED_MARKER}'; else {get_cmd}; fi
+'''.strip()).strip()
+        if output == UNCHANGED_MARKER:
+            return False, None
+        if not output:
+            return True, None
+        with self.instrumentation.parsing(operation):
+            return True, json.loads(output)
+
+    def list_resources(self, kind: str, label_selector: str, field_selector: str | None = None) -> list[dict[str, Any]]:
+        api_path, plural = RESOURCE_APIS[kind]
+        url = f'{api_path}/namespaces/{self.k8s_namespace}/{plural}?labelSelector={quote(label_selector, safe="")}'
+        if field_selector:
+            url += f'&fieldSelector={quote(field_selector, safe="")}'
+        output = self._remote_shell(f'list_{kind}', f"/opt/kubectl get --raw '{url}'")
+        with self.instrumentation.parsing(f'list_{kind}'):
+            return json.loads(output.strip())['items']
+
+    def get_resource_with_pods(self, ref: str, label_selector: str) -> tuple[dict[str, Any] | None, list[dict[str, Any]]]:
+        resource_result, pods_result = self._run_batch('get_resource_with_pods', [
+            f'/opt/kubectl -n {self.k8s_namespace} get {ref} --ignore-not-found -o json',
+            f"/opt/kubectl get --raw '{self._pods_url(label_selector)}'",
+        ])
+        resource_output = resource_result.check_output().strip()
+        pods_output = pods_result.check_output()
+        with self.instrumentation.parsing('get_resource_with_pods'):
+            resource = json.loads(resource_output) if resource_output else None
+            pods = json.loads(pods_output)['items']
+        return resource, pods
+
+    def apply_resources(self, items: list[dict[str, Any]]):
+        resources_json = json.dumps({'apiVersion': 'v1', 'kind': 'List', 'items': items}, default=str)
+        delimiter = f'RACETRACK_EOF_{uuid4().hex}'
+        self._remote_shell('apply', f'''
+cat <<'{delimiter}' | /opt/kubectl apply -f -
+{resources_json}
+{delimiter}
+'''.strip())
+
+    def delete_resources(self, refs: list[str], optional_refs: Collection[str] = ()) -> dict[str, bool]:
+        results = self._run_batch('delete', [
+            f'/opt/kubectl delete {ref} -n {self.k8s_namespace} --ignore-not-found' for ref in refs
+        ])
+        existed = {}
+        for ref, result in zip(refs, results):
+            if result.returncode != 0 and ref in optional_refs and '(Forbidden)' in result.stderr:
+                logger.warning(f'not allowed to delete {ref}, skipping it: {result.stderr.strip()}')
+                existed[ref] = False
+            else:
+                existed[ref] = bool(result.check_output().strip())
+        return existed
+
+    def read_logs_many(self, logs_requests: list[LogsRequest]) -> list[str | Exception]:
+        results = self._run_batch('logs', [self._logs_command(logs_request) for logs_request in logs_requests])
+        outputs: list[str | Exception] = []
+        for result in results:
+            try:
+                outputs.append(result.check_output())
+            except Exception as e:
+                outputs.append(e)
+        return outputs
+
+    def _logs_command(self, logs_request: LogsRequest) -> str:
+        # kubectl limits logs to 10 lines when a selector is given, unless tail is set explicitly
+        cmd = f'/opt/kubectl -n {self.k8s_namespace} logs --selector="{logs_request.label_selector}"' \
+              f' --tail={logs_request.tail if logs_request.tail is not None else -1}'
+        if logs_request.since_time:
+            cmd += f' --since-time="{logs_request.since_time}"'
+        if logs_request.container:
+            cmd += f' --container={logs_request.container}'
+        if logs_request.all_containers:
+            cmd += ' --all-containers=true'
+        if logs_request.timestamps:
+            cmd += ' --timestamps'
+        return cmd
+
+    def _remote_shell(self, operation: str, cmd: str) -> str:
+        with self.instrumentation.call(operation) as call:
+            output = self.executor.remote_shell(cmd)
+            call.response_bytes = len(output)
+        return output
+
+    def _run_batch(self, operation: str, cmds: list[str]) -> list[CommandResult]:
+        with self.instrumentation.call(operation) as call:
+            results = self.executor.run_batch(cmds)
+            call.response_bytes = sum(len(result.output) for result in results)
+        return results
+
+    def _pods_url(self, label_selector: str, field_selector: str | None = None) -> str:
+        url = f'/api/v1/namespaces/{self.k8s_namespace}/pods?labelSelector={quote(label_selector, safe="")}'
+        if field_selector:
+            url += f'&fieldSelector={quote(field_selector, safe="")}'
+        return url
+
+
+class HttpKubeClient(KubeClient):
+    """Kubernetes client talking to the REST API through the remote gateway over a pool of keep-alive connections"""
+
+    streams_logs = True
+
+    def __init__(self, k8s_namespace: str, infra_config: InfrastructureConfig, instrumentation: Instrumentation):
+        super().__init__(k8s_namespace, instrumentation)
+        assert infra_config.kube_api_url, 'kube_api_url has to be configured to use the http transport'
+        self.base_url = infra_config.kube_api_url.rstrip('/')
+        self.timeout = infra_config.kube_api_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=infra_config.kube_api_pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if infra_config.remote_gateway_token:
+            self.session.headers['X-Racetrack-Gateway-Token'] = infra_config.remote_gateway_token
+        if infra_config.kube_api_internal_name:
+            self.session.headers['X-Racetrack-Job-Internal-Name'] = infra_config.kube_api_internal_name
+
+    def list_pods(self, label_selector: str, field_selector: str | None = None) -> dict[str, Any]:
+        params = {'labelSelector': label_selector}
+        if field_selector:
+            params['fieldSelector'] = field_selector
+        response = self._request('GET', self._collection_path('pod'), 'list_pods', params=params)
+        with self.instrumentation.parsing('list_pods'):
+            return response.json()
+
+    def list_job_pods(self, label_selector: str, field_selector: str, chunk_size: int) -> list[JobPod]:
+        params = {'labelSelector': label_selector, 'fieldSelector': field_selector, 'limit': str(chunk_size)}
+        job_pods: list[JobPod] = []
+        while True:
+            response = self._request('GET', self._collection_path('pod'), 'list_job_pods', params=params)
+            with self.instrumentation.parsing('list_job_pods'):
+                page = response.json()
+                job_pods.extend(job_pod for pod_item in page['items'] if (job_pod := parse_job_pod(pod_item)) is not None)
+            continue_token = page.get('metadata', {}).get('continue')
+            if not continue_token:
+                break
+            params['continue'] = continue_token
+        return job_pods
+
+    def watch_pods(self, label_selector: str, resource_version: str, timeout: int) -> Iterator[dict[str, Any]]:
+        params = {
+            'labelSelector': label_selector,
+            'watch': '1',
+            'allowWatchBookmarks': 'true',
+            'resourceVersion': resource_version,
+            'timeoutSeconds': str(timeout),
+        }
+        with self.instrumentation.call('watch_pods') as call:
+            response = self._send('GET', self._collection_path('pod'), params=params, stream=True,
+                                  timeout=(self.timeout, timeout + self.timeout))
+            with response:
+                for line in response.iter_lines():
+                    call.response_bytes += len(line) + 1
+                    if line.strip():
+                        yield json.loads(line)
+
+    def get_resources(self, refs: list[str]) -> list[dict[str, Any]]:
+        items = []
+        for ref in refs:
+            operation = _get_operation([ref])
+            response = self._request('GET', self._resource_path(ref), operation, allowed_statuses={404})
+            if response.status_code != 404:
+                with self.instrumentation.parsing(operation):
+                    items.append(response.json())
+        return items
+
+    def get_changed_resource(self, ref: str, resource_version: str | None) -> tuple[bool, dict[str, Any] | None]:
+        # Kubernetes API has no conditional GET, so the object is fetched, but not parsed further if it hasn't changed
+        resources = self.get_resources([ref])
+        if not resources:
+            return True, None
+        if resource_version is not None and resources[0]['metadata'].get('resourceVersion') == resource_version:
+            return False, None
+        return True, resources[0]
+
+    def list_resources(self, kind: str, label_selector: str, field_selector: str | None = None) -> list[dict[str, Any]]:
+        params = {'labelSelector': label_selector}
+        if field_selector:
+            params['fieldSelector'] = field_selector
+        response = self._request('GET', self._collection_path(kind), f'list_{kind}', params=params)
+        with self.instrumentation.parsing(f'list_{kind}'):
+            return response.json()['items']
+
+    def get_resource_with_pods(self, ref: str, label_selector: str) -> tuple[dict[str, Any] | None, list[dict[str, Any]]]:
+        resources = self.get_resources([ref])
+        pods = self.list_pods(label_selector)['items']
+        return (resources[0] if resources else None), pods
+
+    def apply_resources(self, items: list[dict[str, Any]]):
+        for item in items:
+            ref = f"{item['kind'].lower()}/{item['metadata']['name']}"
+            self._request(
+                'PATCH', self._resource_path(ref), 'apply',
+                params={'fieldManager': FIELD_MANAGER, 'force': 'true'},
+                data=json.dumps(item, default=str),
+                headers={'Content-Type': 'application/apply-patch+yaml'},
+            )
+
+    def delete_resources(self, refs: list[str], optional_refs: Collection[str] = ()) -> dict[str, bool]:
+        existed = {}
+        for ref in refs:
+            response = self._request('DELETE', self._resource_path(ref), 'delete', params={'propagationPolicy': 'Background'},
+                                     allowed_statuses={404, 403} if ref in optional_refs else {404})
+            if response.status_code == 403:
+                logger.warning(f'not allowed to delete {ref}, skipping it')
+            existed[ref] = response.ok
+        return existed
+
+    def read_logs_many(self, logs_requests: list[LogsRequest]) -> list[str | Exception]:
+        outputs: list[str | Exception] = []
+        for logs_request in logs_requests:
+            try:
+                outputs.append(self._read_logs(logs_request))
+            except Exception as e:
+                outputs.append(e)
+        return outputs
+
+    def _read_logs(self, logs_request: LogsRequest) -> str:
+        pods = self.list_pods(logs_request.label_selector)['items']
+        outputs = []
+        for pod in pods:
+            pod_name = pod['metadata']['name']
+            if logs_request.all_containers:
+                containers = [container['name'] for container in pod.get('spec', {}).get('containers', [])]
+            else:
+                containers = [logs_request.container]
+            for container in containers:
+                params = {'timestamps': 'true' if logs_request.timestamps else 'false'}
+                if container:
+                    params['container'] = container
+                if logs_request.tail is not None:
+                    params['tailLines'] = str(logs_request.tail)
+                if logs_request.since_time:
+                    params['sinceTime'] = logs_request.since_time
+                response = self._request('GET', f'{self._collection_path("pod")}/{pod_name}/log', 'logs', params=params)
+                outputs.append(response.text)
+        return ''.join(output if output.endswith('\n') or not output else output + '\n' for output in outputs)
+
+    def follow_logs(self, pod_name: str, container: str, since_time: str | None, idle_timeout: float) -> Iterator[str]:
+        params = {'follow': 'true', 'timestamps': 'true', 'container': container}
+        if since_time:
+            params['sinceTime'] = since_time
+        with self.instrumentation.call('follow_logs') as call:
+            response = self._send('GET', f'{self._collection_path("pod")}/{pod_name}/log', params=params, stream=True,
+                                  timeout=(self.timeout, idle_timeout))
+            with response:
+                for line in response.iter_lines():
+                    call.response_bytes += len(line) + 1
+                    yield line.decode(errors='replace')
+
+    def _request(self, method: str, path: str, operation: str, **kwargs) -> requests.Response:
+        with self.instrumentation.call(operation) as call:
+            response = self._send(method, path, **kwargs)
+            call.response_bytes = response.raw.tell()  # size on the wire, i.e. compressed
+        return response
+
+    def _send(
+        self,
+        method: str,
+        path: str,
+        allowed_statuses: Iterable[int] = (),
+        timeout: float | tuple[float, float] | None = None,
+        **kwargs,
+    ) -> requests.Response:
+        response = self.session.request(method, self.base_url + path, timeout=timeout or self.timeout, **kwargs)
+        if not response.ok and response.status_code not in allowed_statuses:
+            try:
+                message = response.json().get('message')
+            except ValueError:
+                message = response.text
+            raise RuntimeError(f'Kubernetes API responded with {response.status_code} to {method} {path}: {message}')
+        return response
+
+    def _collection_path(self, kind: str) -> str:
+        api_path, plural = RESOURCE_APIS[kind]
+        return f'{api_path}/namespaces/{self.k8s_namespace}/{plural}'
+
+    def _resource_path(self, ref: str) -> str:
+        kind, name = ref.split('/', 1)
+        return f'{self._collection_path(kind)}/{name}'
+
+
+def create_kube_client(infra_config: InfrastructureConfig, executor: RemoteExecutor, instrumentation: Instrumentation) -> KubeClient:
+    """Create Kubernetes client using the transport chosen for the infrastructure target"""
+    if infra_config.kube_api_transport == 'http':
+        return HttpKubeClient(infra_config.job_k8s_namespace, infra_config, instrumentation)
+    elif infra_config.kube_api_transport == 'kubectl':
+        return KubectlClient(infra_config.job_k8s_namespace, executor, instrumentation)
+    raise ValueError(f'unknown kube_api_transport: {infra_config.kube_api_transport}')
+
+
+def _get_operation(refs: list[str]) -> str:
+    """Name the operation of getting resources after their kind, e.g. get_secret"""
+    kinds = {ref.split('/', 1)[0] for ref in refs}
+    return f'get_{kinds.pop()}' if len(kinds) == 1 else 'get'
@@ -0,0 +1,348 @@
+import asyncio
+import copy
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Iterable
+
+from racetrack_client.log.logs import get_logger
+from racetrack_client.utils.shell import CommandError
+
+from kube_client import KubeClient, LogsRequest
+from utils import K8S_JOB_RESOURCE_LABEL
+
+logger = get_logger(__name__)
+
+
+class LogsScheduler:
+    """
+    Event loop running all log sessions of a logs streamer in a single thread.
+    Blocking remote calls and deliveries to the consumers are offloaded to small, fixed pools of workers.
+    Remote commands issued at the same time are merged into a single round trip.
+    """
+
+    def __init__(self, workers: int, kube: KubeClient):
+        self.kube = kube
+        self.loop = asyncio.new_event_loop()
+        self._remote_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='k8s-logs-remote')
+        self._delivery_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='k8s-logs-delivery')
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._pending_requests: list[tuple[LogsRequest, asyncio.Future]] = []
+
+    def call_soon(self, callback: Callable, *args):
+        """Schedule a callback on the event loop from any thread"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.loop.run_forever, name='k8s-logs-loop', daemon=True)
+                self._thread.start()
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    async def read_logs(self, logs_request: LogsRequest) -> str:
+        """Read logs together with other requests issued in the same loop iteration"""
+        future = self.loop.create_future()
+        self._pending_requests.append((logs_request, future))
+        if len(self._pending_requests) == 1:
+            self.loop.call_soon(lambda: self.loop.create_task(self._flush_requests()))
+        return await future
+
+    async def _flush_requests(self):
+        pending, self._pending_requests = self._pending_requests, []
+        logs_requests = [logs_request for logs_request, _ in pending]
+        try:
+            results = await self.loop.run_in_executor(self._remote_executor, self.kube.read_logs_many, logs_requests)
+        except Exception as e:
+            results = [e] * len(pending)
+        for (_, future), result in zip(pending, results):
+            if future.done():  # awaiting session has been cancelled
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def deliver(self, func: Callable, *args):
+        return await self.loop.run_in_executor(self._delivery_executor, func, *args)
+
+    async def call_remote(self, func: Callable, *args):
+        return await self.loop.run_in_executor(self._remote_executor, func, *args)
+
+
+class LogSession:
+    """Client watching a Job's logs, with a bounded buffer of lines waiting to be delivered"""
+
+    def __init__(self, session_id: str, on_line: Callable[[str], None], buffer_size: int):
+        self.session_id = session_id
+        self.on_line = on_line
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=buffer_size)
+        self.dropped_lines = 0
+        self.task: asyncio.Task | None = None
+
+    def offer(self, lines: list[str]):
+        """Enqueue lines, dropping the oldest ones if the consumer can't keep up"""
+        for line in lines:
+            if self.queue.full():
+                self.queue.get_nowait()
+                self.dropped_lines += 1
+            self.queue.put_nowait(line)
+
+    @property
+    def saturated(self) -> bool:
+        return self.queue.full()
+
+    async def deliver_lines(self, scheduler: LogsScheduler):
+        while True:
+            lines = [await self.queue.get()]
+            while not self.queue.empty():
+                lines.append(self.queue.get_nowait())
+            if self.dropped_lines:
+                logger.warning(f'log session {self.session_id} is too slow, {self.dropped_lines} lines were dropped')
+                self.dropped_lines = 0
+            await scheduler.deliver(self._send_lines, lines)
+
+    def _send_lines(self, lines: list[str]):
+        for line in lines:
+            self.on_line(line)
+
+
+class JobLogStream:
+    """
+    Single upstream of a Job's logs, shared by all sessions watching the same Job.
+    Recent lines are kept in a ring buffer to serve the initial tail of the new sessions.
+    Lines are fetched with their timestamps, so that the stream resumes exactly after the last delivered line.
+    If the client can stream logs, every container of the Job is followed over its own stream
+    and the pods are only polled to find the new ones. Otherwise, new lines are polled.
+    All methods are meant to be called on the scheduler's event loop.
+    """
+
+    def __init__(
+        self,
+        resource_name: str,
+        scheduler: LogsScheduler,
+        poll_interval: float,
+        buffer_size: int,
+        follow_idle_timeout: float = 60,
+    ):
+        self.resource_name = resource_name
+        self.scheduler = scheduler
+        self.poll_interval = poll_interval
+        self.follow_idle_timeout = follow_idle_timeout
+        self.buffer: deque[str] = deque(maxlen=buffer_size)
+        self.subscribers: dict[str, LogSession] = {}
+        self.task: asyncio.Task | None = None
+        self._pending_tails: dict[str, int] = {}
+        self._cursor: LogCursor = LogCursor()
+        self._ready = False
+        self._followers: dict[tuple[str, str], ContainerLogFollower] = {}  # (pod name, container name) -> follower
+        self._following = False
+
+    def subscribe(self, session: LogSession, tail: int):
+        """Register a session and send it the recent lines as soon as they are known"""
+        self.subscribers[session.session_id] = session
+        if self._ready:
+            session.offer(_tail_lines(self.buffer, tail))
+        else:
+            self._pending_tails[session.session_id] = tail
+
+    def unsubscribe(self, session_id: str) -> LogSession | None:
+        self._pending_tails.pop(session_id, None)
+        return self.subscribers.pop(session_id, None)
+
+    async def follow(self):
+        try:
+            while True:
+                try:
+                    if not self._ready:
+                        await self._read_initial_tail()
+                    elif self.scheduler.kube.streams_logs:
+                        await self._follow_containers()
+                    elif not all(session.saturated for session in self.subscribers.values()):
+                        await self._read_new_lines()
+                except CommandError as e:
+                    logger.error(f'command "{e.cmd}" failed with return code {e.returncode}: {e.stdout}')
+                except Exception as e:
+                    logger.error(f'reading logs of {self.resource_name} failed: {e}')
+                # align polls of all streams, so they can share a round trip
+                await asyncio.sleep(self.poll_interval - self.scheduler.loop.time() % self.poll_interval)
+        finally:
+            for follower in self._followers.values():
+                follower.stop()
+
+    async def _read_initial_tail(self):
+        start_time = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        output = await self._read_logs(tail=self.buffer.maxlen)
+        lines = self._cursor.advance(output)
+        if self._cursor.timestamp is None:  # no logs yet, follow from now on
+            self._cursor.advance(f'{start_time} ')
+        self.buffer.extend(lines)
+        self._ready = True
+        for session_id, tail in self._pending_tails.items():
+            session = self.subscribers.get(session_id)
+            if session is not None:
+                session.offer(_tail_lines(lines, tail))
+        self._pending_tails = {}
+
+    async def _read_new_lines(self):
+        output = await self._read_logs(since_time=self._cursor.since_time)
+        self._publish(self._cursor.advance(output))
+
+    async def _follow_containers(self):
+        """Start following the containers that aren't followed yet, and resume the streams that have ended"""
+        pods = await self.scheduler.call_remote(self.scheduler.kube.list_pods, self._label_selector)
+        followers: dict[tuple[str, str], ContainerLogFollower] = {}
+        for pod in pods['items']:
+            pod_name = pod['metadata']['name']
+            for container in pod.get('spec', {}).get('containers', []):
+                key = (pod_name, container['name'])
+                follower = self._followers.pop(key, None)
+                if follower is None:
+                    # containers running since the initial tail continue after it, the new ones are read from the beginning
+                    cursor = copy.deepcopy(self._cursor) if not self._following else LogCursor()
+                    follower = ContainerLogFollower(
+                        self.scheduler, pod_name, container['name'], cursor, self.follow_idle_timeout, self._publish,
+                    )
+                if not follower.running:
+                    follower.start()
+                followers[key] = follower
+        for follower in self._followers.values():  # pods that are gone
+            follower.stop()
+        self._followers = followers
+        self._following = True
+
+    def _publish(self, lines: list[str]):
+        self.buffer.extend(lines)
+        for session in self.subscribers.values():
+            session.offer(lines)
+
+    @property
+    def _label_selector(self) -> str:
+        return f'{K8S_JOB_RESOURCE_LABEL}={self.resource_name}'
+
+    async def _read_logs(self, tail: int | None = None, since_time: str | None = None) -> str:
+        return await self.scheduler.read_logs(LogsRequest(
+            label_selector=self._label_selector,
+            tail=tail,
+            since_time=since_time,
+            all_containers=True,
+            timestamps=True,
+        ))
+
+
+class ContainerLogFollower:
+    """
+    Thread following the logs of a single container over a long-lived stream, handing the new lines to the event loop.
+    When the stream ends, the follower can be started again, resuming from its cursor.
+    """
+
+    def __init__(
+        self,
+        scheduler: LogsScheduler,
+        pod_name: str,
+        container: str,
+        cursor: 'LogCursor',
+        idle_timeout: float,
+        on_lines: Callable[[list[str]], None],
+    ):
+        self.scheduler = scheduler
+        self.pod_name = pod_name
+        self.container = container
+        self.cursor = cursor  # only accessed by the running thread
+        self.idle_timeout = idle_timeout
+        self.on_lines = on_lines
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._follow, name='k8s-logs-follow', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop handing the lines over. The thread ends with the next line or when the stream gets idle."""
+        self._stopped.set()
+
+    def _follow(self):
+        self.cursor.resume()
+        try:
+            timestamped_lines = self.scheduler.kube.follow_logs(
+                self.pod_name, self.container, self.cursor.since_time, self.idle_timeout,
+            )
+            for timestamped_line in timestamped_lines:
+                if self._stopped.is_set():
+                    break
+                lines = self.cursor.feed([timestamped_line])
+                if lines:
+                    self.scheduler.loop.call_soon_threadsafe(self.on_lines, lines)
+        except Exception as e:  # e.g. container not started yet or the stream got idle, resumed by the next poll
+            if not self._stopped.is_set():
+                logger.debug(f'following logs of {self.pod_name}/{self.container} ended: {e}')
+
+
+class LogCursor:
+    """
+    Resume point of a log stream: timestamp of the last delivered line and the lines delivered at that instant.
+    Kubernetes truncates sinceTime to whole seconds, so lines up to the cursor are fetched again and skipped here.
+    Identical lines at the same instant are counted, so that only as many of them are skipped as have been delivered.
+    """
+
+    def __init__(self):
+        self.timestamp: tuple[str, int] | None = None
+        self.since_time: str | None = None
+        self.lines_at_timestamp: Counter[str] = Counter()
+        self._resumed_timestamp: tuple[str, int] | None = None
+        self._lines_to_skip: Counter[str] = Counter()
+
+    def advance(self, output: str) -> list[str]:
+        """Parse timestamped log output read from since_time and return only the lines that haven't been delivered yet"""
+        self.resume()
+        return self.feed(output.splitlines())
+
+    def resume(self):
+        """Mark the start of reading the logs again from since_time, which repeats the lines delivered up to the cursor"""
+        self._resumed_timestamp = self.timestamp
+        self._lines_to_skip = Counter(self.lines_at_timestamp)
+
+    def feed(self, timestamped_lines: Iterable[str]) -> list[str]:
+        """Return the new lines out of the ones read since resuming"""
+        new_lines: list[str] = []
+        for timestamped_line in timestamped_lines:
+            raw_timestamp, _, line = timestamped_line.partition(' ')
+            timestamp = _parse_log_timestamp(raw_timestamp)
+            if timestamp is None:  # not a timestamped line, e.g. a warning from kubectl
+                continue
+            if self._resumed_timestamp is not None:
+                if timestamp < self._resumed_timestamp:
+                    continue
+                if timestamp == self._resumed_timestamp and self._lines_to_skip[timestamped_line] > 0:
+                    self._lines_to_skip[timestamped_line] -= 1
+                    continue
+
+            if self.timestamp is None or timestamp > self.timestamp:
+                self.timestamp = timestamp
+                self.since_time = raw_timestamp
+                self.lines_at_timestamp = Counter()
+            if timestamp == self.timestamp:
+                self.lines_at_timestamp[timestamped_line] += 1
+            if line:
+                new_lines.append(line)
+        return new_lines
+
+
+def _parse_log_timestamp(raw: str) -> tuple[str, int] | None:
+    """Convert RFC3339 timestamp with optional fractional seconds to a comparable tuple (seconds, nanoseconds)"""
+    if len(raw) < 20 or not raw.endswith('Z') or raw[10] != 'T':
+        return None
+    seconds, _, fraction = raw[:-1].partition('.')
+    if len(seconds) != 19 or (fraction and not fraction.isdigit()):
+        return None
+    nanoseconds = int(fraction.ljust(9, '0')[:9]) if fraction else 0
+    return seconds, nanoseconds
+
+
+def _tail_lines(lines, tail: int) -> list[str]:
+    lines = list(lines)
+    return lines[-tail:] if tail > 0 else []
@@ -1,17 +1,11 @@
-import threading
-from datetime import datetime, timezone
-
-import time
 from typing import Callable
 
-from lifecycle.infrastructure.infra_target import remote_shell
 from lifecycle.monitor.base import LogsStreamer
 from racetrack_client.log.logs import get_logger
-from racetrack_client.utils.shell import CommandError
 from racetrack_commons.deploy.resource import job_resource_name
 
-from plugin_config import InfrastructureConfig
-from utils import K8S_JOB_RESOURCE_LABEL
+from log_streams import JobLogStream, LogSession, LogsScheduler
+from target_context import TargetContext
 
 logger = get_logger(__name__)
 
@@ -19,46 +13,51 @@ logger = get_logger(__name__)
 class KubernetesLogsStreamer(LogsStreamer):
     """Source of a Job logs retrieved from a Kubernetes pod"""
 
-    def __init__(self, infrastructure_name: str, infra_config: InfrastructureConfig):
+    def __init__(self, context: TargetContext):
         super().__init__()
-        self.infra_config = infra_config
-        self.infrastructure_name = infrastructure_name
-        self.sessions: dict[str, bool] = {}
-        self.k8s_namespace = infra_config.job_k8s_namespace
+        self.infra_config = context.infra_config
+        self.infrastructure_name = context.infrastructure_name
+        self.k8s_namespace = context.k8s_namespace
+        self.kube = context.kube
+        self.scheduler = LogsScheduler(self.infra_config.logs_workers, self.kube)
+        # the state below is only accessed from the scheduler's event loop
+        self.sessions: dict[str, str] = {}  # session ID -> resource name of a watched job
+        self.streams: dict[str, JobLogStream] = {}  # resource name -> upstream shared by the job's sessions
 
     def create_session(self, session_id: str, resource_properties: dict[str, str], on_next_line: Callable[[str, str], None]):
         """Start a session transmitting messages to a client."""
         job_name = resource_properties.get('job_name')
         job_version = resource_properties.get('job_version')
-        tail = resource_properties.get('tail', 20)
+        tail = int(resource_properties.get('tail', 20))
         resource_name = job_resource_name(job_name, job_version)
-
-        def on_error(error: CommandError):
-            logger.error(f'command "{error.cmd}" failed with return code {error.returncode}: {error.stdout}')
-
-        def watch_logs():
-            try:
-                last_time = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-                output = self.remote_shell(f'/opt/kubectl -n {self.k8s_namespace} logs --selector="{K8S_JOB_RESOURCE_LABEL}={resource_name}" --all-containers=true --tail {tail}')
-                for line in filter(bool, output.splitlines()):
-                    on_next_line(session_id, line)
-                self.sessions[session_id] = True
-
-                while self.sessions.get(session_id) is True:
-                    now_time = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-                    output = self.remote_shell(f'/opt/kubectl -n {self.k8s_namespace} logs --selector="{K8S_JOB_RESOURCE_LABEL}={resource_name}" --all-containers=true --since-time="{last_time}"')
-                    last_time = now_time
-                    for line in filter(bool, output.splitlines()):
-                        on_next_line(session_id, line)
-                    time.sleep(3)
-
-            except CommandError as e:
-                on_error(e)
-
-        threading.Thread(target=watch_logs, args=(), daemon=True).start()
+        session = LogSession(session_id, lambda line: on_next_line(session_id, line), self.infra_config.logs_session_buffer)
+        self.scheduler.call_soon(self._open_session, session, resource_name, tail)
 
     def close_session(self, session_id: str):
-        self.sessions.pop(session_id, None)
-
-    def remote_shell(self, cmd: str, workdir: str | None = None) -> str:
-        return remote_shell(cmd, self.infra_config.remote_gateway_url, self.infra_config.remote_gateway_token, workdir)
+        self.scheduler.call_soon(self._close_session, session_id)
+
+    def _open_session(self, session: LogSession, resource_name: str, tail: int):
+        stream = self.streams.get(resource_name)
+        if stream is None:
+            stream = JobLogStream(
+                resource_name, self.scheduler,
+                self.infra_config.logs_poll_interval, self.infra_config.logs_buffer_size,
+                self.infra_config.logs_follow_idle_timeout,
+            )
+            stream.task = self.scheduler.loop.create_task(stream.follow())
+            self.streams[resource_name] = stream
+        self.sessions[session.session_id] = resource_name
+        session.task = self.scheduler.loop.create_task(session.deliver_lines(self.scheduler))
+        stream.subscribe(session, tail)
+
+    def _close_session(self, session_id: str):
+        resource_name = self.sessions.pop(session_id, None)
+        stream = self.streams.get(resource_name)
+        if stream is None:
+            return
+        session = stream.unsubscribe(session_id)
+        if session is not None:
+            session.task.cancel()
+        if not stream.subscribers:
+            stream.task.cancel()
+            del self.streams[resource_name]
@@ -0,0 +1,91 @@
+import math
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import Instrumentation
+
+LAST_CALL_METRIC = 'job_last_call_timestamp'
+# how long to remember the ETag of a page that is no longer being read, e.g. of a removed replica
+ETAG_RETENTION = 3600
+
+
+class LastCallReader:
+    """
+    Reads the last call timestamp of jobs from their Prometheus metrics.
+    The page is streamed line by line, skipping other families, and reading stops as soon as the metric is found.
+    Pages are fetched compressed and conditionally, if the job supports ETags.
+    """
+
+    def __init__(self, instrumentation: Instrumentation, timeout: float, pool_size: int):
+        self.instrumentation = instrumentation
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # page -> (ETag, last call timestamp, time of the last read)
+        self._etags: dict[tuple[str, str | None], tuple[str, int | None, float]] = {}
+        self._lock = threading.Lock()
+
+    def start_pass(self):
+        """Forget the ETags of the pages that haven't been read for a long time"""
+        now = time.monotonic()
+        with self._lock:
+            for page_key in [key for key, entry in self._etags.items() if now - entry[2] > ETAG_RETENTION]:
+                del self._etags[page_key]
+
+    def read_last_call_timestamp(self, metrics_url: str, headers: dict[str, str]) -> int | None:
+        page_key = (metrics_url, headers.get('X-Racetrack-Job-Internal-Name'))
+        with self._lock:
+            etag_entry = self._etags.get(page_key)
+
+        request_headers = {**headers, 'Accept-Encoding': 'gzip'}
+        if etag_entry is not None:
+            request_headers['If-None-Match'] = etag_entry[0]
+        with self.instrumentation.call('read_last_call') as call:
+            with self.session.get(metrics_url, headers=request_headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 304 and etag_entry is not None:
+                    etag, last_call_timestamp = etag_entry[0], etag_entry[1]
+                else:
+                    response.raise_for_status()
+                    last_call_timestamp = self._read_stream(response)
+                    etag = response.headers.get('ETag')
+                call.response_bytes = response.raw.tell()  # size on the wire, i.e. compressed
+                if etag:
+                    with self._lock:
+                        self._etags[page_key] = (etag, last_call_timestamp, time.monotonic())
+        return last_call_timestamp
+
+    def _read_stream(self, response: requests.Response) -> int | None:
+        response.encoding = response.encoding or 'utf-8'
+        for line in response.iter_lines(decode_unicode=True):
+            if not line.startswith(LAST_CALL_METRIC):
+                continue
+            with self.instrumentation.parsing('read_last_call'):
+                value = parse_sample_value(line, LAST_CALL_METRIC)
+            if value is not None:
+                return value
+        return None
+
+
+def parse_sample_value(line: str, metric_name: str) -> int | None:
+    """Return the value of a sample line in Prometheus text format, or None if it belongs to another metric or is malformed"""
+    rest = line[len(metric_name):]
+    if rest.startswith('{'):
+        labels_end = rest.rfind('}')
+        if labels_end < 0:
+            return None
+        rest = rest[labels_end + 1:]
+    elif not rest.startswith(' '):
+        return None  # metric with a longer name, e.g. job_last_call_timestamp_created
+    fields = rest.split()
+    if not fields:
+        return None
+    try:
+        value = float(fields[0])
+    except ValueError:
+        return None
+    return int(value) if math.isfinite(value) else None
@@ -1,10 +1,9 @@
-from typing import Callable, Iterable
+import time
+from typing import Callable, Hashable, Iterable
 
 from lifecycle.config import Config
-from lifecycle.infrastructure.infra_target import remote_shell
 from lifecycle.monitor.base import JobMonitor
 from lifecycle.monitor.health import check_until_job_is_operational, quick_check_job_condition
-from lifecycle.monitor.metric_parser import read_last_call_timestamp_metric, scrape_metrics
 from racetrack_client.log.context_error import wrap_context
 from racetrack_client.log.exception import short_exception_details
 from racetrack_client.utils.time import datetime_to_timestamp
@@ -13,7 +12,16 @@ from racetrack_commons.deploy.resource import job_resource_name
 from racetrack_commons.entities.dto import JobDto, JobStatus
 from racetrack_client.log.logs import get_logger
 
-from plugin_config import InfrastructureConfig
+from autoscaling import ReplicasReporter
+from fan_out import ListingFanOut
+from images import PullDurationsReporter
+from job_changes import JobChanges, JobChangeTracker
+from kube_client import LogsRequest
+from metrics_reader import LastCallReader
+from probe_schedule import ProbeSchedule, deployment_fingerprint
+from replica_probing import ReplicaProber, summarize_replicas
+from rollout import wait_for_rollout
+from target_context import TargetContext
 from utils import K8S_JOB_RESOURCE_LABEL, list_job_deployments, JobDeployment
 
 logger = get_logger(__name__)
@@ -22,16 +30,66 @@ logger = get_logger(__name__)
 class KubernetesMonitor(JobMonitor):
     """Discovers Job resources in a k8s cluster and monitors their condition"""
 
-    def __init__(self, infrastructure_name: str, infra_config: InfrastructureConfig) -> None:
-        self.infra_config = infra_config
-        self.infrastructure_name = infrastructure_name
-        self.k8s_namespace = infra_config.job_k8s_namespace
+    def __init__(self, context: TargetContext, fan_out: ListingFanOut | None = None) -> None:
+        self.context = context
+        self.infra_config = context.infra_config
+        self.infrastructure_name = context.infrastructure_name
+        self.k8s_namespace = context.k8s_namespace
+        self.instrumentation = context.instrumentation
+        self.kube = context.kube
+        self.fan_out = fan_out
+        self.last_call_reader = LastCallReader(self.instrumentation, self.infra_config.probe_timeout, self.infra_config.probe_workers)
+        self.replica_prober: ReplicaProber | None = None
+        if self.infra_config.replica_probe_enabled:
+            self.replica_prober = ReplicaProber(
+                self.instrumentation, self.infra_config.replica_probe_workers, self.infra_config.replica_probe_sample,
+            )
+        self.probe_schedule: ProbeSchedule | None = None
+        if self.infra_config.probe_schedule_enabled:
+            self.probe_schedule = ProbeSchedule(
+                self.infra_config.probe_interval_min, self.infra_config.probe_interval_max,
+                self.infra_config.probe_error_interval, self.infra_config.probe_max_staleness,
+            )
+        self.replicas_reporter = ReplicasReporter(self.kube, self.instrumentation, self.infra_config.autoscaling.report_interval)
+        self.pull_durations_reporter: PullDurationsReporter | None = None
+        if self.infra_config.image_pull_report_interval is not None:
+            self.pull_durations_reporter = PullDurationsReporter(
+                self.kube, self.instrumentation, self.infra_config.image_pull_report_interval,
+            )
+        self.change_tracker = JobChangeTracker(self.infra_config.job_changes_resync_interval)
+        if fan_out is not None:
+            fan_out.register(self.infrastructure_name, lambda config: list(self._list_jobs(config)))
 
     def list_jobs(self, config: Config) -> Iterable[JobDto]:
+        if self.fan_out is not None:
+            return self.fan_out.list_jobs(self.infrastructure_name, config)
+        return self._list_jobs(config)
+
+    def list_job_changes(self, config: Config, full_resync: bool = False) -> JobChanges:
+        """
+        List jobs and return only the ones added, removed or changed since the previous call,
+        or all of them if a full resync is due or requested
+        """
+        if full_resync:
+            self.change_tracker.request_resync()
+        jobs = list(self.list_jobs(config))
+        return self.change_tracker.update(jobs)
+
+    def request_full_resync(self):
+        """Make the next call of list_job_changes return all jobs"""
+        self.change_tracker.request_resync()
+
+    def _list_jobs(self, config: Config) -> Iterable[JobDto]:
+        self.last_call_reader.start_pass()
 
         with wrap_context('listing Kubernetes API'):
-            job_deployments: list[JobDeployment] = list_job_deployments(self.k8s_namespace, self.remote_shell)
+            if self.infra_config.pod_watch_enabled:
+                job_deployments: list[JobDeployment] = self.context.pod_index.list_job_deployments()
+            else:
+                job_deployments = list_job_deployments(self.kube, self.infra_config.pod_list_chunk_size)
 
+        jobs: list[JobDto] = []
+        fingerprints: dict[tuple[str, str], Hashable] = {}
         for deployment in job_deployments:
             recent_pod = deployment.pods[-1]
             job_name = recent_pod.job_name
@@ -44,13 +102,15 @@ class KubernetesMonitor(JobMonitor):
 
             replica_internal_names: list[str] = []
             for pod in deployment.pods:
+                if not pod.ip:
+                    continue
                 pod_ip_dns: str = pod.ip.replace('.', '-')
                 replica_internal_names.append(
                     f'{pod_ip_dns}.{deployment.resource_name}.{self.k8s_namespace}.svc:7000'
                 )
             replica_internal_names.sort()
 
-            job = JobDto(
+            jobs.append(JobDto(
                 name=job_name,
                 version=job_version,
                 status=JobStatus.RUNNING.value,
@@ -61,18 +121,85 @@ class KubernetesMonitor(JobMonitor):
                 error=None,
                 infrastructure_target=self.infrastructure_name,
                 replica_internal_names=replica_internal_names,
-            )
-            try:
-                job_url, request_headers = self.get_remote_job_address(job)
-                quick_check_job_condition(job_url, request_headers)
-                job_metrics = scrape_metrics(f'{job_url}/metrics', request_headers)
-                job.last_call_time = read_last_call_timestamp_metric(job_metrics)
-            except Exception as e:
-                error_details = short_exception_details(e)
+            ))
+            fingerprints[(job_name, job_version)] = deployment_fingerprint(deployment)
+
+        if self.replica_prober is not None:
+            self.replica_prober.retain(fingerprints.keys())
+        if self.probe_schedule is None:
+            due_jobs = jobs
+        else:
+            self.probe_schedule.retain(fingerprints.keys())
+            due_jobs = []
+            for job in jobs:
+                job_key = (job.name, job.version)
+                if self.probe_schedule.is_due(job_key, fingerprints[job_key]):
+                    due_jobs.append(job)
+                else:  # serve the outcome of the last probe
+                    state = self.probe_schedule.get(job_key)
+                    job.last_call_time = state.last_call_time
+                    if state.error is not None:
+                        job.error = state.error
+                        job.status = JobStatus.ERROR.value
+                    elif state.degraded is not None:
+                        job.error = state.degraded
+            logger.debug(f'probing {len(due_jobs)} out of {len(jobs)} jobs in infrastructure {self.infrastructure_name}')
+
+        probe_results = self.context.prober.probe_concurrently(
+            due_jobs, self._probe_job, self.infra_config.probe_timeout, key=lambda job: (job.name, job.version),
+        )
+        for job, outcome, error in probe_results:
+            job_key = (job.name, job.version)
+            if error is None:
+                last_call_time, degraded = outcome
+                job.last_call_time = last_call_time
+                if degraded is not None:
+                    job.error = degraded
+                    logger.warning(f'Job {job} is {degraded}')
+                if self.probe_schedule is not None:
+                    self.probe_schedule.record_success(job_key, fingerprints[job_key], last_call_time, degraded)
+            else:
+                error_details = short_exception_details(error)
                 job.error = error_details
                 job.status = JobStatus.ERROR.value
                 logger.warning(f'Job {job} is in bad condition: {error_details}')
-            yield job
+                if self.probe_schedule is not None:
+                    self.probe_schedule.record_failure(job_key, fingerprints[job_key], error_details)
+        # jobs are updated in place, so that both the served and the probed ones are reported in listing order
+        yield from jobs
+
+        try:
+            self.replicas_reporter.report_if_due()
+        except Exception as e:
+            logger.warning(f'failed to report replicas of the autoscaled jobs: {e}')
+        if self.pull_durations_reporter is not None:
+            try:
+                self.pull_durations_reporter.report_if_due()
+            except Exception as e:
+                logger.warning(f'failed to report durations of the image pulls: {e}')
+        if self.context.rightsizer is not None:
+            try:
+                self.context.rightsizer.sample_if_due()
+            except Exception as e:
+                logger.warning(f'failed to sample resource usage of the jobs: {e}')
+
+    def _probe_job(self, job: JobDto) -> tuple[int | None, str | None]:
+        """
+        Check the job's health and return its last call timestamp,
+        along with the description of failing replicas if the job is degraded
+        """
+        deadline = time.monotonic() + self.infra_config.probe_timeout
+        job_url, request_headers = self.get_remote_job_address(job)
+        with self.instrumentation.probe(job.name):
+            replica_probe = None
+            if self.replica_prober is not None and self.infra_config.remote_gateway_url:
+                replica_probe = self.replica_prober.start(job, job_url, request_headers)
+            quick_check_job_condition(job_url, request_headers)
+            last_call_time = self.last_call_reader.read_last_call_timestamp(f'{job_url}/metrics', request_headers)
+            degraded = None
+            if replica_probe is not None:
+                degraded = summarize_replicas(replica_probe.wait(deadline), replica_probe.replicas_num)
+            return last_call_time, degraded
 
     def check_job_condition(
         self,
@@ -83,6 +210,11 @@ class KubernetesMonitor(JobMonitor):
     ):
         job_url, request_headers = self.get_remote_job_address(job)
         try:
+            if self.infra_config.rollout_watch_enabled:
+                wait_for_rollout(
+                    self.kube, job_resource_name(job.name, job.version), deployment_timestamp,
+                    self.infra_config.rollout_timeout, self.infra_config.rollout_poll_interval,
+                )
             check_until_job_is_operational(job_url, deployment_timestamp, on_job_alive, request_headers)
         except Exception as e:
             if logs_on_error:
@@ -103,11 +235,8 @@ class KubernetesMonitor(JobMonitor):
 
     def read_recent_logs(self, job: JobDto, tail: int = 20) -> str:
         resource_name = job_resource_name(job.name, job.version)
-        return self.remote_shell(f'/opt/kubectl logs'
-                                 f' --selector {K8S_JOB_RESOURCE_LABEL}={resource_name}'
-                                 f' -n {self.k8s_namespace}'
-                                 f' --tail={tail}'
-                                 f' --container={resource_name}')
-
-    def remote_shell(self, cmd: str) -> str:
-        return remote_shell(cmd, self.infra_config.remote_gateway_url, self.infra_config.remote_gateway_token)
+        return self.kube.read_logs(LogsRequest(
+            label_selector=f'{K8S_JOB_RESOURCE_LABEL}={resource_name}',
+            tail=tail,
+            container=resource_name,
+        ))
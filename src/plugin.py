@@ -1,4 +1,5 @@
 import sys
+import threading
 
 from racetrack_client.log.logs import get_logger
 from racetrack_client.utils.datamodel import parse_yaml_file_datamodel
@@ -9,6 +10,8 @@ if 'lifecycle' in sys.modules:
     from deployer import KubernetesJobDeployer
     from monitor import KubernetesMonitor
     from logs_streamer import KubernetesLogsStreamer
+    from fan_out import ListingFanOut
+    from target_context import TargetContext
 
 from plugin_config import PluginConfig, InfrastructureConfig
 
@@ -29,20 +32,33 @@ class Plugin:
         self._infrastructure_targets: dict[str, InfrastructureConfig] = self.plugin_config.infrastructure_targets or {}
         infra_num = len(self._infrastructure_targets)
         logger.info(f'Remote Kubernetes plugin loaded with {infra_num} infrastructure targets')
+        self._targets: dict[str, 'InfrastructureTarget'] | None = None
+        self._targets_lock = threading.Lock()
 
     def infrastructure_targets(self) -> dict[str, 'InfrastructureTarget']:
         """
         Infrastructure Targets (deployment targets) for Jobs provided by this plugin
         :return dict of infrastructure name -> an instance of InfrastructureTarget
         """
-        return {
-            infra_name: InfrastructureTarget(
+        with self._targets_lock:
+            if self._targets is None:
+                self._targets = self._create_infrastructure_targets()
+            return self._targets
+
+    def _create_infrastructure_targets(self) -> dict[str, 'InfrastructureTarget']:
+        """Create long-lived components of every target, so that their connections, caches and watchers are reused"""
+        fan_out = None
+        if self.plugin_config.list_jobs_fan_out:
+            fan_out = ListingFanOut(len(self._infrastructure_targets), self.plugin_config.list_jobs_timeout)
+        targets = {}
+        for infra_name, infra_config in self._infrastructure_targets.items():
+            context = TargetContext(infra_name, infra_config)
+            targets[infra_name] = InfrastructureTarget(
                 name=infra_name,
-                job_deployer=KubernetesJobDeployer(self.plugin_dir, infra_name, infra_config, self.plugin_config),
-                job_monitor=KubernetesMonitor(infra_name, infra_config),
-                logs_streamer=KubernetesLogsStreamer(infra_name, infra_config),
+                job_deployer=KubernetesJobDeployer(self.plugin_dir, context, self.plugin_config),
+                job_monitor=KubernetesMonitor(context, fan_out),
+                logs_streamer=KubernetesLogsStreamer(context),
                 remote_gateway_url=infra_config.remote_gateway_url,
                 remote_gateway_token=infra_config.remote_gateway_token,
             )
-            for infra_name, infra_config in self._infrastructure_targets.items()
-        }
+        return targets
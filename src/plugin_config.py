@@ -1,10 +1,86 @@
 from pydantic import BaseModel, Extra
 
 
+class AutoscalingConfig(BaseModel, extra=Extra.forbid, arbitrary_types_allowed=True):
+    enabled: bool = False  # render a HorizontalPodAutoscaler for the jobs instead of pinning their replicas
+    min_replicas: int | None = None  # defaults to the replicas of the job's manifest
+    max_replicas: int = 4
+    cpu_utilization: int | None = 80  # target average CPU usage, in percent of the requested CPU
+    memory_utilization: int | None = None  # target average memory usage, in percent of the requested memory
+    requests_per_second: float | None = None  # target average request rate per pod, served by a custom metrics adapter
+    request_rate_metric: str = 'job_requests_per_second'  # name of the pods metric with the request rate
+    report_interval: float = 60  # how often in seconds to report the current and desired replicas of the autoscaled jobs
+
+
+class RolloutConfig(BaseModel, extra=Extra.forbid, arbitrary_types_allowed=True):
+    probes_enabled: bool = False  # render startup and readiness probes of the main job container, on port 7000
+    probe_all_containers: bool = False  # render the probes for the port of each job container, not only the main one
+    startup_path: str = '/live'  # endpoint checked until the container has started
+    startup_timeout: int = 300  # max time in seconds for a container to start before it's restarted
+    readiness_path: str = '/ready'  # endpoint deciding whether the pod receives traffic
+    probe_period: int = 5  # interval in seconds between the probes
+    max_surge: int | str = '25%'  # number or percentage of pods created above the desired replicas during a rollout
+    max_unavailable: int | str = '25%'  # number or percentage of desired replicas that can be unavailable during a rollout
+    topology_spread_key: str | None = None  # node label to spread the replicas across, e.g. "topology.kubernetes.io/zone"
+    topology_max_skew: int = 1  # max difference in number of replicas between the topology domains
+    topology_hard: bool = False  # refuse to schedule replicas that would exceed the skew instead of preferring not to
+    disruption_budget_enabled: bool = False  # render a PodDisruptionBudget for the jobs
+    disruption_max_unavailable: int | str = 1  # number or percentage of replicas that voluntary disruptions can evict at once
+
+
 class InfrastructureConfig(BaseModel, extra=Extra.forbid, arbitrary_types_allowed=True):
     remote_gateway_url: str  # Address of a remote Pub, e.g. "http://host.docker.internal:7107/pub"
     remote_gateway_token: str | None = None
     job_k8s_namespace: str = 'racetrack'
+    probe_workers: int = 16  # number of jobs checked concurrently, across the monitoring passes
+    probe_timeout: float = 15  # deadline in seconds for checking the health and metrics of a single job
+    probe_schedule_enabled: bool = True  # probe healthy jobs with unchanged pods less often, serving their last status in between
+    probe_interval_min: float = 30  # interval in seconds between probes of a job that has just turned out healthy
+    probe_interval_max: float = 120  # max interval in seconds between probes, reached by doubling it while a job stays healthy
+    probe_error_interval: float = 10  # initial interval in seconds between probes of a failing job, doubled on every failure
+    probe_max_staleness: float = 180  # max age in seconds of the last probe's outcome served instead of probing
+    replica_probe_enabled: bool = True  # check the health of individual replicas of the jobs, besides their Service
+    replica_probe_sample: int = 3  # max number of replicas of a job checked in a single probe, rotating through all of them
+    replica_probe_workers: int = 16  # number of replicas checked concurrently, across all jobs
+    pod_watch_enabled: bool = False  # keep an index of pods updated by watch events instead of listing them every pass
+    pod_watch_timeout: int = 60  # duration in seconds of a single watch request
+    pod_index_max_staleness: float = 10  # with kubectl transport, max age in seconds of the index before listing pods instead
+    pod_resync_interval: int = 600  # how often in seconds to re-list all pods to correct the index
+    pod_list_chunk_size: int = 500  # number of pods fetched in a single page when listing them
+    job_changes_resync_interval: float | None = 600  # how often in seconds the change feed returns all jobs, None to do it only on request
+    logs_poll_interval: float = 2  # interval in seconds between fetching new log lines of a job (looking for new pods with http transport)
+    logs_follow_idle_timeout: float = 60  # with http transport, reopen a followed log stream after this many seconds without a line
+    logs_buffer_size: int = 1000  # number of recent log lines kept per job for the new sessions
+    logs_session_buffer: int = 1000  # max number of lines waiting to be delivered to a single session
+    logs_workers: int = 4  # size of the worker pools fetching logs and delivering them to the sessions
+    secrets_cache_size: int = 256  # max number of decoded job secrets kept in memory, evicting the least recently used
+    slow_call_threshold: float | None = None  # log calls to the remote cluster taking longer than this (in seconds)
+    bulk_batch_size: int = 20  # number of jobs whose resources are applied or deleted in a single call by bulk operations
+    bulk_workers: int = 4  # number of jobs rendered and batches applied concurrently by bulk operations
+    rightsizing_mode: str = 'off'  # 'recommend' requests of the jobs from their observed usage, or 'apply' them on deployment
+    rightsizing_sample_interval: float = 60  # how often in seconds to sample usage of the job containers from the metrics API
+    rightsizing_half_life: float = 604800  # time in seconds after which the weight of a usage sample halves
+    rightsizing_cpu_percentile: float = 90  # percentile of the CPU usage covered by the recommended cpu_min
+    rightsizing_memory_percentile: float = 99  # percentile of the memory usage covered by the recommended memory_min
+    rightsizing_headroom: float = 0.15  # fraction added on top of the usage percentiles
+    rightsizing_min_samples: int = 60  # effective number of samples of a job needed to recommend its requests
+    image_pinning_enabled: bool = False  # deploy images pinned by digests, so that they're pulled only if missing on a node
+    image_registry_url: str | None = None  # base URL of the registry API resolving the digests, defaults to https://<docker registry>
+    image_registry_timeout: float = 10  # timeout in seconds for the registry API requests
+    image_prepull_enabled: bool = False  # pull the job images on all nodes with a short-lived DaemonSet before rolling out
+    image_prepull_timeout: float = 300  # max time in seconds to wait for the images to be pre-pulled
+    image_prepull_helper_image: str = 'busybox:1.36'  # image with a static /bin/busybox, run by the pre-pulled images
+    image_pull_report_interval: float | None = 60  # how often in seconds to read the durations of image pulls from the events
+    autoscaling: AutoscalingConfig = AutoscalingConfig()  # defaults, overridable by "autoscaling_*" labels of a manifest
+    rollout: RolloutConfig = RolloutConfig()  # defaults, overridable by "rollout_*" labels of a manifest
+    rollout_watch_enabled: bool = True  # follow Deployment rollout before checking the job over HTTP
+    rollout_timeout: float = 900  # max time in seconds to wait for the new replicas to become available
+    rollout_poll_interval: float = 2  # interval in seconds between checks of the rollout status
+    kube_api_transport: str = 'kubectl'  # 'kubectl' to run kubectl on the remote gateway, or 'http' to call Kubernetes API directly
+    kube_api_url: str | None = None  # address of Kubernetes API (e.g. kubectl proxy) as exposed by the remote gateway
+    kube_api_internal_name: str | None = None  # host:port of Kubernetes API proxy, to which the remote gateway forwards requests
+    kube_api_pool_size: int = 10  # max number of keep-alive connections to Kubernetes API
+    kube_api_timeout: float = 30  # timeout in seconds for Kubernetes API requests
 
 
 class DockerConfig(BaseModel, extra=Extra.forbid, arbitrary_types_allowed=True):
@@ -16,3 +92,5 @@ class DockerConfig(BaseModel, extra=Extra.forbid, arbitrary_types_allowed=True):
 class PluginConfig(BaseModel, extra=Extra.forbid, arbitrary_types_allowed=True):
     infrastructure_targets: dict[str, InfrastructureConfig] | None = None
     docker: DockerConfig | None = None
+    list_jobs_fan_out: bool = False  # list jobs of all infrastructure targets concurrently
+    list_jobs_timeout: float = 120  # max time in seconds to wait for listing jobs of a single target in fan-out mode
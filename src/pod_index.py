@@ -0,0 +1,123 @@
+import math
+import threading
+import time
+from typing import Iterable
+
+from racetrack_client.log.logs import get_logger
+
+from kube_client import KubeClient
+from utils import K8S_JOB_RESOURCE_LABEL, JobDeployment, JobPod, group_job_deployments, parse_job_pod
+
+logger = get_logger(__name__)
+
+# how long to wait before retrying after the watch has failed
+WATCH_RETRY_DELAY = 5
+
+
+class PodIndex:
+    """
+    Informer-like cache of the job pods running in a namespace.
+    It lists the pods once and then keeps the index up to date by applying watch events.
+    The full list is fetched again when the watch drops or after a resync interval.
+    If the watch delivers its events only when it ends (max_staleness is given), each watch request lasts
+    at most max_staleness, and the pods are listed instead of reading an index that's older than that.
+    """
+
+    def __init__(self, kube: KubeClient, watch_timeout: int, resync_interval: int, max_staleness: float | None = None):
+        self.kube = kube
+        self.k8s_namespace = kube.k8s_namespace
+        self.watch_timeout = watch_timeout
+        if max_staleness is not None:
+            self.watch_timeout = max(1, min(watch_timeout, math.floor(max_staleness)))
+        self.resync_interval = resync_interval
+        self.max_staleness = max_staleness
+        self._pods: dict[str, JobPod] = {}
+        self._resource_version: str | None = None
+        self._last_resync: float = 0
+        self._updated_at: float = 0  # when the index was last known to be current
+        self._synced = threading.Event()
+        self._lock = threading.Lock()
+        self._resync_lock = threading.Lock()
+        self._watcher: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def list_job_deployments(self) -> list[JobDeployment]:
+        """Return job deployments from the index, making the initial list if needed or if the index is too old"""
+        if not self._synced.is_set() or (
+            self.max_staleness is not None and time.monotonic() - self._updated_at > self.max_staleness
+        ):
+            self.resync()
+        self._start_watching()
+        with self._lock:
+            pods = list(self._pods.values())
+        return group_job_deployments(pods)
+
+    def resync(self):
+        """Replace the whole index with the current list of pods"""
+        with self._resync_lock:
+            result = self.kube.list_pods(K8S_JOB_RESOURCE_LABEL, field_selector='status.phase=Running')
+            pods: dict[str, JobPod] = {}
+            for pod_item in result['items']:
+                job_pod = parse_job_pod(pod_item)
+                if job_pod is not None:
+                    pods[job_pod.pod_name] = job_pod
+            with self._lock:
+                self._pods = pods
+                self._resource_version = result['metadata']['resourceVersion']
+                self._last_resync = self._updated_at = time.monotonic()
+                self._synced.set()
+            logger.debug(f'pod index of namespace {self.k8s_namespace} resynced with {len(pods)} pods')
+
+    def stop(self):
+        """Stop watching after the current watch request ends"""
+        self._stopped.set()
+
+    def _start_watching(self):
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._watcher = threading.Thread(target=self._watch_loop, name=f'pod-index-{self.k8s_namespace}', daemon=True)
+        self._watcher.start()
+
+    def _watch_loop(self):
+        while not self._stopped.is_set():
+            try:
+                if not self._synced.is_set() or time.monotonic() - self._last_resync >= self.resync_interval:
+                    self.resync()
+                self._watch_once()
+            except Exception as e:
+                self._synced.clear()
+                logger.warning(f'watching pods in namespace {self.k8s_namespace} dropped, resyncing: {e}')
+                time.sleep(WATCH_RETRY_DELAY)
+
+    def _watch_once(self):
+        """Stream pod events starting from the last known resource version until the server ends the watch"""
+        events = self.kube.watch_pods(K8S_JOB_RESOURCE_LABEL, self._resource_version, self.watch_timeout)
+        self._apply_events(events)
+        with self._lock:
+            self._updated_at = time.monotonic()  # all events up to the end of the watch have been applied
+
+    def _apply_events(self, events: Iterable[dict]):
+        for event in events:
+            event_type = event.get('type')
+            obj = event.get('object', {})
+            if event_type == 'ERROR':  # typically 410 Gone when the resource version is too old
+                raise RuntimeError(f'watch error: {obj.get("message")}')
+
+            resource_version = obj.get('metadata', {}).get('resourceVersion')
+            with self._lock:
+                if event_type in {'ADDED', 'MODIFIED'}:
+                    self._upsert_pod(obj)
+                elif event_type == 'DELETED':
+                    self._pods.pop(obj.get('metadata', {}).get('name'), None)
+                if resource_version:
+                    self._resource_version = resource_version
+
+    def _upsert_pod(self, pod_item: dict):
+        pod_name = pod_item.get('metadata', {}).get('name')
+        job_pod = None
+        if pod_item.get('status', {}).get('phase') == 'Running':
+            job_pod = parse_job_pod(pod_item)
+        if job_pod is None:
+            self._pods.pop(pod_name, None)
+        else:
+            self._pods[pod_name] = job_pod
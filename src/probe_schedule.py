@@ -0,0 +1,89 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Hashable, Iterable
+
+from utils import JobDeployment
+
+
+@dataclass
+class ProbeState:
+    fingerprint: Hashable
+    probed_at: float
+    next_probe_at: float
+    last_call_time: int | None = None
+    error: str | None = None
+    degraded: str | None = None  # description of the failing replicas of a job that is still operational
+    healthy_probes: int = 0  # number of successful probes in a row
+    failed_probes: int = 0  # number of failed probes in a row
+
+
+class ProbeSchedule:
+    """
+    Decides which jobs need to be probed in a monitoring pass and remembers the outcome of their last probes.
+    Jobs whose pods have changed are probed immediately.
+    Healthy jobs are probed less and less often, up to the max interval, and failing ones are probed again with backoff.
+    Degraded jobs, with some of the replicas failing, are probed again after the error interval.
+    Outcome of the last probe is served in between, as long as it isn't older than the staleness limit.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, error_interval: float, max_staleness: float):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.error_interval = error_interval
+        self.max_staleness = max_staleness
+        self._states: dict[Hashable, ProbeState] = {}
+        self._lock = threading.Lock()
+
+    def is_due(self, job_key: Hashable, fingerprint: Hashable) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.get(job_key)
+        if state is None or state.fingerprint != fingerprint:
+            return True
+        return now >= min(state.next_probe_at, state.probed_at + self.max_staleness)
+
+    def get(self, job_key: Hashable) -> ProbeState | None:
+        with self._lock:
+            return self._states.get(job_key)
+
+    def record_success(self, job_key: Hashable, fingerprint: Hashable, last_call_time: int | None, degraded: str | None = None):
+        now = time.monotonic()
+        with self._lock:
+            previous = self._states.get(job_key)
+            if degraded is not None:
+                healthy_probes = 0
+                interval = self.error_interval
+            else:
+                healthy_probes = previous.healthy_probes + 1 if previous and previous.fingerprint == fingerprint else 1
+                interval = min(self.min_interval * 2 ** (healthy_probes - 1), self.max_interval)
+            self._states[job_key] = ProbeState(
+                fingerprint=fingerprint, probed_at=now, next_probe_at=now + interval,
+                last_call_time=last_call_time, degraded=degraded, healthy_probes=healthy_probes,
+            )
+
+    def record_failure(self, job_key: Hashable, fingerprint: Hashable, error: str):
+        now = time.monotonic()
+        with self._lock:
+            previous = self._states.get(job_key)
+            failed_probes = previous.failed_probes + 1 if previous and previous.fingerprint == fingerprint else 1
+            interval = min(self.error_interval * 2 ** (failed_probes - 1), self.max_interval)
+            self._states[job_key] = ProbeState(
+                fingerprint=fingerprint, probed_at=now, next_probe_at=now + interval,
+                last_call_time=previous.last_call_time if previous else None,
+                error=error, failed_probes=failed_probes,
+            )
+
+    def retain(self, job_keys: Iterable[Hashable]):
+        """Forget the jobs that are gone"""
+        job_keys = set(job_keys)
+        with self._lock:
+            for job_key in [job_key for job_key in self._states if job_key not in job_keys]:
+                del self._states[job_key]
+
+
+def deployment_fingerprint(deployment: JobDeployment) -> Hashable:
+    """Summary of the deployment's pods, changing whenever a pod is replaced, restarted or changes phase"""
+    return tuple(sorted(
+        (pod.pod_name, pod.creation_datetime, pod.phase, pod.ip) for pod in deployment.pods
+    ))
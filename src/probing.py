@@ -0,0 +1,105 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Hashable, Iterator, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# how often to re-check a probe that is still waiting in the queue for a free worker
+_QUEUED_POLL_INTERVAL = 0.1
+
+
+class ProbeTimeout(RuntimeError):
+    pass
+
+
+class ProbeInProgress(ProbeTimeout):
+    pass
+
+
+class Prober:
+    """
+    Runs probes on a bounded pool of worker threads that lives across monitoring passes,
+    so that the probes left running after their deadline count towards the same limit as the new ones.
+    An item whose previous probe is still running isn't probed again until it finishes.
+    """
+
+    def __init__(self, workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='k8s-probe')
+        self._running: set[Hashable] = set()
+        self._lock = threading.Lock()
+
+    def probe_concurrently(
+        self,
+        items: list[T],
+        probe: Callable[[T], R],
+        timeout: float,
+        key: Callable[[T], Hashable],
+    ) -> Iterator[tuple[T, R | None, BaseException | None]]:
+        """
+        Run probe on every item and yield tuples (item, result, error) in the same order as the input items.
+        A deadline of a probe is counted from the moment it starts running.
+        Probe exceeding its deadline is reported as ProbeTimeout and left to finish in the background,
+        so it doesn't hold up the remaining items. Until it finishes, its item is reported as ProbeInProgress.
+        """
+        if not items:
+            return
+        started_at: dict[int, float] = {}
+
+        def _run_probe(index: int, item: T) -> R:
+            started_at[index] = time.monotonic()
+            return probe(item)
+
+        futures: list[Future | None] = []
+        for index, item in enumerate(items):
+            item_key = key(item)
+            with self._lock:
+                if item_key in self._running:
+                    futures.append(None)
+                    continue
+                self._running.add(item_key)
+            future = self._executor.submit(_run_probe, index, item)
+            future.add_done_callback(lambda _, item_key=item_key: self._release(item_key))
+            futures.append(future)
+
+        try:
+            for index, item in enumerate(items):
+                future = futures[index]
+                if future is None:
+                    yield item, None, ProbeInProgress('previous probe is still running')
+                    continue
+                result, error = _await_probe(future, lambda: started_at.get(index), timeout)
+                yield item, result, error
+        finally:
+            for future in futures:
+                if future is not None:
+                    future.cancel()  # probes still queued when the caller stops early
+
+    def _release(self, item_key: Hashable):
+        with self._lock:
+            self._running.discard(item_key)
+
+
+def _await_probe(
+    future: Future,
+    get_start_time: Callable[[], float | None],
+    timeout: float,
+) -> tuple[R | None, BaseException | None]:
+    while True:
+        start_time = get_start_time()
+        if start_time is None:
+            remaining = _QUEUED_POLL_INTERVAL
+        else:
+            remaining = start_time + timeout - time.monotonic()
+        wait([future], timeout=max(remaining, 0))
+
+        if future.done():
+            error = future.exception()
+            if error is not None:
+                return None, error
+            return future.result(), None
+
+        if start_time is not None and time.monotonic() >= start_time + timeout:
+            future.cancel()
+            return None, ProbeTimeout(f'probe exceeded the deadline of {timeout}s')
@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from uuid import uuid4
+
+from lifecycle.infrastructure.infra_target import remote_shell
+from racetrack_client.utils.shell import CommandError
+
+from plugin_config import InfrastructureConfig
+
+
+# file on the remote gateway collecting stderr of the batched command being run
+STDERR_FILE_VAR = 'racetrack_stderr'
+
+
+@dataclass
+class CommandResult:
+    cmd: str
+    output: str  # stdout of the command
+    returncode: int
+    stderr: str = ''
+
+    def check_output(self) -> str:
+        """Return the command output or raise CommandError, along with its stderr, if the command failed"""
+        if self.returncode != 0:
+            raise CommandError(self.cmd, self.output + self.stderr, self.returncode)
+        return self.output
+
+
+class RemoteExecutor:
+    """Runs shell commands on the remote gateway of an infrastructure target"""
+
+    def __init__(self, infra_config: InfrastructureConfig):
+        self.infra_config = infra_config
+
+    def remote_shell(self, cmd: str, workdir: str | None = None) -> str:
+        return remote_shell(cmd, self.infra_config.remote_gateway_url, self.infra_config.remote_gateway_token, workdir)
+
+    def run_batch(self, cmds: list[str], workdir: str | None = None) -> list[CommandResult]:
+        """
+        Run several commands in a single round trip to the remote gateway.
+        Commands are run one after another, regardless of their exit codes.
+        Return the output and the exit code of each command, in the same order.
+        Stderr of each command is kept apart, so that warnings of kubectl don't mix with the parsed output.
+        """
+        if not cmds:
+            return []
+        marker = f'__racetrack_batch_{uuid4().hex}__'
+        script = '\n'.join([
+            f'{STDERR_FILE_VAR}=$(mktemp)',
+            *(_wrap_batch_command(marker, index, cmd) for index, cmd in enumerate(cmds)),
+            f'rm -f "${STDERR_FILE_VAR}"',
+        ])
+        output = self.remote_shell(script, workdir)
+        return _split_batch_output(marker, cmds, output)
+
+
+def _wrap_batch_command(marker: str, index: int, cmd: str) -> str:
+    return f'''
+echo '{marker} begin {index}'
+(
+{cmd}
+) 2>"${STDERR_FILE_VAR}"
+racetrack_returncode=$?
+printf '\\n%s stderr {index}\\n' '{marker}'
+cat "${STDERR_FILE_VAR}"
+printf '\\n%s end {index} %s\\n' '{marker}' "$racetrack_returncode"
+'''.strip()
+
+
+def _split_batch_output(marker: str, cmds: list[str], output: str) -> list[CommandResult]:
+    results: list[CommandResult] = []
+    position = 0
+    for index, cmd in enumerate(cmds):
+        begin_tag = f'{marker} begin {index}\n'
+        stderr_tag = f'\n{marker} stderr {index}\n'
+        end_tag = f'\n{marker} end {index} '
+        begin = output.find(begin_tag, position)
+        stderr_begin = output.find(stderr_tag, begin)
+        end = output.find(end_tag, stderr_begin)
+        if begin < 0 or stderr_begin < 0 or end < 0:
+            raise RuntimeError(f'incomplete output of batched command #{index}: {cmd}')
+        returncode_end = output.find('\n', end + len(end_tag))
+        if returncode_end < 0:
+            returncode_end = len(output)
+        returncode = int(output[end + len(end_tag):returncode_end])
+        results.append(CommandResult(
+            cmd=cmd,
+            output=output[begin + len(begin_tag):stderr_begin],
+            returncode=returncode,
+            stderr=output[stderr_begin + len(stderr_tag):end],
+        ))
+        position = returncode_end
+    return results
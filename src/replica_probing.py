@@ -0,0 +1,125 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from dataclasses import dataclass
+from typing import Iterable
+
+from lifecycle.monitor.health import quick_check_job_condition
+from racetrack_client.log.exception import short_exception_details
+from racetrack_client.log.logs import get_logger
+from racetrack_commons.entities.dto import JobDto
+
+from instrumentation import Instrumentation
+
+logger = get_logger(__name__)
+
+JobKey = tuple[str, str]
+
+
+@dataclass
+class ReplicaStatus:
+    internal_name: str
+    healthy: bool
+    duration: float
+    error: str | None = None
+
+
+class ReplicaProbe:
+    """Health checks of a sample of job replicas running in the background"""
+
+    def __init__(self, futures: dict[str, Future], replicas_num: int):
+        self.futures = futures
+        self.replicas_num = replicas_num
+
+    def wait(self, deadline: float) -> list[ReplicaStatus]:
+        statuses = []
+        for replica, future in self.futures.items():
+            try:
+                statuses.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FuturesTimeoutError:
+                future.cancel()
+                statuses.append(ReplicaStatus(replica, healthy=False, duration=0, error='health check timed out'))
+        return statuses
+
+
+class ReplicaProber:
+    """
+    Checks the health of individual replicas of jobs through the remote gateway,
+    addressing each pod by its internal name instead of going through the Service.
+    Only a sample of replicas of a job is checked in a single probe, rotating through all of them in the next probes,
+    and all jobs share a bounded pool of workers.
+    """
+
+    def __init__(self, instrumentation: Instrumentation, workers: int, sample_size: int):
+        self.instrumentation = instrumentation
+        self.sample_size = sample_size
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='k8s-replica-probe')
+        self._offsets: dict[JobKey, int] = {}
+        self._reported: dict[JobKey, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def start(self, job: JobDto, job_url: str, request_headers: dict[str, str]) -> ReplicaProbe:
+        """Start checking a sample of the job's replicas. Job with a single replica is left to the Service check."""
+        job_key = (job.name, job.version)
+        replicas = job.replica_internal_names or []
+        self._forget_removed_replicas(job_key, replicas)
+        if len(replicas) <= 1:
+            return ReplicaProbe({}, len(replicas))
+
+        with self._lock:
+            offset = self._offsets.get(job_key, 0) % len(replicas)
+            sample_size = min(self.sample_size, len(replicas))
+            self._offsets[job_key] = offset + sample_size
+        sample = [replicas[(offset + index) % len(replicas)] for index in range(sample_size)]
+        futures = {
+            replica: self._executor.submit(self._check_replica, job, replica, job_url, request_headers)
+            for replica in sample
+        }
+        return ReplicaProbe(futures, len(replicas))
+
+    def retain(self, job_keys: Iterable[JobKey]):
+        """Forget the jobs that are gone"""
+        job_keys = set(job_keys)
+        with self._lock:
+            removed_jobs = [job_key for job_key in self._reported if job_key not in job_keys]
+        for job_key in removed_jobs:
+            self._forget_removed_replicas(job_key, [])
+            with self._lock:
+                self._reported.pop(job_key, None)
+                self._offsets.pop(job_key, None)
+
+    def _check_replica(self, job: JobDto, replica: str, job_url: str, request_headers: dict[str, str]) -> ReplicaStatus:
+        start = time.monotonic()
+        try:
+            quick_check_job_condition(job_url, {**request_headers, 'X-Racetrack-Job-Internal-Name': replica})
+            status = ReplicaStatus(replica, healthy=True, duration=time.monotonic() - start)
+        except Exception as e:
+            status = ReplicaStatus(replica, healthy=False, duration=time.monotonic() - start, error=short_exception_details(e))
+        self.instrumentation.report_replica(job.name, job.version, replica, status.healthy, status.duration)
+        with self._lock:
+            self._reported.setdefault((job.name, job.version), set()).add(replica)
+        return status
+
+    def _forget_removed_replicas(self, job_key: JobKey, replicas: list[str]):
+        with self._lock:
+            reported = self._reported.get(job_key, set())
+            removed = reported - set(replicas)
+            reported -= removed
+        for replica in removed:
+            self.instrumentation.forget_replica(job_key[0], job_key[1], replica)
+
+
+def summarize_replicas(statuses: list[ReplicaStatus], replicas_num: int) -> str | None:
+    """
+    Describe failing replicas of a job, which is degraded if some of them fail.
+    Raise an error if all of them fail.
+    The description doesn't name the replicas, which rotate between probes, so it stays the same while they keep failing.
+    """
+    failed = [status for status in statuses if not status.healthy]
+    if not failed:
+        return None
+    logger.warning('failing replicas: ' + '; '.join(f'{status.internal_name}: {status.error}' for status in failed))
+    if len(failed) == replicas_num:
+        errors = '; '.join(sorted({status.error or 'unknown error' for status in failed}))
+        raise RuntimeError(f'all {replicas_num} replicas are failing: {errors}')
+    return f'degraded: {len(failed)} of {len(statuses)} checked replicas are failing'
@@ -0,0 +1,191 @@
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from racetrack_client.log.logs import get_logger
+from racetrack_client.manifest.manifest import ResourcesManifest
+from racetrack_client.utils.quantity import Quantity
+
+from instrumentation import Instrumentation
+from kube_client import KubeClient
+from plugin_config import InfrastructureConfig
+from utils import K8S_JOB_NAME_LABEL, K8S_JOB_RESOURCE_LABEL
+
+logger = get_logger(__name__)
+
+RIGHTSIZING_MODES = {'off', 'recommend', 'apply'}
+HISTOGRAM_GROWTH = 1.05  # ratio between the bounds of neighbouring buckets, i.e. resolution of the percentiles
+MIN_CPU_CORES = 0.001
+MIN_MEMORY_BYTES = 1024 ** 2
+# lowest values ever recommended, so that a job idling during the observation isn't starved when it gets traffic
+CPU_FLOOR_MILLICORES = 5
+MEMORY_FLOOR_MIB = 32
+# weight relative to the reference time above which the weights are rescaled, to keep them in range of floats
+MAX_RELATIVE_WEIGHT = 2 ** 32
+
+
+class DecayingHistogram:
+    """
+    Compact summary of samples on a logarithmic scale, from which percentiles can be estimated.
+    Weight of a sample halves every half-life, so that the summary follows recent usage.
+    Instead of decaying all buckets on every sample, new samples get growing weights relative to a reference time.
+    """
+
+    def __init__(self, min_value: float, half_life: float):
+        self.min_value = min_value
+        self.half_life = half_life
+        self._weights: dict[int, float] = {}
+        self._reference_time: float | None = None
+
+    def add(self, value: float, timestamp: float):
+        if self._reference_time is None:
+            self._reference_time = timestamp
+        weight = 2 ** ((timestamp - self._reference_time) / self.half_life)
+        if weight > MAX_RELATIVE_WEIGHT:
+            self._weights = {bucket: bucket_weight / weight for bucket, bucket_weight in self._weights.items()}
+            self._reference_time = timestamp
+            weight = 1.0
+        bucket = self._bucket(value)
+        self._weights[bucket] = self._weights.get(bucket, 0.0) + weight
+
+    def total_weight(self, now: float) -> float:
+        """Sum of the decayed weights of all samples, i.e. an effective number of samples"""
+        if self._reference_time is None:
+            return 0.0
+        return sum(self._weights.values()) * 2 ** (-(now - self._reference_time) / self.half_life)
+
+    def percentile(self, percent: float) -> float | None:
+        """Return upper bound of the bucket containing the percentile, or None if there are no samples"""
+        total = sum(self._weights.values())
+        if total <= 0:
+            return None
+        threshold = total * percent / 100
+        cumulative = 0.0
+        for bucket in sorted(self._weights):
+            cumulative += self._weights[bucket]
+            if cumulative >= threshold:
+                return self.min_value * HISTOGRAM_GROWTH ** bucket
+        return self.min_value * HISTOGRAM_GROWTH ** max(self._weights)
+
+    def _bucket(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return math.ceil(math.log(value / self.min_value) / math.log(HISTOGRAM_GROWTH))
+
+
+@dataclass
+class JobUsage:
+    cpu: DecayingHistogram  # cores used by a single container
+    memory: DecayingHistogram  # bytes used by a single container
+    updated_at: float
+
+
+@dataclass
+class Recommendation:
+    cpu_min: Quantity
+    memory_min: Quantity
+
+
+class RightSizer:
+    """
+    Collects CPU and memory usage of the job containers from the metrics API and keeps a rolling summary per job.
+    Recommends requests covering a percentile of the usage, with headroom,
+    which are applied on the next deployment of the job in "apply" mode, unless its manifest sets them explicitly.
+    """
+
+    def __init__(self, kube: KubeClient, instrumentation: Instrumentation, infra_config: InfrastructureConfig):
+        assert infra_config.rightsizing_mode in RIGHTSIZING_MODES, \
+            f'rightsizing_mode should be one of {RIGHTSIZING_MODES}, got {infra_config.rightsizing_mode}'
+        self.kube = kube
+        self.instrumentation = instrumentation
+        self.mode = infra_config.rightsizing_mode
+        self.sample_interval = infra_config.rightsizing_sample_interval
+        self.half_life = infra_config.rightsizing_half_life
+        self.cpu_percentile = infra_config.rightsizing_cpu_percentile
+        self.memory_percentile = infra_config.rightsizing_memory_percentile
+        self.headroom = infra_config.rightsizing_headroom
+        self.min_samples = infra_config.rightsizing_min_samples
+        self._usages: dict[str, JobUsage] = {}
+        self._sampled_at: float | None = None
+        self._lock = threading.Lock()
+
+    def sample_if_due(self):
+        """Record current usage of the job containers, at most once per sample interval"""
+        with self._lock:
+            now = time.monotonic()
+            if self._sampled_at is not None and now - self._sampled_at < self.sample_interval:
+                return
+            self._sampled_at = now
+
+        pod_metrics = self.kube.list_resources('podmetrics', K8S_JOB_RESOURCE_LABEL)
+        now = time.time()
+        with self._lock:
+            for pod in pod_metrics:
+                job_name = (pod['metadata'].get('labels') or {}).get(K8S_JOB_NAME_LABEL)
+                if not job_name:
+                    continue
+                usage = self._usages.get(job_name)
+                if usage is None:
+                    usage = self._usages[job_name] = JobUsage(
+                        cpu=DecayingHistogram(MIN_CPU_CORES, self.half_life),
+                        memory=DecayingHistogram(MIN_MEMORY_BYTES, self.half_life),
+                        updated_at=now,
+                    )
+                for container in pod.get('containers') or []:
+                    container_usage = container.get('usage') or {}
+                    if 'cpu' in container_usage and 'memory' in container_usage:
+                        usage.cpu.add(Quantity(container_usage['cpu']).plain_number, now)
+                        usage.memory.add(Quantity(container_usage['memory']).plain_number, now)
+                        usage.updated_at = now
+
+            # forget the jobs that have been gone for long enough for their samples to fade out
+            removed_jobs = [job_name for job_name, usage in self._usages.items() if now - usage.updated_at > 4 * self.half_life]
+            for job_name in removed_jobs:
+                del self._usages[job_name]
+        for job_name in removed_jobs:
+            self.instrumentation.forget_recommendation(job_name)
+
+        for job_name in list(self._usages):
+            recommendation = self.recommend(job_name)
+            if recommendation is not None:
+                self.instrumentation.report_recommendation(
+                    job_name, recommendation.cpu_min.plain_number, recommendation.memory_min.plain_number,
+                )
+
+    def recommend(self, job_name: str) -> Recommendation | None:
+        """Recommend requests of the job's containers, or return None if its usage hasn't been observed long enough"""
+        with self._lock:
+            usage = self._usages.get(job_name)
+            if usage is None or usage.cpu.total_weight(time.time()) < self.min_samples:
+                return None
+            cpu = usage.cpu.percentile(self.cpu_percentile)
+            memory = usage.memory.percentile(self.memory_percentile)
+        millicores = max(math.ceil(cpu * (1 + self.headroom) * 1000), CPU_FLOOR_MILLICORES)
+        mebibytes = max(math.ceil(memory * (1 + self.headroom) / 1024 ** 2), MEMORY_FLOOR_MIB)
+        return Recommendation(cpu_min=Quantity(f'{millicores}m'), memory_min=Quantity(f'{mebibytes}Mi'))
+
+    def adjust(
+        self,
+        job_name: str,
+        resources: ResourcesManifest,
+        cpu_min: Quantity,
+        cpu_max: Quantity,
+        memory_min: Quantity,
+        memory_max: Quantity,
+    ) -> tuple[Quantity, Quantity]:
+        """Return cpu_min and memory_min of a job being deployed, right-sized within its limits in "apply" mode"""
+        recommendation = self.recommend(job_name)
+        if recommendation is None:
+            return cpu_min, memory_min
+        recommended_cpu = min(recommendation.cpu_min, cpu_max)
+        recommended_memory = min(recommendation.memory_min, memory_max)
+        logger.info(f'right-sizing job {job_name}: recommended cpu_min={recommended_cpu} (was {cpu_min}), '
+                    f'memory_min={recommended_memory} (was {memory_min})')
+        if self.mode != 'apply':
+            return cpu_min, memory_min
+        if resources.cpu_min is None:
+            cpu_min = recommended_cpu
+        if resources.memory_min is None:
+            memory_min = recommended_memory
+        return cpu_min, memory_min
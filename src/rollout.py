@@ -0,0 +1,143 @@
+import math
+import re
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from racetrack_client.log.logs import get_logger
+from racetrack_client.utils.datamodel import parse_dict_datamodel
+
+from kube_client import KubeClient
+from plugin_config import RolloutConfig
+from utils import K8S_JOB_RESOURCE_LABEL
+
+logger = get_logger(__name__)
+
+DEPLOYMENT_DATE_ANNOTATION = 'racetrack-deployment-date'
+# waiting reasons of a container that won't resolve by themselves
+FATAL_WAITING_REASONS = {
+    'ImagePullBackOff',
+    'CrashLoopBackOff',
+    'CreateContainerConfigError',
+    'CreateContainerError',
+    'InvalidImageName',
+    'RunContainerError',
+}
+
+# prefix of the manifest labels overriding the rollout settings of a job, e.g. "rollout_max_surge: 50%"
+ROLLOUT_LABEL_PREFIX = 'rollout_'
+PERCENTAGE_PATTERN = re.compile(r'^\d+%$')
+
+
+class RolloutFailed(RuntimeError):
+    pass
+
+
+def resolve_rollout(defaults: RolloutConfig, manifest_labels: dict[str, Any] | None) -> RolloutConfig:
+    """Merge the job's manifest labels into the target's rollout settings"""
+    overrides = {
+        key[len(ROLLOUT_LABEL_PREFIX):]: value
+        for key, value in (manifest_labels or {}).items()
+        if key.startswith(ROLLOUT_LABEL_PREFIX)
+    }
+    rollout: RolloutConfig = parse_dict_datamodel({**dict(defaults), **overrides}, RolloutConfig)
+
+    for field in ['max_surge', 'max_unavailable', 'disruption_max_unavailable']:
+        value = getattr(rollout, field)
+        if isinstance(value, str) and value.isdigit():  # numbers given as strings, e.g. by manifest labels
+            value = int(value)
+            setattr(rollout, field, value)
+        if isinstance(value, str):
+            assert PERCENTAGE_PATTERN.match(value), f'rollout {field} should be a number or a percentage, got {value}'
+        else:
+            assert value >= 0, f'rollout {field} must not be negative'
+    assert rollout.max_surge not in (0, '0%') or rollout.max_unavailable not in (0, '0%'), \
+        'rollout max_surge and max_unavailable must not both be zero'
+    assert rollout.probe_period >= 1, 'rollout probe_period must be at least 1 second'
+    assert rollout.topology_max_skew >= 1, 'rollout topology_max_skew must be at least 1'
+    return rollout
+
+
+def startup_failure_threshold(rollout: RolloutConfig) -> int:
+    """Number of failed startup probes after which a container is restarted"""
+    return max(1, math.ceil(rollout.startup_timeout / rollout.probe_period))
+
+
+@dataclass
+class RolloutState:
+    complete: bool
+    message: str
+
+
+def wait_for_rollout(kube: KubeClient, resource_name: str, deployment_timestamp: int, timeout: float, poll_interval: float):
+    """
+    Wait until the new ReplicaSet of a Deployment is available.
+    Fail fast when any of the new pods can't be scheduled or gets stuck on a fatal waiting reason.
+    Return without waiting if the Deployment doesn't exist.
+    The Deployment and its pods are polled in one call, as a watch held open through the remote gateway
+    would only return its events once it ends.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        deployment, pods = kube.get_resource_with_pods(
+            f'deployment/{resource_name}', f'{K8S_JOB_RESOURCE_LABEL}={resource_name}',
+        )
+        if deployment is None:
+            logger.warning(f'k8s deployment "{resource_name}" was not found, skipping rollout check')
+            return
+        state = evaluate_rollout(deployment, pods, deployment_timestamp)
+        if state.complete:
+            logger.info(f'rollout of deployment {resource_name} is complete')
+            return
+        if time.monotonic() >= deadline:
+            raise RolloutFailed(f'rollout of deployment {resource_name} timed out after {timeout}s: {state.message}')
+        time.sleep(poll_interval)
+
+
+def evaluate_rollout(deployment: dict[str, Any], pods: list[dict[str, Any]], deployment_timestamp: int) -> RolloutState:
+    """
+    Check the status of a Deployment rollout, raising RolloutFailed if it can't succeed.
+    Pods are checked only if the deployment timestamp is known, as they can't be told apart from the old ones otherwise.
+    """
+    for pod in pods if deployment_timestamp else []:
+        if _pod_deployment_timestamp(pod) != str(deployment_timestamp):
+            continue  # pod from the previous rollout
+        pod_name = pod.get('metadata', {}).get('name')
+        status = pod.get('status', {})
+        for condition in status.get('conditions', []):
+            if condition.get('type') == 'PodScheduled' and condition.get('status') == 'False' \
+                    and condition.get('reason') == 'Unschedulable':
+                raise RolloutFailed(f'pod {pod_name} is unschedulable: {condition.get("message", "")}')
+        for container_status in status.get('initContainerStatuses', []) + status.get('containerStatuses', []):
+            waiting = (container_status.get('state') or {}).get('waiting') or {}
+            reason = waiting.get('reason')
+            if reason in FATAL_WAITING_REASONS:
+                raise RolloutFailed(f'container {container_status.get("name")} of pod {pod_name} '
+                                    f'is waiting: {reason}: {waiting.get("message", "")}')
+
+    metadata = deployment.get('metadata', {})
+    spec = deployment.get('spec', {})
+    status = deployment.get('status', {})
+    for condition in status.get('conditions', []):
+        if condition.get('type') == 'Progressing':
+            if condition.get('reason') == 'ProgressDeadlineExceeded':
+                raise RolloutFailed(f'deployment exceeded its progress deadline: {condition.get("message")}')
+            if condition.get('reason') == 'NewReplicaSetAvailable' \
+                    and status.get('observedGeneration', 0) >= metadata.get('generation', 0):
+                return RolloutState(complete=True, message='new replica set is available')
+
+    desired = spec.get('replicas', 1)
+    updated = status.get('updatedReplicas', 0)
+    available = status.get('availableReplicas', 0)
+    if status.get('observedGeneration', 0) < metadata.get('generation', 0):
+        return RolloutState(complete=False, message='waiting for the deployment spec update to be observed')
+    if updated < desired:
+        return RolloutState(complete=False, message=f'{updated} out of {desired} new replicas have been updated')
+    if available < updated or status.get('replicas', 0) > updated:
+        return RolloutState(complete=False, message=f'{available} of {updated} updated replicas are available')
+    return RolloutState(complete=True, message='all replicas are updated and available')
+
+
+def _pod_deployment_timestamp(pod: dict[str, Any]) -> str | None:
+    annotations = pod.get('metadata', {}).get('annotations') or {}
+    return annotations.get(DEPLOYMENT_DATE_ANNOTATION)
@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from lifecycle.deployer.secrets import JobSecrets
+
+
+@dataclass
+class CachedSecrets:
+    resource_version: str | None  # None if the secret has been written, but not read back since
+    content_hash: str | None  # hash of the applied content, None if the Secret has been created without it
+    secrets: JobSecrets
+
+
+class SecretsCache:
+    """
+    Decoded secrets of the jobs, kept in memory only and validated by the resourceVersion of the Secret before use.
+    Number of entries is bounded, evicting the least recently used ones.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CachedSecrets] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, resource_name: str) -> CachedSecrets | None:
+        with self._lock:
+            entry = self._entries.get(resource_name)
+            if entry is not None:
+                self._entries.move_to_end(resource_name)
+            return entry
+
+    def put(self, resource_name: str, entry: CachedSecrets):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[resource_name] = entry
+            self._entries.move_to_end(resource_name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget(self, resource_name: str):
+        with self._lock:
+            self._entries.pop(resource_name, None)
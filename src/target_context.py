@@ -0,0 +1,45 @@
+import threading
+
+from instrumentation import Instrumentation
+from kube_client import KubeClient, create_kube_client
+from plugin_config import InfrastructureConfig
+from pod_index import PodIndex
+from probing import Prober
+from remote_executor import RemoteExecutor
+from rightsizing import RightSizer
+from secrets_cache import SecretsCache
+
+
+class TargetContext:
+    """
+    Long-lived state of an infrastructure target, shared by its deployer, monitor and logs streamer:
+    connections to the remote cluster, caches and watchers. It lives as long as the plugin.
+    """
+
+    def __init__(self, infrastructure_name: str, infra_config: InfrastructureConfig):
+        self.infrastructure_name = infrastructure_name
+        self.infra_config = infra_config
+        self.k8s_namespace = infra_config.job_k8s_namespace
+        self.executor = RemoteExecutor(infra_config)
+        self.instrumentation = Instrumentation(infrastructure_name, infra_config.slow_call_threshold)
+        self.kube: KubeClient = create_kube_client(infra_config, self.executor, self.instrumentation)
+        self.secrets_cache = SecretsCache(infra_config.secrets_cache_size)
+        self.prober = Prober(infra_config.probe_workers)
+        self.rightsizer: RightSizer | None = None
+        if infra_config.rightsizing_mode != 'off':
+            self.rightsizer = RightSizer(self.kube, self.instrumentation, infra_config)
+        self._pod_index: PodIndex | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def pod_index(self) -> PodIndex:
+        """Index of the job pods, started on first use"""
+        with self._lock:
+            if self._pod_index is None:
+                # kubectl returns the watch events through the remote gateway only once the watch ends
+                max_staleness = self.infra_config.pod_index_max_staleness \
+                    if self.infra_config.kube_api_transport == 'kubectl' else None
+                self._pod_index = PodIndex(
+                    self.kube, self.infra_config.pod_watch_timeout, self.infra_config.pod_resync_interval, max_staleness,
+                )
+            return self._pod_index
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import yaml
+from jinja2 import Template
+
+OVERRIDE_TEMPLATES_DIR = Path('/mnt/templates/remote-kubernetes')
+CONTENT_HASH_ANNOTATION = 'racetrack/content-hash'
+
+_templates: dict[Path, tuple[tuple[int, int], Template]] = {}
+_templates_lock = threading.Lock()
+
+
+def template_resource(template_filename: str, render_vars: dict[str, Any], src_dir: Path) -> str:
+    """Load template from YAML, render templated vars and return as a string"""
+    return load_template(template_filename, src_dir).render(**render_vars)
+
+
+def load_template(template_filename: str, src_dir: Path) -> Template:
+    """Return compiled template, recompiling it only when the file (or its override) has changed"""
+    template_path = src_dir / 'templates' / template_filename
+    override_template_path = OVERRIDE_TEMPLATES_DIR / template_filename
+    if override_template_path.is_file():
+        template_path = override_template_path
+
+    stat = template_path.stat()
+    file_signature = (stat.st_mtime_ns, stat.st_size)
+    with _templates_lock:
+        cached = _templates.get(template_path)
+        if cached is not None and cached[0] == file_signature:
+            return cached[1]
+    template = Template(template_path.read_text())
+    with _templates_lock:
+        _templates[template_path] = (file_signature, template)
+    return template
+
+
+@dataclass
+class RenderedResource:
+    kind: str
+    name: str
+    body: dict[str, Any]
+    content_hash: str
+
+    @property
+    def ref(self) -> str:
+        return f'{self.kind.lower()}/{self.name}'
+
+
+def fingerprint_resources(resource_yaml: str) -> list[RenderedResource]:
+    """Split rendered YAML into resources and annotate each of them with a hash of its content"""
+    resources: list[RenderedResource] = []
+    for body in yaml.safe_load_all(resource_yaml):
+        if not body:
+            continue
+        content_json = json.dumps(body, sort_keys=True, separators=(',', ':'), default=str)
+        content_hash = hashlib.sha256(content_json.encode()).hexdigest()[:32]
+        metadata = body.setdefault('metadata', {})
+        metadata['annotations'] = metadata.get('annotations') or {}
+        metadata['annotations'][CONTENT_HASH_ANNOTATION] = content_hash
+        resources.append(RenderedResource(kind=body['kind'], name=metadata['name'], body=body, content_hash=content_hash))
+    return resources
+
+
+def read_content_hashes(items: list[dict[str, Any]]) -> dict[str, str]:
+    """Extract content hashes from the live resource objects"""
+    hashes: dict[str, str] = {}
+    for item in items:
+        metadata = item.get('metadata', {})
+        content_hash = (metadata.get('annotations') or {}).get(CONTENT_HASH_ANNOTATION)
+        if content_hash:
+            hashes[f"{item['kind'].lower()}/{metadata['name']}"] = content_hash
+    return hashes
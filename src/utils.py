@@ -1,61 +1,101 @@
-import json
 from collections import defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Callable
+from typing import TYPE_CHECKING, Iterable
 
-from pydantic import BaseModel
+if TYPE_CHECKING:
+    from kube_client import KubeClient
 
 K8S_JOB_RESOURCE_LABEL = "racetrack/job"
 K8S_JOB_NAME_LABEL = "racetrack/job-name"
 K8S_JOB_VERSION_LABEL = "racetrack/job-version"
 
 
-class JobPod(BaseModel):
+# columns projected by the API server when listing pods: (column name, JSONPath of the field)
+JOB_POD_COLUMNS: list[tuple[str, str]] = [
+    ('NAME', '.metadata.name'),
+    ('RESOURCE', f'.metadata.labels.{K8S_JOB_RESOURCE_LABEL}'),
+    ('JOB_NAME', f'.metadata.labels.{K8S_JOB_NAME_LABEL}'),
+    ('JOB_VERSION', f'.metadata.labels.{K8S_JOB_VERSION_LABEL}'),
+    ('CREATED', '.metadata.creationTimestamp'),
+    ('DELETED', '.metadata.deletionTimestamp'),
+    ('PHASE', '.status.phase'),
+    ('IP', '.status.podIP'),
+]
+MISSING_COLUMN_VALUE = '<none>'
+
+
+@dataclass(slots=True)
+class JobPod:
     pod_name: str
     resource_name: str
-    job_name: str
-    job_version: str
+    job_name: str | None
+    job_version: str | None
     creation_datetime: datetime
     phase: str
-    ip: str
+    ip: str | None
 
 
-class JobDeployment(BaseModel):
+@dataclass(slots=True)
+class JobDeployment:
     resource_name: str
-    pods: list[JobPod] = []
+    pods: list[JobPod] = field(default_factory=list)
+
+
+def list_job_deployments(kube: 'KubeClient', chunk_size: int = 500) -> list[JobDeployment]:
+    job_pods = kube.list_job_pods(K8S_JOB_RESOURCE_LABEL, 'status.phase=Running', chunk_size)
+    with kube.instrumentation.parsing('group_job_deployments'):
+        return group_job_deployments(job_pods)
+
+
+def parse_job_pod(pod_item: dict) -> JobPod | None:
+    """Convert Pod object from Kubernetes API to JobPod. Return None if pod should be ignored."""
+    metadata = pod_item.get('metadata', {})
+    pod_name = metadata.get('name')
+    creation_timestamp: str = metadata.get('creationTimestamp')
+    if metadata.get('deletionTimestamp') is not None:  # ignore Terminating pods
+        return None
+    creation_datetime: datetime = _parse_k8s_timestamp(creation_timestamp)
+    pod_labels: dict[str, str] = metadata.get('labels')
+    job_name = pod_labels.get(K8S_JOB_NAME_LABEL)
+    job_version = pod_labels.get(K8S_JOB_VERSION_LABEL)
+    resource_name = pod_labels.get(K8S_JOB_RESOURCE_LABEL)
+    status = pod_item.get('status', {})
+    pod_ip = status.get('podIP')
+    phase = status.get('phase')
+
+    return JobPod(
+        pod_name=pod_name,
+        resource_name=resource_name,
+        job_name=job_name,
+        job_version=job_version,
+        creation_datetime=creation_datetime,
+        phase=phase,
+        ip=pod_ip,
+    )
 
 
-def list_job_deployments(k8s_namespace: str, remote_shell: Callable[[str], str]) -> list[JobDeployment]:
-    cmd = f"/opt/kubectl -n {k8s_namespace} get pods --field-selector=status.phase=Running --selector='racetrack/job' -o json"
-    output_str = remote_shell(cmd).strip()
-    result = json.loads(output_str)
+def parse_job_pod_columns(columns: list[str]) -> JobPod | None:
+    """Convert a row of projected JOB_POD_COLUMNS to JobPod. Return None if pod should be ignored."""
+    pod_name, resource_name, job_name, job_version, creation_timestamp, deletion_timestamp, phase, pod_ip = columns
+    if deletion_timestamp != MISSING_COLUMN_VALUE:  # ignore Terminating pods
+        return None
+    return JobPod(
+        pod_name=pod_name,
+        resource_name=resource_name,
+        job_name=_column_value(job_name),
+        job_version=_column_value(job_version),
+        creation_datetime=_parse_k8s_timestamp(creation_timestamp),
+        phase=phase,
+        ip=_column_value(pod_ip),
+    )
 
+
+def group_job_deployments(job_pods: Iterable[JobPod]) -> list[JobDeployment]:
+    """Group pods by job resource and sort them by creation time"""
     pods_by_job: dict[str, list[JobPod]] = defaultdict(list)
-    for pod_item in result['items']:
-        metadata = pod_item.get('metadata', {})
-        pod_name = metadata.get('name')
-        creation_timestamp: str = metadata.get('creationTimestamp')
-        if metadata.get('deletionTimestamp') is not None:  # ignore Terminating pods
-            continue
-        creation_datetime: datetime = datetime.strptime(creation_timestamp, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
-        pod_labels: dict[str, str] = metadata.get('labels')
-        job_name = pod_labels.get(K8S_JOB_NAME_LABEL)
-        job_version = pod_labels.get(K8S_JOB_VERSION_LABEL)
-        resource_name = pod_labels.get(K8S_JOB_RESOURCE_LABEL)
-        status = pod_item.get('status', {})
-        pod_ip = status.get('podIP')
-        phase = status.get('phase')
-
-        job_pod = JobPod(
-            pod_name=pod_name,
-            resource_name=resource_name,
-            job_name=job_name,
-            job_version=job_version,
-            creation_datetime=creation_datetime,
-            phase=phase,
-            ip=pod_ip,
-        )
-        pods_by_job[resource_name].append(job_pod)
+    for job_pod in job_pods:
+        pods_by_job[job_pod.resource_name].append(job_pod)
 
     deployments: list[JobDeployment] = []
     for resource_name, pods in pods_by_job.items():
@@ -67,3 +107,11 @@ def list_job_deployments(k8s_namespace: str, remote_shell: Callable[[str], str])
         deployments.append(job_deployment)
 
     return sorted(deployments, key=lambda d: d.resource_name)
+
+
+def _column_value(value: str) -> str | None:
+    return None if value == MISSING_COLUMN_VALUE else value
+
+
+def _parse_k8s_timestamp(timestamp: str) -> datetime:
+    return datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# plugin modules are imported by their bare names, as they are when the plugin is loaded by Racetrack
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
@@ -0,0 +1,137 @@
+import copy
+import json
+from pathlib import Path
+from typing import Any, Collection
+
+import pytest
+
+from bulk import RenderedJob
+from deployer import KubernetesJobDeployer
+from plugin_config import InfrastructureConfig, PluginConfig
+from target_context import TargetContext
+from templating import RenderedResource, fingerprint_resources
+
+SRC_DIR = Path(__file__).parent.parent / 'src'
+OPTIONAL_KINDS = {'horizontalpodautoscaler': 'HorizontalPodAutoscaler', 'poddisruptionbudget': 'PodDisruptionBudget'}
+
+
+class FakeKube:
+    """In-memory resources of a namespace, recording the calls made to them"""
+
+    def __init__(self):
+        self.resources: dict[str, dict[str, Any]] = {}
+        self.calls: list[tuple[str, list[str]]] = []
+
+    def get_resources(self, refs: list[str]) -> list[dict[str, Any]]:
+        self.calls.append(('get', refs))
+        return [copy.deepcopy(self.resources[ref]) for ref in refs if ref in self.resources]
+
+    def apply_resources(self, items: list[dict[str, Any]]):
+        refs = [f"{item['kind'].lower()}/{item['metadata']['name']}" for item in items]
+        self.calls.append(('apply', refs))
+        for ref, item in zip(refs, items):
+            self.resources[ref] = copy.deepcopy(item)
+
+    def delete_resources(self, refs: list[str], optional_refs: Collection[str] = ()) -> dict[str, bool]:
+        self.calls.append(('delete', refs))
+        return {ref: self.resources.pop(ref, None) is not None for ref in refs}
+
+
+@pytest.fixture
+def kube() -> FakeKube:
+    return FakeKube()
+
+
+@pytest.fixture
+def deployer(kube: FakeKube) -> KubernetesJobDeployer:
+    context = TargetContext('test', InfrastructureConfig(remote_gateway_url='http://gateway'))
+    context.kube = kube
+    return KubernetesJobDeployer(SRC_DIR, context, PluginConfig())
+
+
+def _job_resources(
+    name: str,
+    timestamp: int = 1,
+    replicas: int | None = 1,
+    optional_resources: tuple[str, ...] = (),
+) -> list[RenderedResource]:
+    annotations = {'racetrack/optional-resources': ','.join(optional_resources)}
+    deployment_spec: dict[str, Any] = {'template': {'metadata': {'annotations': {'racetrack-deployment-date': str(timestamp)}}}}
+    if replicas is not None:
+        deployment_spec['replicas'] = replicas
+    documents = [
+        {'kind': 'Deployment', 'metadata': {'name': name, 'annotations': annotations}, 'spec': deployment_spec},
+        {'kind': 'Service', 'metadata': {'name': name, 'annotations': annotations}, 'spec': {'type': 'ClusterIP'}},
+        *({'kind': OPTIONAL_KINDS[kind], 'metadata': {'name': name}} for kind in optional_resources),
+    ]
+    return fingerprint_resources('\n---\n'.join(json.dumps(document) for document in documents))
+
+
+def test_deployment_is_applied_without_reading_it(deployer: KubernetesJobDeployer, kube: FakeKube):
+    deployer._apply_resources(_job_resources('job-a', timestamp=1), 'job')
+    kube.calls.clear()
+
+    deployer._apply_resources(_job_resources('job-a', timestamp=2), 'job')
+
+    assert kube.calls == [('get', ['service/job-a']), ('apply', ['deployment/job-a'])]
+
+
+def test_unchanged_resources_are_skipped(deployer: KubernetesJobDeployer, kube: FakeKube):
+    secret = fingerprint_resources(json.dumps({'kind': 'Secret', 'metadata': {'name': 'job-a'}, 'data': {'a': 'b'}}))
+    deployer._apply_resources(secret, 'secret')
+    kube.calls.clear()
+
+    deployer._apply_resources(secret, 'secret')
+
+    assert kube.calls == [('get', ['secret/job-a'])]
+
+
+def test_autoscaled_deployment_keeps_live_replicas(deployer: KubernetesJobDeployer, kube: FakeKube):
+    deployer._apply_resources(_job_resources('job-a', replicas=3), 'job')
+
+    deployer._apply_resources(_job_resources('job-a', timestamp=2, replicas=None), 'job')
+
+    assert kube.resources['deployment/job-a']['spec']['replicas'] == 3
+
+
+def test_optional_resources_turned_off_are_deleted(deployer: KubernetesJobDeployer, kube: FakeKube):
+    deployer._apply_resources(_job_resources('job-a', optional_resources=('horizontalpodautoscaler',)), 'job')
+    assert 'horizontalpodautoscaler/job-a' in kube.resources
+
+    rendered_job = RenderedJob('job-a', [], None, optional_resources=[])
+    live_resources = deployer._apply_resources(_job_resources('job-a', timestamp=2), 'job')
+    deployer._delete_stale_resources([rendered_job], live_resources)
+
+    assert 'horizontalpodautoscaler/job-a' not in kube.resources
+
+
+
+def test_job_without_autoscaler_is_deleted_without_touching_autoscalers(deployer: KubernetesJobDeployer, kube: FakeKube):
+    deployer._apply_resources(_job_resources('job-a-v-1'), 'job')
+
+    deployer.delete_job('a', '1')
+
+    deleted_refs = kube.calls[-1][1]
+    assert 'deployment/job-a-v-1' in deleted_refs
+    assert 'horizontalpodautoscaler/job-a-v-1' not in deleted_refs
+    assert 'poddisruptionbudget/job-a-v-1' not in deleted_refs
+    assert not kube.resources
+
+
+def test_autoscaler_recorded_on_the_deployment_is_deleted(deployer: KubernetesJobDeployer, kube: FakeKube):
+    deployer._apply_resources(_job_resources('job-a-v-1', optional_resources=('horizontalpodautoscaler',)), 'job')
+
+    deployer.delete_job('a', '1')
+
+    assert 'horizontalpodautoscaler/job-a-v-1' in kube.calls[-1][1]
+    assert not kube.resources
+
+
+def test_disruption_budget_recorded_on_the_deployment_is_deleted(deployer: KubernetesJobDeployer, kube: FakeKube):
+    deployer._apply_resources(_job_resources('job-a-v-1', optional_resources=('poddisruptionbudget',)), 'job')
+
+    results = deployer.delete_jobs([('a', '1')])
+
+    assert results[0].succeeded
+    assert 'poddisruptionbudget/job-a-v-1' in kube.calls[-1][1]
+    assert not kube.resources
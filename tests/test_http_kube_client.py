@@ -0,0 +1,175 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from instrumentation import Instrumentation
+from kube_client import FIELD_MANAGER, HttpKubeClient, LogsRequest
+from plugin_config import InfrastructureConfig
+from utils import K8S_JOB_RESOURCE_LABEL
+
+PODS_PATH = '/api/v1/namespaces/racetrack/pods'
+
+
+class FakeKubeApi:
+    """Kubernetes API serving canned responses and recording the requests it has received"""
+
+    def __init__(self):
+        self.objects: dict[str, dict[str, Any]] = {}  # path -> object
+        self.pod_pages: list[dict[str, Any]] = []  # pages of the pods list, chained by continue tokens
+        self.logs: dict[str, str] = {}  # path -> log output
+        self.forbidden: set[str] = set()  # paths that the client isn't allowed to access
+        self.requests: list[tuple[str, str, dict[str, list[str]], dict[str, str], bytes]] = []
+
+    def handle(self, method: str, path: str, query: dict[str, list[str]], content_type: str, body: bytes) -> tuple[int, str]:
+        if path in self.forbidden:
+            return 403, json.dumps({'kind': 'Status', 'message': f'{path} is forbidden', 'code': 403})
+        if method == 'GET' and path == PODS_PATH:
+            page_index = int(query.get('continue', ['0'])[0])
+            return 200, json.dumps(self.pod_pages[page_index])
+        if method == 'GET' and path in self.logs:
+            return 200, self.logs[path]
+        if method == 'PATCH' and content_type == 'application/apply-patch+yaml':  # server-side apply creates objects
+            self.objects[path] = json.loads(body)
+            return 200, body.decode()
+        if path not in self.objects:
+            return 404, json.dumps({'kind': 'Status', 'message': f'{path} not found', 'code': 404})
+        if method == 'DELETE':
+            return 200, json.dumps(self.objects.pop(path))
+        return 200, json.dumps(self.objects[path])
+
+
+@pytest.fixture
+def kube_api() -> Iterator[FakeKubeApi]:
+    api = FakeKubeApi()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _serve(self):
+            url = urlsplit(self.path)
+            query = parse_qs(url.query)
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            api.requests.append((self.command, url.path, query, dict(self.headers), body))
+            status, content = api.handle(self.command, url.path, query, self.headers.get('Content-Type', ''), body)
+            encoded = content.encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        do_GET = do_PATCH = do_DELETE = _serve
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    api.url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield api
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(kube_api: FakeKubeApi) -> HttpKubeClient:
+    infra_config = InfrastructureConfig(
+        remote_gateway_url='http://gateway', remote_gateway_token='secret-token',
+        kube_api_transport='http', kube_api_url=kube_api.url + '/',
+    )
+    return HttpKubeClient('racetrack', infra_config, Instrumentation('test', None))
+
+
+def _pod(name: str) -> dict[str, Any]:
+    return {
+        'metadata': {'name': name, 'labels': {K8S_JOB_RESOURCE_LABEL: 'job-a-v-1'}, 'creationTimestamp': '2024-01-01T00:00:00Z'},
+        'status': {'phase': 'Running', 'podIP': '10.0.0.1'},
+    }
+
+
+def test_apply_sends_server_side_apply_patch(client: HttpKubeClient, kube_api: FakeKubeApi):
+    service = {'apiVersion': 'v1', 'kind': 'Service', 'metadata': {'name': 'job-a-v-1'}, 'spec': {'ports': [{'port': 7000}]}}
+
+    client.apply_resources([service])
+
+    method, path, query, headers, body = kube_api.requests[-1]
+    assert (method, path) == ('PATCH', '/api/v1/namespaces/racetrack/services/job-a-v-1')
+    assert query == {'fieldManager': [FIELD_MANAGER], 'force': ['true']}
+    assert headers['Content-Type'] == 'application/apply-patch+yaml'
+    assert headers['X-Racetrack-Gateway-Token'] == 'secret-token'
+    assert json.loads(body) == service
+    assert client.get_resources(['service/job-a-v-1']) == [service]
+
+
+def test_delete_tolerates_missing_resources(client: HttpKubeClient, kube_api: FakeKubeApi):
+    kube_api.objects['/apis/apps/v1/namespaces/racetrack/deployments/job-a-v-1'] = {'kind': 'Deployment'}
+
+    existed = client.delete_resources(['deployment/job-a-v-1', 'service/job-a-v-1'])
+
+    assert existed == {'deployment/job-a-v-1': True, 'service/job-a-v-1': False}
+    assert all(query == {'propagationPolicy': ['Background']} for _, _, query, _, _ in kube_api.requests)
+    assert not kube_api.objects
+
+
+def test_delete_skips_optional_resources_it_is_not_allowed_to_delete(client: HttpKubeClient, kube_api: FakeKubeApi):
+    kube_api.objects['/api/v1/namespaces/racetrack/services/job-a-v-1'] = {'kind': 'Service'}
+    kube_api.forbidden.add('/apis/autoscaling/v2/namespaces/racetrack/horizontalpodautoscalers/job-a-v-1')
+    refs = ['service/job-a-v-1', 'horizontalpodautoscaler/job-a-v-1']
+
+    existed = client.delete_resources(refs, optional_refs=['horizontalpodautoscaler/job-a-v-1'])
+
+    assert existed == {'service/job-a-v-1': True, 'horizontalpodautoscaler/job-a-v-1': False}
+    with pytest.raises(RuntimeError, match='responded with 403'):
+        client.delete_resources(['horizontalpodautoscaler/job-a-v-1'])
+
+
+def test_errors_other_than_missing_resource_are_raised(client: HttpKubeClient):
+    with pytest.raises(RuntimeError, match='responded with 404'):
+        client.list_resources('horizontalpodautoscaler', K8S_JOB_RESOURCE_LABEL)
+
+
+def test_list_job_pods_follows_continue_tokens(client: HttpKubeClient, kube_api: FakeKubeApi):
+    kube_api.pod_pages = [
+        {'metadata': {'continue': '1'}, 'items': [_pod('pod-1'), _pod('pod-2')]},
+        {'metadata': {'continue': '2'}, 'items': [_pod('pod-3')]},
+        {'metadata': {}, 'items': [_pod('pod-4')]},
+    ]
+
+    job_pods = client.list_job_pods(K8S_JOB_RESOURCE_LABEL, 'status.phase!=Succeeded', chunk_size=2)
+
+    assert [job_pod.pod_name for job_pod in job_pods] == ['pod-1', 'pod-2', 'pod-3', 'pod-4']
+    queries = [query for _, _, query, _, _ in kube_api.requests]
+    assert [query.get('continue') for query in queries] == [None, ['1'], ['2']]
+    assert all(query['limit'] == ['2'] for query in queries)
+    assert all(query['fieldSelector'] == ['status.phase!=Succeeded'] for query in queries)
+
+
+def test_read_logs_of_all_pods(client: HttpKubeClient, kube_api: FakeKubeApi):
+    kube_api.pod_pages = [{'metadata': {}, 'items': [_pod('pod-1'), _pod('pod-2')]}]
+    kube_api.logs[f'{PODS_PATH}/pod-1/log'] = '2024-01-01T00:00:01Z first\n'
+    kube_api.logs[f'{PODS_PATH}/pod-2/log'] = '2024-01-01T00:00:02Z second'
+
+    output = client.read_logs(LogsRequest(f'{K8S_JOB_RESOURCE_LABEL}=job-a-v-1', tail=10, container='job-a-v-1', timestamps=True))
+
+    assert output == '2024-01-01T00:00:01Z first\n2024-01-01T00:00:02Z second\n'
+    log_queries = [query for _, path, query, _, _ in kube_api.requests if path.endswith('/log')]
+    assert log_queries == [
+        {'timestamps': ['true'], 'container': ['job-a-v-1'], 'tailLines': ['10']},
+    ] * 2
+
+
+def test_follow_logs_streams_from_since_time(client: HttpKubeClient, kube_api: FakeKubeApi):
+    kube_api.logs[f'{PODS_PATH}/pod-1/log'] = '2024-01-01T00:00:01Z first\n2024-01-01T00:00:02Z second\n'
+
+    lines = list(client.follow_logs('pod-1', 'job-a-v-1', '2024-01-01T00:00:01Z', idle_timeout=5))
+
+    assert lines == ['2024-01-01T00:00:01Z first', '2024-01-01T00:00:02Z second']
+    _, _, query, _, _ = kube_api.requests[-1]
+    assert query == {
+        'follow': ['true'], 'timestamps': ['true'], 'container': ['job-a-v-1'], 'sinceTime': ['2024-01-01T00:00:01Z'],
+    }
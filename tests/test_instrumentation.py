@@ -0,0 +1,19 @@
+import importlib.util
+
+from prometheus_client import REGISTRY
+
+import instrumentation
+
+
+def test_module_executed_again_keeps_the_registered_metrics():
+    instrumentation.metric_remote_calls.labels('test', 'get').inc()
+    before = REGISTRY.get_sample_value('remote_kubernetes_calls_total', {'infrastructure': 'test', 'operation': 'get'})
+
+    spec = importlib.util.spec_from_file_location('instrumentation_reloaded', instrumentation.__file__)
+    reloaded = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(reloaded)
+    reloaded.metric_remote_calls.labels('test', 'get').inc()
+    instrumentation.metric_remote_calls.labels('test', 'get').inc()
+
+    after = REGISTRY.get_sample_value('remote_kubernetes_calls_total', {'infrastructure': 'test', 'operation': 'get'})
+    assert after == before + 1
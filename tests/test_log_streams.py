@@ -0,0 +1,102 @@
+import asyncio
+import queue
+import threading
+from typing import Iterator
+
+from log_streams import JobLogStream, LogCursor, LogSession, LogsScheduler
+
+
+def test_lines_at_the_cursor_timestamp_are_not_delivered_again():
+    cursor = LogCursor()
+    assert cursor.advance(
+        '2024-01-01T10:00:00.100000000Z first\n'
+        '2024-01-01T10:00:01.000000000Z second\n'
+    ) == ['first', 'second']
+    assert cursor.since_time == '2024-01-01T10:00:01.000000000Z'
+
+    # sinceTime is truncated to seconds, so the last delivered lines come again
+    assert cursor.advance(
+        '2024-01-01T10:00:01.000000000Z second\n'
+        '2024-01-01T10:00:01.000000000Z third\n'
+        '2024-01-01T10:00:02.000000000Z fourth\n'
+    ) == ['third', 'fourth']
+
+
+def test_identical_lines_at_the_same_timestamp_are_counted():
+    cursor = LogCursor()
+    assert cursor.advance('2024-01-01T10:00:01Z ping\n') == ['ping']
+
+    # one "ping" has been delivered already, the other one is new
+    assert cursor.advance('2024-01-01T10:00:01Z ping\n2024-01-01T10:00:01Z ping\n') == ['ping']
+    assert cursor.advance('2024-01-01T10:00:01Z ping\n2024-01-01T10:00:01Z ping\n') == []
+
+
+def test_older_and_not_timestamped_lines_are_skipped():
+    cursor = LogCursor()
+    cursor.advance('2024-01-01T10:00:05Z current\n')
+
+    assert cursor.advance(
+        'Error from server: warning\n'
+        '2024-01-01T10:00:04.999Z older\n'
+        '2024-01-01T10:00:05.001Z newer\n'
+    ) == ['newer']
+
+
+def test_followed_lines_are_deduplicated_only_after_resuming():
+    cursor = LogCursor()
+    cursor.resume()
+    assert cursor.feed(['2024-01-01T10:00:01Z tick']) == ['tick']
+    assert cursor.feed(['2024-01-01T10:00:01Z tick']) == ['tick']
+
+    cursor.resume()
+    assert cursor.feed(['2024-01-01T10:00:01Z tick', '2024-01-01T10:00:01Z tick']) == []
+    assert cursor.feed(['2024-01-01T10:00:01Z tick']) == ['tick']
+
+
+class StreamingKube:
+    streams_logs = True
+
+    def __init__(self):
+        self.lines: queue.Queue[str | None] = queue.Queue()
+        self.polled_logs = 0
+
+    def read_logs_many(self, logs_requests) -> list[str]:
+        self.polled_logs += 1
+        return ['2024-01-01T10:00:00Z started\n' for _ in logs_requests]
+
+    def list_pods(self, label_selector: str) -> dict:
+        return {'items': [{'metadata': {'name': 'job-pod'}, 'spec': {'containers': [{'name': 'job'}]}}]}
+
+    def follow_logs(self, pod_name: str, container: str, since_time: str | None, idle_timeout: float) -> Iterator[str]:
+        yield '2024-01-01T10:00:00Z started'  # repeated from since_time
+        while (line := self.lines.get(timeout=5)) is not None:
+            yield line
+
+
+def test_http_stream_follows_containers_instead_of_polling_logs():
+    kube = StreamingKube()
+    scheduler = LogsScheduler(workers=2, kube=kube)
+    received: list[str] = []
+    received_event = threading.Event()
+
+    def on_line(line: str):
+        received.append(line)
+        if len(received) == 3:
+            received_event.set()
+
+    def open_session():
+        stream = JobLogStream('job-v-1', scheduler, poll_interval=0.05, buffer_size=100)
+        session = LogSession('session', on_line, buffer_size=100)
+        session.task = scheduler.loop.create_task(session.deliver_lines(scheduler))
+        stream.subscribe(session, tail=10)
+        stream.task = scheduler.loop.create_task(stream.follow())
+
+    scheduler.call_soon(open_session)
+    kube.lines.put('2024-01-01T10:00:01Z first')
+    kube.lines.put('2024-01-01T10:00:01Z second')
+
+    assert received_event.wait(5)
+    assert received == ['started', 'first', 'second']
+    assert kube.polled_logs == 1  # initial tail only
+    kube.lines.put(None)
+    scheduler.loop.call_soon_threadsafe(lambda: [task.cancel() for task in asyncio.all_tasks(scheduler.loop)])
@@ -0,0 +1,80 @@
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+import pytest
+from prometheus_client import REGISTRY
+
+from instrumentation import Instrumentation
+from metrics_reader import LastCallReader, parse_sample_value
+
+METRICS_PAGE = (
+    '# TYPE job_requests counter\n'
+    + ''.join(f'job_requests{{endpoint="/e{index}"}} {index}\n' for index in range(200))
+    + 'job_last_call_timestamp 1700000000\n'
+)
+
+
+@pytest.fixture
+def metrics_server() -> Iterator[tuple[str, list[dict[str, str]]]]:
+    requests_headers: list[dict[str, str]] = []
+    body = gzip.compress(METRICS_PAGE.encode())
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_headers.append(dict(self.headers))
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', '"v1"')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/metrics', requests_headers
+    server.shutdown()
+
+
+def _response_bytes(infrastructure: str) -> float:
+    return REGISTRY.get_sample_value('remote_kubernetes_call_response_bytes_total', {
+        'infrastructure': infrastructure, 'operation': 'read_last_call',
+    }) or 0
+
+
+def test_compressed_size_of_the_page_is_recorded(metrics_server):
+    url, _ = metrics_server
+    reader = LastCallReader(Instrumentation('metrics-size'), timeout=5, pool_size=1)
+
+    assert reader.read_last_call_timestamp(url, {}) == 1700000000
+    assert _response_bytes('metrics-size') == len(gzip.compress(METRICS_PAGE.encode()))
+
+
+def test_unchanged_page_is_not_transferred_again(metrics_server):
+    url, requests_headers = metrics_server
+    reader = LastCallReader(Instrumentation('metrics-etag'), timeout=5, pool_size=1)
+
+    assert reader.read_last_call_timestamp(url, {}) == 1700000000
+    assert reader.read_last_call_timestamp(url, {}) == 1700000000
+
+    assert [headers.get('If-None-Match') for headers in requests_headers] == [None, '"v1"']
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('job_last_call_timestamp 1700000000', 1700000000),
+    ('job_last_call_timestamp{job="a"} 1.7e9 1700000000000', 1700000000),
+    ('job_last_call_timestamp_created 1600000000', None),
+    ('job_last_call_timestamp{job="a" 1', None),
+    ('job_last_call_timestamp NaN', None),
+    ('job_last_call_timestamp', None),
+])
+def test_parse_sample_value(line: str, expected: int | None):
+    assert parse_sample_value(line, 'job_last_call_timestamp') == expected
@@ -0,0 +1,78 @@
+import threading
+import time
+from typing import Any, Iterator
+
+from pod_index import PodIndex
+from utils import K8S_JOB_NAME_LABEL, K8S_JOB_RESOURCE_LABEL, K8S_JOB_VERSION_LABEL
+
+
+class FakeKube:
+    """Kubernetes client whose watch, like kubectl behind the remote gateway, returns events only once it ends"""
+
+    k8s_namespace = 'racetrack'
+
+    def __init__(self):
+        self.pods: list[dict[str, Any]] = []
+        self.list_calls = 0
+        self.watch_timeouts: list[int] = []
+        self.release_watch = threading.Event()
+
+    def list_pods(self, label_selector: str, field_selector: str | None = None) -> dict[str, Any]:
+        self.list_calls += 1
+        return {'metadata': {'resourceVersion': str(self.list_calls)}, 'items': list(self.pods)}
+
+    def watch_pods(self, label_selector: str, resource_version: str, timeout: int) -> Iterator[dict[str, Any]]:
+        self.watch_timeouts.append(timeout)
+        self.release_watch.wait(timeout)
+        return iter([])
+
+
+def _pod(name: str, resource_name: str) -> dict[str, Any]:
+    return {
+        'metadata': {
+            'name': name,
+            'creationTimestamp': '2024-01-01T00:00:00Z',
+            'labels': {K8S_JOB_RESOURCE_LABEL: resource_name, K8S_JOB_NAME_LABEL: 'job', K8S_JOB_VERSION_LABEL: '1'},
+        },
+        'status': {'phase': 'Running', 'podIP': '10.0.0.1'},
+    }
+
+
+def test_stale_index_falls_back_to_listing_pods():
+    kube = FakeKube()
+    kube.pods = [_pod('pod-1', 'job-a')]
+    index = PodIndex(kube, watch_timeout=60, resync_interval=600, max_staleness=0.2)
+    try:
+        assert [deployment.resource_name for deployment in index.list_job_deployments()] == ['job-a']
+        assert index.list_job_deployments()  # fresh enough to be served from the index
+        assert kube.list_calls == 1
+
+        kube.pods = [_pod('pod-1', 'job-a'), _pod('pod-2', 'job-b')]
+        time.sleep(0.3)
+        deployments = index.list_job_deployments()
+        assert sorted(deployment.resource_name for deployment in deployments) == ['job-a', 'job-b']
+        assert kube.list_calls == 2
+    finally:
+        index.stop()
+        kube.release_watch.set()
+
+
+def test_watch_requests_are_capped_by_max_staleness():
+    kube = FakeKube()
+    index = PodIndex(kube, watch_timeout=60, resync_interval=600, max_staleness=10)
+    assert index.watch_timeout == 10
+    assert PodIndex(kube, watch_timeout=60, resync_interval=600).watch_timeout == 60
+
+
+def test_streamed_index_is_served_without_listing():
+    kube = FakeKube()
+    kube.pods = [_pod('pod-1', 'job-a')]
+    index = PodIndex(kube, watch_timeout=60, resync_interval=600)
+    try:
+        index.list_job_deployments()
+        time.sleep(0.1)
+        index.list_job_deployments()
+        assert kube.list_calls == 1
+    finally:
+        index.stop()
+        kube.release_watch.set()
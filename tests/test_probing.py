@@ -0,0 +1,70 @@
+import threading
+import time
+
+from probing import ProbeInProgress, ProbeTimeout, Prober
+
+
+def test_results_are_yielded_in_order_of_items():
+    prober = Prober(workers=4)
+
+    results = list(prober.probe_concurrently([3, 1, 2], lambda item: item * 10, timeout=5, key=lambda item: item))
+
+    assert results == [(3, 30, None), (1, 10, None), (2, 20, None)]
+
+
+def test_errors_are_reported_per_item():
+    def probe(item: int) -> int:
+        if item == 2:
+            raise ValueError('unhealthy')
+        return item
+
+    results = list(Prober(workers=2).probe_concurrently([1, 2, 3], probe, timeout=5, key=lambda item: item))
+
+    assert [(item, result) for item, result, _ in results] == [(1, 1), (2, None), (3, 3)]
+    assert isinstance(results[1][2], ValueError)
+
+
+def test_item_with_probe_left_running_is_skipped_by_the_next_pass():
+    prober = Prober(workers=2)
+    release = threading.Event()
+
+    def probe(item: str) -> str:
+        if item == 'stuck':
+            release.wait(5)
+        return item
+
+    first_pass = list(prober.probe_concurrently(['stuck', 'ok'], probe, timeout=0.2, key=lambda item: item))
+    assert isinstance(first_pass[0][2], ProbeTimeout)
+    assert first_pass[1] == ('ok', 'ok', None)
+
+    second_pass = list(prober.probe_concurrently(['stuck', 'ok'], probe, timeout=0.2, key=lambda item: item))
+    assert isinstance(second_pass[0][2], ProbeInProgress)
+    assert second_pass[1] == ('ok', 'ok', None)
+
+    release.set()
+    for _ in range(50):
+        third_pass = list(prober.probe_concurrently(['stuck'], probe, timeout=1, key=lambda item: item))
+        if not isinstance(third_pass[0][2], ProbeInProgress):
+            break
+        time.sleep(0.05)
+    assert third_pass == [('stuck', 'stuck', None)]
+
+
+def test_workers_are_shared_across_passes():
+    prober = Prober(workers=1)
+    release = threading.Event()
+    started = []
+
+    def probe(item: str) -> str:
+        started.append(item)
+        if item == 'stuck':
+            release.wait(5)
+        return item
+
+    list(prober.probe_concurrently(['stuck'], probe, timeout=0.1, key=lambda item: item))
+    second_pass = prober.probe_concurrently(['next'], probe, timeout=0.1, key=lambda item: item)
+    # the only worker is still busy with the abandoned probe, so the new one stays queued
+    release_timer = threading.Timer(0.5, release.set)
+    release_timer.start()
+    assert list(second_pass) == [('next', 'next', None)]
+    assert started == ['stuck', 'next']
@@ -0,0 +1,74 @@
+import subprocess
+
+import pytest
+
+from plugin_config import InfrastructureConfig
+from remote_executor import RemoteExecutor, _split_batch_output
+
+
+class LocalExecutor(RemoteExecutor):
+    """Runs the batch script in a local shell instead of the remote gateway"""
+
+    def remote_shell(self, cmd: str, workdir: str | None = None) -> str:
+        return subprocess.run(['sh', '-c', cmd], cwd=workdir, capture_output=True, text=True, check=True).stdout
+
+
+@pytest.fixture
+def executor() -> LocalExecutor:
+    return LocalExecutor(InfrastructureConfig(remote_gateway_url='http://gateway'))
+
+
+def test_outputs_and_exit_codes_are_split_per_command(executor: LocalExecutor):
+    results = executor.run_batch([
+        'echo first',
+        'echo failing; echo warning >&2; exit 3',
+        'echo last',
+    ])
+
+    assert [(result.output, result.returncode, result.stderr) for result in results] == [
+        ('first\n', 0, ''),
+        ('failing\n', 3, 'warning\n'),
+        ('last\n', 0, ''),
+    ]
+
+
+def test_empty_stdout(executor: LocalExecutor):
+    results = executor.run_batch(['true', 'printf ""', 'exit 1'])
+
+    assert [(result.output, result.returncode) for result in results] == [('', 0), ('', 0), ('', 1)]
+
+
+def test_output_without_trailing_newline_is_kept_intact(executor: LocalExecutor):
+    results = executor.run_batch(['printf "no newline"', 'printf "two\\n\\n"'])
+
+    assert [result.output for result in results] == ['no newline', 'two\n\n']
+
+
+def test_partial_markers_in_output_are_not_mistaken_for_sections():
+    marker = '__racetrack_batch_abc__'
+    output = (
+        f'{marker} begin 0\n'
+        f'{marker} begin\n'
+        f'{marker} stderr 0 not at line start {marker} end 0 1\n'
+        f'\n{marker} stderr 0\n'
+        f'{marker} end 0\n'
+        f'\n{marker} end 0 0\n'
+        f'{marker} begin 1\n'
+        f'\n{marker} stderr 1\n'
+        f'\n{marker} end 1 2\n'
+    )
+
+    results = _split_batch_output(marker, ['cat noisy', 'false'], output)
+
+    assert results[0].output == f'{marker} begin\n{marker} stderr 0 not at line start {marker} end 0 1\n'
+    assert results[0].stderr == f'{marker} end 0\n'
+    assert results[0].returncode == 0
+    assert (results[1].output, results[1].returncode) == ('', 2)
+
+
+def test_truncated_output_is_an_error():
+    marker = '__racetrack_batch_abc__'
+    output = f'{marker} begin 0\nfirst\n\n{marker} stderr 0\n\n{marker} end 0 0\n{marker} begin 1\npartial'
+
+    with pytest.raises(RuntimeError, match='incomplete output of batched command #1'):
+        _split_batch_output(marker, ['echo first', 'echo second'], output)
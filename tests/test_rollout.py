@@ -0,0 +1,92 @@
+from typing import Any
+
+import pytest
+
+from plugin_config import RolloutConfig
+from rollout import RolloutFailed, evaluate_rollout, resolve_rollout
+
+
+def test_defaults_are_kept_without_labels():
+    rollout = resolve_rollout(RolloutConfig(), None)
+
+    assert rollout == RolloutConfig()
+
+
+def test_labels_override_the_defaults():
+    rollout = resolve_rollout(RolloutConfig(), {
+        'rollout_max_surge': '50%',
+        'rollout_max_unavailable': 0,
+        'rollout_probe_period': 10,
+        'other_label': 'ignored',
+    })
+
+    assert (rollout.max_surge, rollout.max_unavailable, rollout.probe_period) == ('50%', 0, 10)
+
+
+@pytest.mark.parametrize('value, expected', [(2, 2), ('2', 2), ('0', 0), ('30%', '30%')])
+def test_max_unavailable_is_a_number_or_a_percentage(value: Any, expected: int | str):
+    rollout = resolve_rollout(RolloutConfig(), {'rollout_max_unavailable': value})
+
+    assert rollout.max_unavailable == expected
+
+
+@pytest.mark.parametrize('labels', [
+    {'rollout_max_unavailable': 'half'},
+    {'rollout_max_unavailable': '-1'},
+    {'rollout_max_unavailable': -1},
+    {'rollout_max_surge': '25 %'},
+    {'rollout_disruption_max_unavailable': '1.5'},
+    {'rollout_max_surge': 0, 'rollout_max_unavailable': '0%'},
+    {'rollout_probe_period': 0},
+    {'rollout_topology_max_skew': 0},
+])
+def test_invalid_labels_are_rejected(labels: dict[str, Any]):
+    with pytest.raises(AssertionError):
+        resolve_rollout(RolloutConfig(), labels)
+
+
+def _deployment(replicas: int = 2, generation: int = 2, observed_generation: int = 2, **status) -> dict[str, Any]:
+    return {
+        'metadata': {'generation': generation},
+        'spec': {'replicas': replicas},
+        'status': {'observedGeneration': observed_generation, **status},
+    }
+
+
+def _pod(timestamp: str, **status) -> dict[str, Any]:
+    return {
+        'metadata': {'name': f'pod-{timestamp}', 'annotations': {'racetrack-deployment-date': timestamp}},
+        'status': status,
+    }
+
+
+def test_rollout_is_complete_when_new_replica_set_is_available():
+    deployment = _deployment(conditions=[{'type': 'Progressing', 'reason': 'NewReplicaSetAvailable'}])
+
+    assert evaluate_rollout(deployment, [], 100).complete
+
+
+def test_rollout_waits_for_the_spec_update_and_the_updated_replicas():
+    assert not evaluate_rollout(_deployment(observed_generation=1), [], 100).complete
+    assert not evaluate_rollout(_deployment(updatedReplicas=1), [], 100).complete
+    assert not evaluate_rollout(_deployment(updatedReplicas=2, availableReplicas=1), [], 100).complete
+    assert evaluate_rollout(_deployment(updatedReplicas=2, availableReplicas=2, replicas=2), [], 100).complete
+
+
+def test_rollout_fails_fast_on_new_pods_only():
+    stuck = {'containerStatuses': [{'name': 'job', 'state': {'waiting': {'reason': 'ImagePullBackOff'}}}]}
+    unschedulable = {'conditions': [{'type': 'PodScheduled', 'status': 'False', 'reason': 'Unschedulable'}]}
+
+    assert not evaluate_rollout(_deployment(), [_pod('99', **stuck)], 100).complete
+    assert not evaluate_rollout(_deployment(), [_pod('100', **stuck)], 0).complete  # timestamp unknown
+    with pytest.raises(RolloutFailed, match='ImagePullBackOff'):
+        evaluate_rollout(_deployment(), [_pod('100', **stuck)], 100)
+    with pytest.raises(RolloutFailed, match='unschedulable'):
+        evaluate_rollout(_deployment(), [_pod('100', **unschedulable)], 100)
+
+
+def test_rollout_fails_when_progress_deadline_is_exceeded():
+    deployment = _deployment(conditions=[{'type': 'Progressing', 'reason': 'ProgressDeadlineExceeded', 'message': 'stuck'}])
+
+    with pytest.raises(RolloutFailed, match='progress deadline'):
+        evaluate_rollout(deployment, [], 100)